@@ -1,12 +1,24 @@
 import os
-import json
-import subprocess
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-from fractions import Fraction
-import threading
+from collections import deque
 import signal
 
+from vidoc.events import UiEventQueue
+from vidoc.governor import Governor
+from vidoc.command import (AUDIO_BITRATES, AUDIO_CHANNELS, AUDIO_CODECS, BITDEPTHS, CODECS, FORMATS,
+                           PRESETS, RESOLUTIONS, VIDEO_EXTENSIONS, batch_output_path, is_compatible)
+from vidoc.jobs import CANCELLED, DONE, FAILED, RUNNING, JobScheduler
+from vidoc.ladder import LadderJob, make_renditions, plan_ladder
+from vidoc.media import format_duration, format_size, summarize_media
+from vidoc.planner import PlannedJob, plan_streams
+from vidoc.profile import save_profile
+from vidoc.probe import ProbeTask
+from vidoc.segmented import SegmentedJob
+from vidoc.store import JobStore
+from vidoc.telemetry import Telemetry
+from vidoc.trim import TrimJob, parse_timestamp
+
 available_streams = []
 stream_keep_vars = {}
 audio_reencode_vars = {}
@@ -14,196 +26,387 @@ audio_codec_vars = {}
 audio_channels_vars = {}
 audio_bitrate_vars = {}
 input_file_path = ""
-ffmpeg_process = None
-
-# ---------- Helpers ----------
-def format_duration(seconds):
-    try:
-        seconds = float(seconds)
-        h = int(seconds // 3600)
-        m = int((seconds % 3600) // 60)
-        s = int(seconds % 60)
-        return f"{h:02}:{m:02}:{s:02}"
-    except:
-        return "N/A"
-
-def format_size(bytes_size):
-    if not bytes_size:
-        return "N/A"
-    if bytes_size < 1024:
-        return f"{bytes_size} B"
-    elif bytes_size < 1024**2:
-        return f"{bytes_size/1024:.2f} KB"
-    elif bytes_size < 1024**3:
-        return f"{bytes_size/(1024**2):.2f} MB"
-    else:
-        return f"{bytes_size/(1024**3):.2f} GB"
-
-def parse_fps(fps_value):
-    try:
-        if "/" in fps_value:
-            return round(float(Fraction(fps_value)), 2)
-        return float(fps_value)
-    except:
-        return fps_value
+input_media = None      # ffprobe info of input_file_path once the probe is back
+current_probe = None
+jobs_by_id = {}
+shown_job = None
+ui_events = UiEventQueue()
+panel_generation = 0
+
+UI_POLL_MS = 100        # how often the Tk thread drains worker events
+MAX_LOG_LINES = 1000    # lines kept in the log widget
+JOB_LOG_LINES = 2000    # lines kept per job for when it is selected again
+STREAM_ROWS_PER_TICK = 20  # stream rows built per Tk tick when a file is opened
 
 # ---------- Browse File ----------
 def browse_file():
     global input_file_path
     input_file_path = filedialog.askopenfilename(
         title="Select Video File",
-        filetypes=[("Video files", "*.mp4 *.mkv *.avi *.mov *.flv *.ts *.webm"), ("All files", "*.*")]
+        filetypes=[("Video files", " ".join(f"*{ext}" for ext in VIDEO_EXTENSIONS)), ("All files", "*.*")]
     )
     if input_file_path:
         filename_entry.delete(0, tk.END)
         filename_entry.insert(0, input_file_path)
-        show_media_info(input_file_path)
+        start_probe(input_file_path)
+
+# ---------- Probe ----------
+def start_probe(file_path):
+    # Probe in the background; a newer file replaces (and kills) the old probe
+    global current_probe, input_media
+    cancel_probe()
+    input_media = None
+    reset_stream_vars()
+    clear_info_section()
+    tk.Label(info_frame_scroll, text=f"Probing {os.path.basename(file_path)}...",
+             font=("Courier New", 12), fg="#00ffcc", bg="#121212").pack(anchor="w", pady=8, padx=10)
+    tk.Button(info_frame_scroll, text="Cancel", command=on_cancel_probe,
+              font=("Courier New", 11), bg="#ff4444", fg="white",
+              relief="flat", padx=10).pack(anchor="w", padx=10)
+    current_probe = ProbeTask(file_path, on_probe_done).start()
+
+def cancel_probe():
+    global current_probe
+    if current_probe is not None:
+        current_probe.cancel()
+        current_probe = None
+
+def on_cancel_probe():
+    cancel_probe()
+    clear_info_section()
+    tk.Label(info_frame_scroll, text="Probe cancelled.",
+             font=("Courier New", 12), fg="#ffaa00", bg="#121212").pack(anchor="w", pady=8, padx=10)
+
+# Called from the probe thread
+def on_probe_done(task, info, error):
+    ui_events.post("probe", task, info, error)
+
+def apply_probe_result(task, info, error):
+    global current_probe, input_media
+    if task is not current_probe:
+        return  # an older file's probe finished after a newer one was picked
+    current_probe = None
+    clear_info_section()
+    if error is not None:
+        tk.Label(info_frame_scroll, text="No media info.",
+                 font=("Courier New", 12), fg="#ff4444", bg="#121212").pack(anchor="w", pady=8, padx=10)
+        messagebox.showerror("Error", f"Failed to get media info: {error}")
+        return
+    input_media = info
+    show_media_info(task.path, info)
 
-# ---------- Get Media Info ----------
-def show_media_info(file_path):
+def reset_stream_vars():
     global stream_keep_vars, audio_reencode_vars, audio_codec_vars, audio_channels_vars, audio_bitrate_vars
     stream_keep_vars = {}
     audio_reencode_vars = {}
     audio_codec_vars = {}
     audio_channels_vars = {}
     audio_bitrate_vars = {}
+
+# ---------- Get Media Info ----------
+def show_media_info(file_path, info):
+    reset_stream_vars()
     clear_info_section()
 
     try:
-        cmd = [
-            "ffprobe", "-v", "quiet",
-            "-print_format", "json",
-            "-show_format", "-show_streams",
-            file_path
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        info = json.loads(result.stdout)
-
-        duration = info.get("format", {}).get("duration", "N/A")
-        bit_rate = info.get("format", {}).get("bit_rate", "N/A")
-        file_size = os.path.getsize(file_path)
-
-        tk.Label(info_frame_scroll, text=f"Total File Size: {format_size(file_size)}",
+        media = summarize_media(info, os.path.getsize(file_path))
+
+        tk.Label(info_frame_scroll, text=f"Total File Size: {format_size(media['size'])}",
                  font=("Courier New", 12), fg="#00ffcc", bg="#121212").pack(anchor="w", pady=8, padx=10)
-        tk.Label(info_frame_scroll, text=f"Total Duration: {format_duration(duration)}",
+        tk.Label(info_frame_scroll, text=f"Total Duration: {format_duration(media['duration'])}",
                  font=("Courier New", 12), fg="#00ffcc", bg="#121212").pack(anchor="w", pady=8, padx=10)
-        if bit_rate != "N/A":
-            tk.Label(info_frame_scroll, text=f"Overall Bitrate: {int(bit_rate)//1000} kbps",
+        if media["bit_rate"] is not None:
+            tk.Label(info_frame_scroll, text=f"Overall Bitrate: {media['bit_rate']//1000} kbps",
                      font=("Courier New", 12), fg="#00ffcc", bg="#121212").pack(anchor="w", pady=8, padx=10)
 
         tk.Label(info_frame_scroll, text="-"*50, font=("Courier New", 10),
                  fg="#00ffcc", bg="#121212").pack(fill="x", pady=15, padx=10)
 
-        for i, stream in enumerate(info.get("streams", [])):
-            codec_type = stream.get("codec_type", "unknown").capitalize()
-            codec_name = stream.get("codec_name", "N/A")
-            lang = stream.get("tags", {}).get("language", "und")
-            duration_s = stream.get("duration", duration)
-            bitrate_s = stream.get("bit_rate", None) or stream.get("tags", {}).get("BPS", None)
-
-            section = tk.Frame(info_frame_scroll, relief=tk.SOLID, bd=1, bg="#212121", padx=10, pady=10)
-            section.pack(fill="x", pady=5, padx=10)
-
-            # Fix stream ID format - use the actual stream index
-            stream_index = stream.get('index', i)
-            stream_id = f"{stream.get('codec_type')[0]}:{stream_index}"
-            var = tk.BooleanVar(value=True)
-            stream_keep_vars[stream_id] = var
-
-            tk.Label(section, text=f"Stream #{stream_index} - {codec_type}",
-                     font=("Courier New", 12, "bold"), fg="#00ffcc", bg="#212121").pack(anchor="w", pady=5)
-            tk.Label(section, text=f"Codec: {codec_name}",
-                     font=("Courier New", 12), fg="#00ffcc", bg="#212121").pack(anchor="w", pady=5)
-            tk.Label(section, text=f"Language: {lang}",
-                     font=("Courier New", 12), fg="#00ffcc", bg="#212121").pack(anchor="w", pady=5)
-            tk.Label(section, text=f"Duration: {format_duration(duration_s)}",
-                     font=("Courier New", 12), fg="#00ffcc", bg="#212121").pack(anchor="w", pady=5)
-            if bitrate_s:
-                tk.Label(section, text=f"Bitrate: {int(bitrate_s)//1000} kbps",
-                         font=("Courier New", 12), fg="#00ffcc", bg="#212121").pack(anchor="w", pady=5)
-
-            if codec_type == "Video":
-                width = stream.get("width", "N/A")
-                height = stream.get("height", "N/A")
-                fps = parse_fps(stream.get("avg_frame_rate", "N/A"))
-                tk.Label(section, text=f"Resolution: {width}x{height}",
-                         font=("Courier New", 12), fg="#00ffcc", bg="#121212").pack(anchor="w", pady=5)
-                tk.Label(section, text=f"FPS: {fps}",
-                         font=("Courier New", 12), fg="#00ffcc", bg="#121212").pack(anchor="w", pady=5)
-
-            tk.Checkbutton(section, text=f"Keep this stream",
-                           variable=var, font=("Courier New", 11),
-                           fg="#00ffcc", bg="#212121", selectcolor="#121212").pack(anchor="w")
-
-            # Extra options for Audio streams
-            if codec_type == "Audio":
-                re_var = tk.BooleanVar(value=False)
-                audio_reencode_vars[stream_id] = re_var
-                tk.Checkbutton(section, text="Re-encode this audio",
-                               variable=re_var, font=("Courier New", 11),
-                               fg="#ffaa00", bg="#212121", selectcolor="#121212").pack(anchor="w", pady=(5, 0))
-
-                # Audio codec (radio buttons)
-                tk.Label(section, text="Codec:", font=("Courier New", 10), fg="#ffaa00", bg="#212121").pack(anchor="w")
-                codec_opt = tk.StringVar(value="aac")
-                audio_codec_vars[stream_id] = codec_opt
-                for codec in ["aac", "libopus", "libmp3lame", "ac3", "flac", "eac3", "mp2"]:
-                    tk.Radiobutton(
-                        section, text=codec, variable=codec_opt, value=codec,
-                        font=("Courier New", 10), fg="#ffaa00", bg="#212121",
-                        selectcolor="#121212", activebackground="#212121"
-                    ).pack(anchor="w", padx=20)
-
-                # Channels (radio buttons)
-                tk.Label(section, text="Channels:", font=("Courier New", 10), fg="#ffaa00", bg="#212121").pack(anchor="w")
-                ch_opt = tk.StringVar(value="2")
-                audio_channels_vars[stream_id] = ch_opt
-                for ch in ["1", "2", "6"]:
-                    tk.Radiobutton(
-                        section, text=ch, variable=ch_opt, value=ch,
-                        font=("Courier New", 10), fg="#ffaa00", bg="#212121",
-                        selectcolor="#121212", activebackground="#212121"
-                    ).pack(anchor="w", padx=20)
-
-                # Bitrate (radio buttons)
-                tk.Label(section, text="Bitrate:", font=("Courier New", 10), fg="#ffaa00", bg="#212121").pack(anchor="w")
-                br_opt = tk.StringVar(value="128k")
-                audio_bitrate_vars[stream_id] = br_opt
-                for br in ["96k", "128k", "256k", "320k", "384k", "448k", "640k", "768k"]:
-                    tk.Radiobutton(
-                        section, text=br, variable=br_opt, value=br,
-                        font=("Courier New", 10), fg="#ffaa00", bg="#212121",
-                        selectcolor="#121212", activebackground="#212121"
-                    ).pack(anchor="w", padx=20)
-
-
+        # Variables for every stream up front (cheap, no widgets) so
+        # selected_streams() sees all of them whether or not a row was expanded
+        for stream in media["streams"]:
+            stream_id = stream["id"]
+            stream_keep_vars[stream_id] = tk.BooleanVar(value=True)
+            if stream["type"] == "audio":
+                audio_reencode_vars[stream_id] = tk.BooleanVar(value=False)
+                audio_codec_vars[stream_id] = tk.StringVar(value="aac")
+                audio_channels_vars[stream_id] = tk.StringVar(value="2")
+                audio_bitrate_vars[stream_id] = tk.StringVar(value="128k")
+        build_stream_rows(media["streams"], 0, panel_generation)
 
     except Exception as e:
         messagebox.showerror("Error", f"Failed to get media info: {e}")
 
+# ---------- Stream List ----------
+# One compact row per stream; the detailed labels and the audio controls
+# (about 25 widgets per audio stream) are only built when a row is expanded,
+# so files with dozens of streams open instantly.
+def build_stream_rows(streams, start, generation):
+    # A batch of rows per Tk tick; stops if another file was opened meanwhile
+    if generation != panel_generation:
+        return
+    for stream in streams[start:start + STREAM_ROWS_PER_TICK]:
+        add_stream_row(stream)
+    if start + STREAM_ROWS_PER_TICK < len(streams):
+        root.after(1, build_stream_rows, streams, start + STREAM_ROWS_PER_TICK, generation)
+
+def stream_summary(stream):
+    parts = [f"#{stream['index']}", stream["type"].capitalize(), stream["codec"], stream["language"]]
+    if stream["type"] == "video":
+        parts.append(f"{stream['width'] or '?'}x{stream['height'] or '?'}")
+    elif stream["type"] == "audio" and stream.get("channels"):
+        parts.append(f"{stream['channels']}ch")
+    if stream["bit_rate"]:
+        parts.append(f"{stream['bit_rate']//1000} kbps")
+    return "  ".join(parts)
+
+def add_stream_row(stream):
+    row = tk.Frame(info_frame_scroll, relief=tk.SOLID, bd=1, bg="#212121", padx=10, pady=4)
+    row.pack(fill="x", pady=2, padx=10)
+    header = tk.Frame(row, bg="#212121")
+    header.pack(fill="x")
+    tk.Checkbutton(header, variable=stream_keep_vars[stream["id"]], bg="#212121",
+                   selectcolor="#121212", activebackground="#212121").pack(side="left")
+    tk.Label(header, text=stream_summary(stream), font=("Courier New", 11),
+             fg="#00ffcc", bg="#212121").pack(side="left")
+
+    details = []
+    def toggle():
+        if not details:
+            details.append(build_stream_details(row, stream))
+        if details[0].winfo_manager():
+            details[0].pack_forget()
+            toggle_button.config(text="Details ▸")
+        else:
+            details[0].pack(fill="x", pady=(5, 0))
+            toggle_button.config(text="Details ▾")
+
+    toggle_button = tk.Button(header, text="Details ▸", command=toggle, font=("Courier New", 10),
+                              bg="#212121", fg="#00ffcc", activebackground="#212121",
+                              relief="flat", bd=0)
+    toggle_button.pack(side="right")
+
+def build_stream_details(parent, stream):
+    stream_id = stream["id"]
+    section = tk.Frame(parent, bg="#212121")
+
+    tk.Label(section, text=f"Codec: {stream['codec']}",
+             font=("Courier New", 12), fg="#00ffcc", bg="#212121").pack(anchor="w", pady=2)
+    tk.Label(section, text=f"Language: {stream['language']}",
+             font=("Courier New", 12), fg="#00ffcc", bg="#212121").pack(anchor="w", pady=2)
+    tk.Label(section, text=f"Duration: {format_duration(stream['duration'])}",
+             font=("Courier New", 12), fg="#00ffcc", bg="#212121").pack(anchor="w", pady=2)
+    if stream["bit_rate"]:
+        tk.Label(section, text=f"Bitrate: {stream['bit_rate']//1000} kbps",
+                 font=("Courier New", 12), fg="#00ffcc", bg="#212121").pack(anchor="w", pady=2)
+
+    if stream["type"] == "video":
+        tk.Label(section, text=f"Resolution: {stream['width'] or 'N/A'}x{stream['height'] or 'N/A'}",
+                 font=("Courier New", 12), fg="#00ffcc", bg="#212121").pack(anchor="w", pady=2)
+        tk.Label(section, text=f"FPS: {stream['fps']}",
+                 font=("Courier New", 12), fg="#00ffcc", bg="#212121").pack(anchor="w", pady=2)
+
+    # Extra options for Audio streams
+    if stream["type"] == "audio":
+        tk.Checkbutton(section, text="Re-encode this audio",
+                       variable=audio_reencode_vars[stream_id], font=("Courier New", 11),
+                       fg="#ffaa00", bg="#212121", selectcolor="#121212").pack(anchor="w", pady=(5, 0))
+
+        for title, var, values in (("Codec:", audio_codec_vars[stream_id], AUDIO_CODECS),
+                                   ("Channels:", audio_channels_vars[stream_id], AUDIO_CHANNELS),
+                                   ("Bitrate:", audio_bitrate_vars[stream_id], AUDIO_BITRATES)):
+            tk.Label(section, text=title, font=("Courier New", 10), fg="#ffaa00", bg="#212121").pack(anchor="w")
+            for value in values:
+                tk.Radiobutton(
+                    section, text=value, variable=var, value=value,
+                    font=("Courier New", 10), fg="#ffaa00", bg="#212121",
+                    selectcolor="#121212", activebackground="#212121"
+                ).pack(anchor="w", padx=20)
+    return section
+
 # ---------- Clear Info ----------
 def clear_info_section():
+    global panel_generation
+    panel_generation += 1  # abandons a stream list that is still being built
     for widget in info_frame_scroll.winfo_children():
         widget.destroy()
 
-# ---------- Cancel ----------
+# ---------- Job Queue ----------
+def selected_streams():
+    streams = []
+    for sid, var in stream_keep_vars.items():
+        if var.get():  # Stream is kept
+            audio = None
+            if sid.startswith("a:") and audio_reencode_vars.get(sid, tk.BooleanVar()).get():
+                audio = {
+                    "codec": audio_codec_vars[sid].get(),
+                    "bitrate": audio_bitrate_vars[sid].get(),
+                    "channels": audio_channels_vars[sid].get(),
+                }
+            streams.append({"id": sid, "audio": audio})
+    return streams
+
+def check_combination(codec, output_ext):
+    if not is_compatible(codec, output_ext):
+        messagebox.showerror(
+            "Invalid Combination",
+            f"The selected codec '{codec}' is not recommended/compatible with .{output_ext} container.\n"
+            "Please choose a compatible codec."
+        )
+        return False
+    return True
+
+def make_job(input_path, output_path, codec, streams=None, plan=None):
+    container = output_format_var.get()
+    resolution, pix_fmt, preset = resolution_var.get(), bitdepth_var.get(), preset_var.get()
+    if segmented_var.get() and codec != "copy":
+        return SegmentedJob(input_path, output_path, container, codec, resolution=resolution,
+                            pix_fmt=pix_fmt, preset=preset, streams=streams,
+                            smart_copy=smart_copy_var.get())
+    return PlannedJob(input_path, output_path, container, codec, resolution=resolution,
+                      pix_fmt=pix_fmt, preset=preset, streams=streams,
+                      smart_copy=smart_copy_var.get(), plan=plan)
+
+def submit_job(job, notify=False):
+    job.notify = notify
+    job.log = deque(maxlen=JOB_LOG_LINES)
+    jobs_by_id[job.id] = job
+    queue_tree.insert("", tk.END, iid=str(job.id),
+                      values=(os.path.basename(job.input_path), job.status, "0%", ""))
+    show_job(job)
+    scheduler.submit(job)
+    return job
+
+def show_job(job):
+    global shown_job
+    shown_job = job
+    progress_bar['value'] = job.progress
+    log_text.delete(1.0, tk.END)
+    log_text.insert(tk.END, f"{job.describe()}\n\n")
+    log_text.insert(tk.END, "".join(job.log))
+    trim_log()
+    log_text.see(tk.END)
+
+def on_job_selected(event):
+    for iid in queue_tree.selection():
+        job = jobs_by_id.get(int(iid))
+        if job:
+            show_job(job)
+
+def selected_jobs():
+    return [jobs_by_id[int(iid)] for iid in queue_tree.selection() if int(iid) in jobs_by_id]
+
+def format_job_speed(job):
+    stats = job.stats
+    if job.status != RUNNING or stats is None or stats.speed is None:
+        return ""
+    eta = stats.eta
+    return f"{stats.speed:.2f}x ETA {format_duration(eta)}" if eta is not None else f"{stats.speed:.2f}x"
+
+# Called from worker threads: only hand the event over to the Tk thread
+def on_job_update(job):
+    ui_events.post("update", job)
+
+def on_job_log(job, line):
+    ui_events.post("log", job, line)
+
+def pump_events():
+    # Rescheduled whatever happens; an error in one handler (Tk reports it)
+    # must not stop the GUI from following the jobs
+    try:
+        handle_events()
+    finally:
+        root.after(UI_POLL_MS, pump_events)
+
+def handle_events():
+    updated = {}
+    shown_lines = []
+    for event in ui_events.drain():
+        kind, job = event[0], event[1]
+        if kind == "probe":
+            apply_probe_result(*event[1:])
+        elif kind == "update":
+            updated[job.id] = job  # only the latest state of each job matters
+        elif kind == "log":
+            job.log.append(event[2])
+            if job is shown_job:
+                shown_lines.append(event[2])
+
+    if shown_lines:
+        log_text.insert(tk.END, "".join(shown_lines[-MAX_LOG_LINES:]))
+        trim_log()
+        log_text.see(tk.END)
+    for job in updated.values():
+        apply_job_update(job)
+
+def trim_log():
+    # Keep the log widget a fixed-size ring so long encodes don't slow the GUI
+    lines = int(log_text.index("end-1c").split(".")[0])
+    if lines > MAX_LOG_LINES:
+        log_text.delete("1.0", f"{lines - MAX_LOG_LINES + 1}.0")
+
+def apply_job_update(job):
+    if queue_tree.exists(str(job.id)):
+        queue_tree.item(str(job.id), values=(os.path.basename(job.input_path), job.status,
+                                             f"{job.progress:.0f}%", format_job_speed(job)))
+    if job is shown_job:
+        progress_bar['value'] = job.progress
+
+    if job.notify and job.finished:
+        job.notify = False
+        if job.status == DONE:
+            messagebox.showinfo("Success", "Conversion completed:\n" + "\n".join(job.output_paths))
+        elif job.status == FAILED:
+            messagebox.showerror("Error", f"Conversion failed.\nSee log for details.")
+
+# ---------- Cancel / Retry ----------
 def cancel_conversion():
-    global ffmpeg_process
-    if ffmpeg_process and ffmpeg_process.poll() is None:
-        ffmpeg_process.terminate()
+    # Cancel the selected jobs, or everything still pending if nothing is selected
+    jobs = selected_jobs() or [job for job in scheduler.jobs.values() if not job.finished]
+    for job in jobs:
+        scheduler.cancel(job)
+    if shown_job in jobs:
         log_text.insert(tk.END, "\nConversion cancelled by user.\n")
         log_text.see(tk.END)
         progress_bar['value'] = 0
 
+def retry_jobs():
+    for job in selected_jobs():
+        if job.status in (FAILED, CANCELLED):
+            job.log.clear()
+            job.notify = True
+            scheduler.retry(job)
+            if job is shown_job:
+                show_job(job)
+
+
+# ---------- Resume ----------
+def offer_resume():
+    # Jobs that were queued or running when ViDoc last closed or crashed
+    jobs = scheduler.store.unfinished()
+    if not jobs:
+        return
+    names = "\n".join(os.path.basename(job.input_path) for job in jobs[:10])
+    more = f"\n... and {len(jobs) - 10} more" if len(jobs) > 10 else ""
+    if messagebox.askyesno("Resume", f"{len(jobs)} conversion(s) did not finish last time:\n"
+                                     f"{names}{more}\n\nResume them?"):
+        for job in jobs:
+            submit_job(job)
+    else:
+        scheduler.store.abandon(jobs)
+
 
 # ---------- Convert ----------
 def convert_video():
-    global input_file_path, ffmpeg_process
+    global input_file_path
 
     # Step 1: Validate input file
     if not input_file_path:
         messagebox.showerror("Error", "Please select an input file first.")
         return
+    if input_media is None:
+        messagebox.showerror("Error", "The media info of the input file isn't loaded yet.")
+        return
 
     # Step 2: Output file dialog and validation
     output_ext = output_format_var.get()
@@ -214,258 +417,295 @@ def convert_video():
     if not output_path:
         return
 
-    # Step 3: Get user selections for codec, resolution, preset, and pix_fmt
+    # Step 3: Get user selections for codec
     chosen_codec = codec_var.get()
-    chosen_res = resolution_var.get()
-    chosen_preset = preset_var.get()
-    chosen_pix_fmt = bitdepth_var.get()
-
-    # Step 3.5: Validate codec-container compatibility
-    invalid_combinations = {
-        "mp4": ["libvpx-vp9", "libaom-av1"],   # MP4 doesn't support VP9/AV1 well for playback
-        "webm": ["libx264", "libx265", "ac3"], # WEBM typically uses VP8/VP9/AV1 + opus/vorbis
-        "mkv": []                              # MKV is flexible
-    }
-    if chosen_codec in invalid_combinations.get(output_ext, []):
-        messagebox.showerror(
-            "Invalid Combination",
-            f"The selected codec '{chosen_codec}' is not recommended/compatible with .{output_ext} container.\n"
-            "Please choose a compatible codec."
-        )
+
+    streams = selected_streams()
+    if trim_start_var.get().strip() or trim_end_var.get().strip():
+        convert_trim(output_path, chosen_codec, streams)
+        return
+    ladder = [label for label, var in ladder_vars.items() if var.get()]
+    if ladder:
+        convert_ladder(output_path, chosen_codec, ladder, streams)
         return
 
-    # Step 4: Initialize the FFmpeg command
-    cmd = ["ffmpeg", "-y", "-i", input_file_path]
+    # Step 3.5: Plan copy/encode per stream and validate every stream against the container
+    plan, problems = plan_streams(input_media, output_ext, chosen_codec, resolution_var.get(),
+                                  bitdepth_var.get(), streams, smart_copy_var.get(), preset_var.get())
+    if problems:
+        messagebox.showerror("Invalid Combination", "\n".join(problems) + "\n\nPlease choose compatible settings.")
+        return
 
-    # Step 5: Map streams and handle audio re-encoding
-    audio_stream_count = 0
-    video_stream_count = 0
-    
-    for sid, var in stream_keep_vars.items():
-        if var.get():  # Stream is kept
-            # Extract the actual stream index from the stream ID
-            stream_index = sid.split(':')[1]
-            cmd += ["-map", f"0:{stream_index}"]
-
-            # Handle audio streams
-            if sid.startswith("a:"):  # Audio stream
-                if audio_reencode_vars.get(sid, tk.BooleanVar()).get():  # If audio re-encode is selected
-                    codec = audio_codec_vars[sid].get()
-                    bitrate = audio_bitrate_vars[sid].get()
-                    channels = audio_channels_vars[sid].get()
-                    
-                    # Use the output stream index for codec assignment
-                    cmd += [f"-c:a:{audio_stream_count}", codec]
-                    cmd += [f"-b:a:{audio_stream_count}", bitrate]
-                    cmd += [f"-ac:{audio_stream_count}", channels]
-                else:
-                    cmd += [f"-c:a:{audio_stream_count}", "copy"]
-                
-                audio_stream_count += 1
-            
-            elif sid.startswith("v:"):  # Video stream
-                video_stream_count += 1
-
-    # Step 6: Video codec settings
-    cmd += ["-c:v", chosen_codec]
-    if chosen_codec != "copy" and chosen_pix_fmt != "same":
-        cmd += ["-pix_fmt", chosen_pix_fmt]
-
-    # Preset for video codec (if selected)
-    valid_presets = [
-        "ultrafast", "superfast", "veryfast", "faster", "fast",
-        "medium", "slow", "slower", "veryslow", "placebo"
-    ]
-    if chosen_codec != "copy" and chosen_preset in valid_presets:
-        cmd += ["-preset", chosen_preset]
-
-    # Resolution settings (if changed from default)
-    if chosen_res != "same" and chosen_codec != "copy":
-        w, h = chosen_res.split(":")
-        cmd += ["-vf", f"scale={w}:{h}"]
-
-    # Step 7: Subtitle handling (just copy subtitles)
-    cmd += ["-c:s", "copy", output_path]
-
-    # Step 8: Reset progress bar and log text
-    progress_bar['value'] = 0
-    log_text.delete(1.0, tk.END)
-    
-    # Debug: Print the command to log
-    log_text.insert(tk.END, f"FFmpeg command: {' '.join(cmd)}\n\n")
-    log_text.see(tk.END)
+    # Step 4: Build the job from the kept streams and video settings
+    job = make_job(input_file_path, output_path, chosen_codec, streams=streams, plan=plan)
 
-    # Step 9: Define a function to run FFmpeg with real-time progress updates
-    def run():
-        global ffmpeg_process
-        try:
-            # Get video duration for progress calculation
-            total_duration = get_video_duration(input_file_path)
-
-            # Start FFmpeg process
-            ffmpeg_process = subprocess.Popen(cmd, stderr=subprocess.PIPE, stdout=subprocess.PIPE, text=True, universal_newlines=True)
-            for line in ffmpeg_process.stderr:
-                log_text.insert(tk.END, line)
-                log_text.see(tk.END)
-                
-                # Extract timestamp from ffmpeg stderr output to calculate progress
-                if "time=" in line:
-                    timestamp = line.split("time=")[-1].split(" ")[0]
-                    current_time = parse_time_to_seconds(timestamp)
-                    if total_duration > 0:
-                        percent = (current_time / total_duration) * 100
-                        progress_bar['value'] = percent
-
-            # Wait for the FFmpeg process to finish
-            ffmpeg_process.wait()
-
-            # Check the result of the conversion
-            if ffmpeg_process.returncode == 0:
-                messagebox.showinfo("Success", f"Conversion completed:\n{output_path}")
-            elif ffmpeg_process.returncode != -15:
-                messagebox.showerror("Error", f"Conversion failed.\nSee log for details.")
-
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred:\n{e}")
-
-    # Step 10: Use threading to run the conversion in the background
-    threading.Thread(target=run, daemon=True).start()
-
-def get_video_duration(path):
-    try:
-        cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=nw=1:nk=1", path]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        return float(result.stdout.strip())
-    except:
-        return 0
+    # Step 5: Queue it; the scheduler runs it as soon as there are cores free
+    submit_job(job, notify=True)
 
-def parse_time_to_seconds(time_str):
+def convert_ladder(output_path, codec, labels, streams):
+    if codec == "copy":
+        messagebox.showerror("Error", "A ladder needs a video codec to encode with, not Copy.")
+        return
+    renditions = make_renditions(output_path, labels, codec, bitdepth_var.get(), preset_var.get())
+    _, problems = plan_ladder(input_media, renditions, streams, smart_copy_var.get())
+    if problems:
+        messagebox.showerror("Invalid Combination", "\n".join(problems) + "\n\nPlease choose compatible settings.")
+        return
+    submit_job(LadderJob(input_file_path, renditions, streams, smart_copy_var.get()), notify=True)
+
+def convert_trim(output_path, codec, streams):
+    if codec != "copy":
+        messagebox.showerror("Error", "Trimming is a smart cut that keeps the video as it is; "
+                                      "pick Copy as the video codec.")
+        return
     try:
-        h, m, s = time_str.split(":")
-        s = float(s)
-        return int(h) * 3600 + int(m) * 60 + s
-    except:
-        return 0
+        start = parse_timestamp(trim_start_var.get() or "0")
+        end = parse_timestamp(trim_end_var.get()) if trim_end_var.get().strip() else None
+    except ValueError:
+        messagebox.showerror("Error", "Trim times are seconds or [HH:]MM:SS[.ms].")
+        return
+    if end is not None and end <= start:
+        messagebox.showerror("Error", "The trim end has to be after its start.")
+        return
+    _, problems = plan_streams(input_media, output_format_var.get(), "copy", streams=streams)
+    if problems:
+        messagebox.showerror("Invalid Combination", "\n".join(problems) + "\n\nPlease choose compatible settings.")
+        return
+    submit_job(TrimJob(input_file_path, output_path, output_format_var.get(), start, end, streams),
+               notify=True)
+
+# ---------- Batch ----------
+def convert_folder():
+    input_dir = filedialog.askdirectory(title="Select Folder to Convert")
+    if not input_dir:
+        return
+    output_dir = filedialog.askdirectory(title="Select Output Folder")
+    if not output_dir:
+        return
+
+    output_ext = output_format_var.get()
+    chosen_codec = codec_var.get()
+    if not check_combination(chosen_codec, output_ext):
+        return
+
+    files = sorted(
+        entry.path for entry in os.scandir(input_dir)
+        if entry.is_file() and entry.name.lower().endswith(VIDEO_EXTENSIONS)
+    )
+    if not files:
+        messagebox.showinfo("Batch", "No video files found in that folder.")
+        return
+
+    for path in files:
+        output_path = batch_output_path(path, output_dir, output_ext)
+        submit_job(make_job(path, output_path, chosen_codec))
+
+# ---------- Profile ----------
+def current_profile():
+    # The panel's settings for the watch daemon; the audio settings come
+    # from the first audio stream that is set to re-encode
+    audio = None
+    for sid, var in audio_reencode_vars.items():
+        if var.get():
+            audio = {"codec": audio_codec_vars[sid].get(), "bitrate": audio_bitrate_vars[sid].get(),
+                     "channels": audio_channels_vars[sid].get()}
+            break
+    return {"container": output_format_var.get(), "video_codec": codec_var.get(),
+            "resolution": resolution_var.get(), "pix_fmt": bitdepth_var.get(),
+            "preset": preset_var.get(), "audio": audio, "smart_copy": smart_copy_var.get(),
+            "segmented": segmented_var.get()}
+
+def save_current_profile():
+    if not check_combination(codec_var.get(), output_format_var.get()):
+        return
+    path = filedialog.asksaveasfilename(title="Save Profile", defaultextension=".json",
+                                        filetypes=[("ViDoc profile", "*.json"), ("All Files", "*.*")])
+    if path:
+        save_profile(path, current_profile())
+        messagebox.showinfo("Profile", f"Saved to {path}\n\nWatch folders with it:\n"
+                                       f"python -m vidoc watch IN_FOLDER -p \"{path}\" -o OUT_FOLDER")
 
 # ---------- GUI ----------
-root = tk.Tk()
-root.title("Video Info & Converter")
-root.geometry("1280x900")
-root.config(bg="#121212")
-
-style = ttk.Style()
-style.theme_use('default')
-style.configure("TProgressbar", thickness=20, troughcolor='#212121', background='#00ffcc')
-style.configure("Custom.Vertical.TScrollbar", background="#00ffcc", troughcolor="#212121", width=15)
-
-# Top input
-top_frame = tk.Frame(root, bg="#121212")
-top_frame.pack(fill="x", pady=10)
-filename_entry = tk.Entry(top_frame, width=70, font=("Courier New", 12),
-                          relief="flat", bd=1, bg="#121212", fg="#00ffcc", insertbackground="#00ffcc")
-filename_entry.pack(side="left", padx=5, fill="x", expand=True)
-tk.Button(top_frame, text="Browse", command=browse_file,
-          font=("Courier New", 12), bg="#00ffcc", fg="black",
-          relief="flat", padx=20, pady=8).pack(side="left", padx=10)
-
-# Panes
-main_pane = tk.PanedWindow(root, orient="horizontal", bg="#121212", sashwidth=4, sashrelief="raised")
-main_pane.pack(fill="both", expand=True, padx=5)
-
-# Left
-left_frame = tk.Frame(main_pane, bg="#121212")
-left_canvas = tk.Canvas(left_frame, bg="#121212", highlightthickness=0)
-left_scrollbar = ttk.Scrollbar(left_frame, orient="vertical", command=left_canvas.yview, style="Custom.Vertical.TScrollbar")
-info_frame_scroll = tk.Frame(left_canvas, bg="#121212")
-info_frame_scroll.bind("<Configure>", lambda e: left_canvas.configure(scrollregion=left_canvas.bbox("all")))
-left_canvas.create_window((0, 0), window=info_frame_scroll, anchor="nw", width=580)
-left_canvas.configure(yscrollcommand=left_scrollbar.set)
-main_pane.add(left_frame, minsize=600)
-left_canvas.pack(side="left", fill="both", expand=True)
-left_scrollbar.pack(side="right", fill="y")
-
-# Right
-right_frame = tk.Frame(main_pane, bg="#121212")
-right_canvas = tk.Canvas(right_frame, bg="#121212", highlightthickness=0)
-right_scrollbar = ttk.Scrollbar(right_frame, orient="vertical", command=right_canvas.yview, style="Custom.Vertical.TScrollbar")
-convert_frame = tk.Frame(right_canvas, bg="#121212")
-convert_frame.bind("<Configure>", lambda e: right_canvas.configure(scrollregion=right_canvas.bbox("all")))
-right_canvas.create_window((0, 0), window=convert_frame, anchor="nw", width=580)
-right_canvas.configure(yscrollcommand=right_scrollbar.set)
-main_pane.add(right_frame, minsize=600)
-right_canvas.pack(side="left", fill="both", expand=True)
-right_scrollbar.pack(side="right", fill="y")
-
-# Controls
-tk.Label(convert_frame, text="Convert Video To:", font=("Courier New", 12, "bold"), fg="#00ffcc", bg="#121212").pack(anchor="w", pady=5, padx=10)
-output_format_var = tk.StringVar(value="mp4")
-formats = [("MP4", "mp4"), ("MKV", "mkv"), ("WEBM", "webm")]
-fmt_frame = tk.Frame(convert_frame, bg="#121212"); fmt_frame.pack(anchor="w", padx=10)
-for i, (text, value) in enumerate(formats):
-    tk.Radiobutton(fmt_frame, text=text, variable=output_format_var, value=value,
-                   font=("Courier New", 12), fg="#00ffcc", bg="#121212",
-                   selectcolor="#121212").grid(row=i//5, column=i%5, padx=5, pady=3, sticky="w")
-
-tk.Label(convert_frame, text="Select Video Codec:", font=("Courier New", 12, "bold"), fg="#00ffcc", bg="#121212").pack(anchor="w", pady=5, padx=10)
-codec_var = tk.StringVar(value="libx264")
-codecs = [("H.264", "libx264"), ("HEVC (H.265)", "libx265"), ("VP9", "libvpx-vp9"), ("AV1", "libaom-av1"), ("Copy", "copy")]
-codec_frame = tk.Frame(convert_frame, bg="#121212"); codec_frame.pack(anchor="w", padx=10)
-for i, (text, value) in enumerate(codecs):
-    tk.Radiobutton(codec_frame, text=text, variable=codec_var, value=value,
-                   font=("Courier New", 12), fg="#00ffcc", bg="#121212",
-                   selectcolor="#121212").grid(row=i//5, column=i%5, padx=5, pady=3, sticky="w")
-
-tk.Label(convert_frame, text="Select Resolution:", font=("Courier New", 12, "bold"), fg="#00ffcc", bg="#121212").pack(anchor="w", pady=5, padx=10)
-resolution_var = tk.StringVar(value="same")
-resolutions = {
-    "144p": (256, 144), "240p": (426, 240), "360p": (640, 360),
-    "480p (SD)": (854, 480), "540p": (960, 540), "720p (HD)": (1280, 720),
-    "900p (HD)": (1600, 900), "1080p (FHD)": (1920, 1080),
-    "1440p (2K)": (2560, 1440), "2160p (4K)": (3840, 2160)
-}
-res_options = [("Same as Original", "same")] + [(label, f"{w}:{h}") for label, (w, h) in resolutions.items()]
-res_frame = tk.Frame(convert_frame, bg="#121212"); res_frame.pack(anchor="w", padx=10)
-for i, (label, val) in enumerate(res_options):
-    tk.Radiobutton(res_frame, text=label, variable=resolution_var, value=val,
-                   font=("Courier New", 12), fg="#00ffcc", bg="#121212",
-                   selectcolor="#121212").grid(row=i//4, column=i%4, padx=5, pady=3,sticky="w")
-
-tk.Label(convert_frame, text="Select Bit Depth:", font=("Courier New", 12, "bold"), fg="#00ffcc", bg="#121212").pack(anchor="w", pady=5, padx=10)
-bitdepth_var = tk.StringVar(value="same")
-bitdepths = [("Same as Original", "same"), ("8-bit", "yuv420p"), ("10-bit", "yuv420p10le"), ("12-bit", "yuv420p12le")]
-bit_frame = tk.Frame(convert_frame, bg="#121212"); bit_frame.pack(anchor="w", padx=10)
-for i, (text, val) in enumerate(bitdepths):
-    tk.Radiobutton(bit_frame, text=text, variable=bitdepth_var, value=val,
-                   font=("Courier New", 12), fg="#00ffcc", bg="#121212",
-                   selectcolor="#121212").grid(row=i//2, column=i%2, padx=5, pady=3, sticky="w")
-
-tk.Label(convert_frame, text="Select Preset:", font=("Courier New", 12, "bold"), fg="#00ffcc", bg="#121212").pack(anchor="w", pady=5, padx=10)
-preset_var = tk.StringVar(value="default")
-presets = [("Default", "default"), ("Ultrafast", "ultrafast"), ("Superfast", "superfast"),
-           ("Veryfast", "veryfast"), ("Faster", "faster"), ("Fast", "fast"),
-           ("Medium", "medium"), ("Slow", "slow"), ("Slower", "slower"), ("Veryslow", "veryslow")]
-preset_frame = tk.Frame(convert_frame, bg="#121212"); preset_frame.pack(anchor="w", padx=10)
-for i, (text, val) in enumerate(presets):
-    tk.Radiobutton(preset_frame, text=text, variable=preset_var, value=val,
-                   font=("Courier New", 12), fg="#00ffcc", bg="#121212",
-                   selectcolor="#121212").grid(row=i//4, column=i%4, padx=5, pady=3, sticky="w")
-
-# Progress bar
-progress_bar = ttk.Progressbar(convert_frame, orient="horizontal", length=400, mode="determinate")
-progress_bar.pack(pady=10, padx=10)
-
-# Log output
-log_text = tk.Text(convert_frame, height=10, bg="#1e1e1e", fg="#00ffcc", font=("Courier New", 10))
-log_text.pack(fill="x", padx=10, pady=5)
-
-# Convert & Cancel buttons
-btn_frame = tk.Frame(convert_frame, bg="#121212")
-btn_frame.pack(pady=10)
-tk.Button(btn_frame, text="Convert", command=convert_video,
-          font=("Courier New", 14, "bold"), bg="#00ffcc", fg="black", relief="flat",
-          padx=20, pady=10).grid(row=0, column=0, padx=5)
-tk.Button(btn_frame, text="Cancel", command=cancel_conversion,
-          font=("Courier New", 14, "bold"), bg="#ff4444", fg="white", relief="flat",
-          padx=20, pady=10).grid(row=0, column=1, padx=5)
-
-root.mainloop()
+def main():
+    global root, filename_entry, info_frame_scroll, output_format_var, codec_var, resolution_var
+    global bitdepth_var, preset_var, ladder_vars, smart_copy_var, segmented_var, queue_tree
+    global progress_bar, log_text, scheduler, trim_start_var, trim_end_var
+
+    root = tk.Tk()
+    root.title("Video Info & Converter")
+    root.geometry("1280x900")
+    root.config(bg="#121212")
+
+    style = ttk.Style()
+    style.theme_use('default')
+    style.configure("TProgressbar", thickness=20, troughcolor='#212121', background='#00ffcc')
+    style.configure("Custom.Vertical.TScrollbar", background="#00ffcc", troughcolor="#212121", width=15)
+
+    # Top input
+    top_frame = tk.Frame(root, bg="#121212")
+    top_frame.pack(fill="x", pady=10)
+    filename_entry = tk.Entry(top_frame, width=70, font=("Courier New", 12),
+                              relief="flat", bd=1, bg="#121212", fg="#00ffcc", insertbackground="#00ffcc")
+    filename_entry.pack(side="left", padx=5, fill="x", expand=True)
+    tk.Button(top_frame, text="Browse", command=browse_file,
+              font=("Courier New", 12), bg="#00ffcc", fg="black",
+              relief="flat", padx=20, pady=8).pack(side="left", padx=10)
+
+    # Panes
+    main_pane = tk.PanedWindow(root, orient="horizontal", bg="#121212", sashwidth=4, sashrelief="raised")
+    main_pane.pack(fill="both", expand=True, padx=5)
+
+    # Left
+    left_frame = tk.Frame(main_pane, bg="#121212")
+    left_canvas = tk.Canvas(left_frame, bg="#121212", highlightthickness=0)
+    left_scrollbar = ttk.Scrollbar(left_frame, orient="vertical", command=left_canvas.yview, style="Custom.Vertical.TScrollbar")
+    info_frame_scroll = tk.Frame(left_canvas, bg="#121212")
+    info_frame_scroll.bind("<Configure>", lambda e: left_canvas.configure(scrollregion=left_canvas.bbox("all")))
+    left_canvas.create_window((0, 0), window=info_frame_scroll, anchor="nw", width=580)
+    left_canvas.configure(yscrollcommand=left_scrollbar.set)
+    main_pane.add(left_frame, minsize=600)
+    left_canvas.pack(side="left", fill="both", expand=True)
+    left_scrollbar.pack(side="right", fill="y")
+
+    # Right
+    right_frame = tk.Frame(main_pane, bg="#121212")
+    right_canvas = tk.Canvas(right_frame, bg="#121212", highlightthickness=0)
+    right_scrollbar = ttk.Scrollbar(right_frame, orient="vertical", command=right_canvas.yview, style="Custom.Vertical.TScrollbar")
+    convert_frame = tk.Frame(right_canvas, bg="#121212")
+    convert_frame.bind("<Configure>", lambda e: right_canvas.configure(scrollregion=right_canvas.bbox("all")))
+    right_canvas.create_window((0, 0), window=convert_frame, anchor="nw", width=580)
+    right_canvas.configure(yscrollcommand=right_scrollbar.set)
+    main_pane.add(right_frame, minsize=600)
+    right_canvas.pack(side="left", fill="both", expand=True)
+    right_scrollbar.pack(side="right", fill="y")
+
+    # Controls
+    tk.Label(convert_frame, text="Convert Video To:", font=("Courier New", 12, "bold"), fg="#00ffcc", bg="#121212").pack(anchor="w", pady=5, padx=10)
+    output_format_var = tk.StringVar(value="mp4")
+    fmt_frame = tk.Frame(convert_frame, bg="#121212"); fmt_frame.pack(anchor="w", padx=10)
+    for i, (text, value) in enumerate(FORMATS):
+        tk.Radiobutton(fmt_frame, text=text, variable=output_format_var, value=value,
+                       font=("Courier New", 12), fg="#00ffcc", bg="#121212",
+                       selectcolor="#121212").grid(row=i//5, column=i%5, padx=5, pady=3, sticky="w")
+
+    tk.Label(convert_frame, text="Select Video Codec:", font=("Courier New", 12, "bold"), fg="#00ffcc", bg="#121212").pack(anchor="w", pady=5, padx=10)
+    codec_var = tk.StringVar(value="libx264")
+    codec_frame = tk.Frame(convert_frame, bg="#121212"); codec_frame.pack(anchor="w", padx=10)
+    for i, (text, value) in enumerate(CODECS):
+        tk.Radiobutton(codec_frame, text=text, variable=codec_var, value=value,
+                       font=("Courier New", 12), fg="#00ffcc", bg="#121212",
+                       selectcolor="#121212").grid(row=i//5, column=i%5, padx=5, pady=3, sticky="w")
+
+    tk.Label(convert_frame, text="Select Resolution:", font=("Courier New", 12, "bold"), fg="#00ffcc", bg="#121212").pack(anchor="w", pady=5, padx=10)
+    resolution_var = tk.StringVar(value="same")
+    res_options = [("Same as Original", "same")] + [(label, f"{w}:{h}") for label, (w, h) in RESOLUTIONS.items()]
+    res_frame = tk.Frame(convert_frame, bg="#121212"); res_frame.pack(anchor="w", padx=10)
+    for i, (label, val) in enumerate(res_options):
+        tk.Radiobutton(res_frame, text=label, variable=resolution_var, value=val,
+                       font=("Courier New", 12), fg="#00ffcc", bg="#121212",
+                       selectcolor="#121212").grid(row=i//4, column=i%4, padx=5, pady=3,sticky="w")
+
+    tk.Label(convert_frame, text="Select Bit Depth:", font=("Courier New", 12, "bold"), fg="#00ffcc", bg="#121212").pack(anchor="w", pady=5, padx=10)
+    bitdepth_var = tk.StringVar(value="same")
+    bit_frame = tk.Frame(convert_frame, bg="#121212"); bit_frame.pack(anchor="w", padx=10)
+    for i, (text, val) in enumerate(BITDEPTHS):
+        tk.Radiobutton(bit_frame, text=text, variable=bitdepth_var, value=val,
+                       font=("Courier New", 12), fg="#00ffcc", bg="#121212",
+                       selectcolor="#121212").grid(row=i//2, column=i%2, padx=5, pady=3, sticky="w")
+
+    tk.Label(convert_frame, text="Select Preset:", font=("Courier New", 12, "bold"), fg="#00ffcc", bg="#121212").pack(anchor="w", pady=5, padx=10)
+    preset_var = tk.StringVar(value="default")
+    preset_frame = tk.Frame(convert_frame, bg="#121212"); preset_frame.pack(anchor="w", padx=10)
+    for i, (text, val) in enumerate(PRESETS):
+        tk.Radiobutton(preset_frame, text=text, variable=preset_var, value=val,
+                       font=("Courier New", 12), fg="#00ffcc", bg="#121212",
+                       selectcolor="#121212").grid(row=i//4, column=i%4, padx=5, pady=3, sticky="w")
+
+    # Ladder: several resolutions from one decode
+    tk.Label(convert_frame, text="Ladder (one output per ticked resolution):", font=("Courier New", 12, "bold"), fg="#00ffcc", bg="#121212").pack(anchor="w", pady=5, padx=10)
+    ladder_vars = {}
+    ladder_frame = tk.Frame(convert_frame, bg="#121212"); ladder_frame.pack(anchor="w", padx=10)
+    for i, label in enumerate(RESOLUTIONS):
+        ladder_vars[label] = tk.BooleanVar(value=False)
+        tk.Checkbutton(ladder_frame, text=label, variable=ladder_vars[label],
+                       font=("Courier New", 12), fg="#00ffcc", bg="#121212",
+                       selectcolor="#121212").grid(row=i//4, column=i%4, padx=5, pady=3, sticky="w")
+
+    # Stream copy fast path
+    smart_copy_var = tk.BooleanVar(value=True)
+    tk.Checkbutton(convert_frame, text="Copy streams that already match (skip needless re-encodes)",
+                   variable=smart_copy_var, font=("Courier New", 11),
+                   fg="#00ffcc", bg="#121212", selectcolor="#121212").pack(anchor="w", pady=5, padx=10)
+
+    # Segmented encoding
+    segmented_var = tk.BooleanVar(value=False)
+    tk.Checkbutton(convert_frame, text="Segmented encode (split at keyframes, encode chunks in parallel)",
+                   variable=segmented_var, font=("Courier New", 11),
+                   fg="#00ffcc", bg="#121212", selectcolor="#121212").pack(anchor="w", pady=5, padx=10)
+
+    # Trim: frame-accurate smart cut, only the GOPs at the cut points are re-encoded
+    tk.Label(convert_frame, text="Trim (with Copy; empty keeps the whole file):", font=("Courier New", 12, "bold"), fg="#00ffcc", bg="#121212").pack(anchor="w", pady=5, padx=10)
+    trim_start_var = tk.StringVar(value="")
+    trim_end_var = tk.StringVar(value="")
+    trim_frame = tk.Frame(convert_frame, bg="#121212"); trim_frame.pack(anchor="w", padx=10)
+    for i, (text, var) in enumerate((("Start:", trim_start_var), ("End:", trim_end_var))):
+        tk.Label(trim_frame, text=text, font=("Courier New", 12), fg="#00ffcc",
+                 bg="#121212").grid(row=0, column=i*2, padx=5, pady=3, sticky="w")
+        tk.Entry(trim_frame, textvariable=var, width=12, font=("Courier New", 12), relief="flat", bd=1,
+                 bg="#1e1e1e", fg="#00ffcc", insertbackground="#00ffcc").grid(row=0, column=i*2+1, padx=5, pady=3)
+
+    # Job queue
+    tk.Label(convert_frame, text="Job Queue:", font=("Courier New", 12, "bold"), fg="#00ffcc", bg="#121212").pack(anchor="w", pady=5, padx=10)
+    style.configure("Treeview", background="#1e1e1e", fieldbackground="#1e1e1e", foreground="#00ffcc", font=("Courier New", 10))
+    queue_tree = ttk.Treeview(convert_frame, columns=("file", "status", "progress", "speed"), show="headings", height=6)
+    queue_tree.heading("file", text="File")
+    queue_tree.heading("status", text="Status")
+    queue_tree.heading("progress", text="Progress")
+    queue_tree.heading("speed", text="Speed / ETA")
+    queue_tree.column("file", width=200)
+    queue_tree.column("status", width=80)
+    queue_tree.column("progress", width=70, anchor="e")
+    queue_tree.column("speed", width=160)
+    queue_tree.bind("<<TreeviewSelect>>", on_job_selected)
+    queue_tree.pack(fill="x", padx=10, pady=5)
+
+    # Progress bar
+    progress_bar = ttk.Progressbar(convert_frame, orient="horizontal", length=400, mode="determinate")
+    progress_bar.pack(pady=10, padx=10)
+
+    # Log output
+    log_text = tk.Text(convert_frame, height=10, bg="#1e1e1e", fg="#00ffcc", font=("Courier New", 10))
+    log_text.pack(fill="x", padx=10, pady=5)
+
+    # Convert & Cancel buttons
+    btn_frame = tk.Frame(convert_frame, bg="#121212")
+    btn_frame.pack(pady=10)
+    tk.Button(btn_frame, text="Convert", command=convert_video,
+              font=("Courier New", 14, "bold"), bg="#00ffcc", fg="black", relief="flat",
+              padx=20, pady=10).grid(row=0, column=0, padx=5)
+    tk.Button(btn_frame, text="Cancel", command=cancel_conversion,
+              font=("Courier New", 14, "bold"), bg="#ff4444", fg="white", relief="flat",
+              padx=20, pady=10).grid(row=0, column=1, padx=5)
+    tk.Button(btn_frame, text="Retry", command=retry_jobs,
+              font=("Courier New", 14, "bold"), bg="#ffaa00", fg="black", relief="flat",
+              padx=20, pady=10).grid(row=0, column=2, padx=5)
+    tk.Button(btn_frame, text="Convert Folder", command=convert_folder,
+              font=("Courier New", 14, "bold"), bg="#00ffcc", fg="black", relief="flat",
+              padx=20, pady=10).grid(row=1, column=0, columnspan=3, pady=(10, 0))
+    tk.Button(btn_frame, text="Save Profile", command=save_current_profile,
+              font=("Courier New", 12), bg="#212121", fg="#00ffcc", relief="flat",
+              padx=20, pady=6).grid(row=2, column=0, columnspan=3, pady=(10, 0))
+
+    # Runs as many ffmpeg jobs at once as the cores allow for the chosen codecs,
+    # each on its own CPUs, keeps them in the job store so a crash doesn't lose them
+    # and logs every finished job's metrics to metrics.jsonl
+    scheduler = JobScheduler(on_update=on_job_update, on_log=on_job_log, store=JobStore(),
+                             governor=Governor(), telemetry=Telemetry())
+    root.after(UI_POLL_MS, pump_events)
+    root.after(0, offer_resume)
+
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+from vidoc.autotune import SAMPLE_COUNT, SAMPLE_SECONDS, choose, parse_scores, sample_times
+
+
+def _trial(ssim, kbps, crf=23):
+    return {"crf": crf, "ssim": ssim, "kbps": kbps}
+
+
+def test_ssim_target_picks_the_fastest_preset_near_the_smallest_file():
+    results = [("veryfast", _trial(0.981, 1000)), ("fast", _trial(0.982, 900)), ("slow", _trial(0.981, 880))]
+    # slow saves less than 5% over fast
+    assert choose(results, {"ssim": 0.98})[0] == "fast"
+    results = [("veryfast", _trial(0.981, 1000)), ("slow", _trial(0.981, 970))]
+    assert choose(results, {"ssim": 0.98})[0] == "veryfast"
+
+
+def test_presets_below_the_target_are_ignored():
+    results = [("veryfast", _trial(0.975, 500)), ("slow", _trial(0.981, 900))]
+    assert choose(results, {"ssim": 0.98})[0] == "slow"
+
+
+def test_kbps_target_picks_the_fastest_preset_near_the_best_quality():
+    results = [("veryfast", _trial(0.980, 950)), ("slow", _trial(0.9815, 990))]
+    assert choose(results, {"kbps": 1000})[0] == "veryfast"
+    results = [("veryfast", _trial(0.980, 950)), ("slow", _trial(0.985, 990))]
+    assert choose(results, {"kbps": 1000})[0] == "slow"
+
+
+def test_both_targets_take_the_fastest_that_meets_them():
+    results = [("veryfast", _trial(0.97, 800)), ("fast", _trial(0.981, 990)), ("slow", _trial(0.99, 700))]
+    assert choose(results, {"ssim": 0.98, "kbps": 1000})[0] == "fast"
+
+
+def test_unreachable_target():
+    # Best quality under the bitrate cap
+    results = [("veryfast", _trial(0.95, 900)), ("slow", _trial(0.96, 950)), ("slower", _trial(0.97, 1100))]
+    assert choose(results, {"ssim": 0.99, "kbps": 1000})[0] == "slow"
+    # Nothing under the cap either: the smallest file
+    results = [("veryfast", _trial(0.95, 1200)), ("slow", _trial(0.96, 1100))]
+    assert choose(results, {"kbps": 1000})[0] == "slow"
+    # No cap: the best quality
+    assert choose(results, {"ssim": 0.99})[0] == "slow"
+
+
+def test_choose_returns_the_trial():
+    trial = _trial(0.99, 500, crf=20)
+    assert choose([("default", trial)], {"ssim": 0.98}) == ("default", trial)
+
+
+def test_sample_times_spread_over_the_source():
+    samples = sample_times(120.0)
+    assert len(samples) == SAMPLE_COUNT
+    assert [start for start, _ in samples] == [13.5, 43.5, 73.5, 103.5]
+    assert all(length == SAMPLE_SECONDS for _, length in samples)
+
+
+def test_short_sources_are_one_sample():
+    assert sample_times(10.0) == [(0.0, 10.0)]
+    assert sample_times(None) == [(0.0, SAMPLE_SECONDS)]
+
+
+def test_parse_scores():
+    log = ("[Parsed_ssim_0 @ 0x1] SSIM Y:0.990 (20.0) U:0.99 V:0.99 All:0.985432 (18.4)\n"
+           "[Parsed_psnr_1 @ 0x2] PSNR y:40.1 u:44 v:44 average:41.25 min:30 max:50\n")
+    assert parse_scores(log) == (0.985432, 41.25)
+    assert parse_scores("SSIM Y:1.0 All:1.000000 (inf)\nPSNR y:inf average:inf min:inf") == (1.0, float("inf"))
+    assert parse_scores("SSIM Y:0.9 All:0.95 (13)\n") == (0.95, None)
+    assert parse_scores("Conversion failed!") == (None, None)
@@ -0,0 +1,75 @@
+import pytest
+
+from vidoc.bench import build_cases, compare
+from vidoc.jobs import DONE, FAILED
+
+CID = "640x360_5s/libx264/medium/same/same"
+
+
+def _results(cases=None, overhead=None):
+    return {"cases": cases or {}, "overhead": overhead or {}}
+
+
+def _case(**metrics):
+    return dict({"status": DONE}, **metrics)
+
+
+def test_slower_case_is_a_regression():
+    regressions = compare(_results({CID: _case(wall_seconds=1.0)}), _results({CID: _case(wall_seconds=1.2)}))
+    assert len(regressions) == 1
+    name, metric, before, after, change = regressions[0]
+    assert (name, metric, before, after) == (CID, "wall_seconds", 1.0, 1.2)
+    assert change == pytest.approx(0.2)
+
+
+def test_higher_is_better_metrics():
+    old = _results({CID: _case(fps=100.0)})
+    assert [r[:2] for r in compare(old, _results({CID: _case(fps=80.0)}))] == [(CID, "fps")]
+    assert compare(old, _results({CID: _case(fps=120.0)})) == []
+
+
+def test_changes_within_the_threshold_are_not_regressions():
+    old = _results({CID: _case(output_bytes=1000)})
+    assert compare(old, _results({CID: _case(output_bytes=1100)})) == []
+    assert compare(old, _results({CID: _case(output_bytes=1101)}))[0][1] == "output_bytes"
+    assert compare(old, _results({CID: _case(output_bytes=1101)}), threshold=0.2) == []
+
+
+def test_small_absolute_differences_are_noise():
+    # 40% slower, but only by 40 ms
+    old = _results({CID: _case(wall_seconds=0.10)}, {"progress_us_per_block": 10.0, "a.mkv/plan_ms": 0.2})
+    new = _results({CID: _case(wall_seconds=0.14)}, {"progress_us_per_block": 12.0, "a.mkv/plan_ms": 0.6})
+    assert compare(old, new) == [("progress_us_per_block", "progress_us_per_block", 10.0, 12.0,
+                                  pytest.approx(0.2))]
+
+
+def test_case_that_stopped_working():
+    old = _results({CID: _case(wall_seconds=1.0)})
+    new = _results({CID: {"status": FAILED, "error": "boom"}})
+    assert compare(old, new) == [(CID, "status", DONE, FAILED, None)]
+    # A case that never worked isn't a regression
+    assert compare(new, new) == []
+
+
+def test_missing_cases_and_metrics_are_skipped():
+    old = _results({CID: _case(wall_seconds=1.0, peak_rss_bytes=100)}, {"a.mkv/probe_seconds": 0.1})
+    assert compare(old, _results()) == []
+    assert compare(old, _results({CID: _case(wall_seconds=1.0)})) == []
+
+
+def test_from_zero_is_an_infinite_change():
+    old = _results({}, {"a.mkv/probe_cached_ms": 0.0})
+    new = _results({}, {"a.mkv/probe_cached_ms": 2.0})
+    assert compare(old, new) == [("a.mkv/probe_cached_ms", "probe_cached_ms", 0.0, 2.0, float("inf"))]
+
+
+def test_build_cases_drops_combinations_that_do_not_differ():
+    cases = build_cases(["libx264", "libvpx-vp9", "copy"], ["ultrafast", "medium"], ["same", "640:360"],
+                        ["same"])
+    keys = [(c["codec"], c["preset"], c["resolution"], c["pix_fmt"]) for c in cases]
+    assert keys == [
+        ("libx264", "ultrafast", "same", "same"), ("libx264", "ultrafast", "640:360", "same"),
+        ("libx264", "medium", "same", "same"), ("libx264", "medium", "640:360", "same"),
+        ("libvpx-vp9", "default", "same", "same"), ("libvpx-vp9", "default", "640:360", "same"),
+        ("copy", "default", "same", "same"),
+    ]
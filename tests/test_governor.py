@@ -0,0 +1,104 @@
+import pytest
+
+from vidoc import governor
+from vidoc.governor import Governor, Resources, parse_ionice
+
+
+class FakeJob:
+    def __init__(self, id, weight):
+        self.id = id
+        self.weight = weight
+        self.process = None
+        self.resources = None
+
+
+@pytest.mark.parametrize("cpus, weights, shares", [
+    (8, [1, 1], [4, 4]),
+    (32, [4, 4, 6], [9, 9, 14]),
+    # Leftover CPUs go to the largest remainders
+    (7, [4, 4], [4, 3]),
+    (10, [1, 1, 1], [4, 3, 3]),
+    (8, [3, 2, 1], [4, 3, 1]),
+    # Small jobs still get one CPU, taken back from the biggest
+    (4, [6, 1, 1], [2, 1, 1]),
+    (4, [100, 1, 1], [2, 1, 1]),
+    # More jobs than CPUs: one each, sharing
+    (2, [1, 1, 1], [1, 1, 1]),
+    (1, [5], [1]),
+])
+def test_shares(cpus, weights, shares):
+    assert Governor(cpus=range(cpus), pin=False).shares(weights) == shares
+
+
+@pytest.mark.parametrize("cpus", [4, 7, 12, 64])
+@pytest.mark.parametrize("weights", [[1, 2, 3], [5, 5, 5, 1], [2, 9]])
+def test_shares_use_every_cpu_once(cpus, weights):
+    shares = Governor(cpus=range(cpus), pin=False).shares(weights)
+    assert sum(shares) == cpus
+    assert min(shares) >= 1
+
+
+def test_jobs_get_disjoint_cpus():
+    gov = Governor(cpus=range(8))
+    gov.pin = True
+    a, b = FakeJob(1, 3), FakeJob(2, 1)
+    gov.acquire(a)
+    # Alone: no pinning, ffmpeg picks the thread count
+    assert a.resources.threads is None and a.resources.cpus == ()
+    gov.acquire(b)
+    assert a.resources.cpus == (0, 1, 2, 3, 4, 5)
+    assert b.resources.cpus == (6, 7)
+    assert (a.resources.threads, b.resources.threads) == (6, 2)
+    gov.release(a)
+    assert b.resources.threads is None and b.resources.cpus == ()
+
+
+def test_more_jobs_than_cpus_share_all_of_them():
+    gov = Governor(cpus=range(2))
+    gov.pin = True
+    jobs = [FakeJob(i, 1) for i in range(3)]
+    for job in jobs:
+        gov.acquire(job)
+    assert all(job.resources.cpus == () and job.resources.threads == 1 for job in jobs)
+
+
+def test_weightless_jobs_get_no_share():
+    gov = Governor(cpus=range(4))
+    waiting, encode = FakeJob(1, 0), FakeJob(2, 2)
+    gov.acquire(waiting)
+    gov.acquire(encode)
+    assert waiting.resources is None
+    assert encode.resources.threads is None
+
+
+def test_command_adds_threads_per_output():
+    cmd = ["ffmpeg", "-y", "-i", "in.mkv", "-c:v", "libx264", "a.mp4", "-c:v", "libx264", "b.mp4"]
+    assert Resources(threads=3).command(cmd, outputs=["a.mp4"]) == [
+        "ffmpeg", "-filter_threads", "3", "-filter_complex_threads", "3", "-y", "-i", "in.mkv",
+        "-c:v", "libx264", "-threads", "3", "a.mp4", "-c:v", "libx264", "-threads", "3", "b.mp4"]
+    # An input with the name of an output is left alone
+    assert Resources(threads=3).command(["ffmpeg", "-i", "a.mp4", "-f", "null", "-"], outputs=["a.mp4"]) == [
+        "ffmpeg", "-filter_threads", "3", "-filter_complex_threads", "3", "-i", "a.mp4",
+        "-f", "null", "-threads", "3", "-"]
+    assert Resources().command(cmd) == cmd
+
+
+def test_command_runs_through_taskset(monkeypatch):
+    monkeypatch.setattr(governor, "TASKSET", "/usr/bin/taskset")
+    cmd = ["ffmpeg", "-i", "in.mkv", "out.mkv"]
+    assert Resources(threads=2, cpus=(2, 3)).command(cmd) == [
+        "/usr/bin/taskset", "-c", "2,3", "ffmpeg", "-filter_threads", "2", "-filter_complex_threads", "2",
+        "-i", "in.mkv", "-threads", "2", "out.mkv"]
+    monkeypatch.setattr(governor, "TASKSET", None)
+    assert Resources(threads=2, cpus=(2, 3)).command(cmd)[0] == "ffmpeg"
+
+
+@pytest.mark.parametrize("value, parsed", [("idle", (3, 4)), ("best-effort:7", (2, 7)), ("realtime:0", (1, 0))])
+def test_parse_ionice(value, parsed):
+    assert parse_ionice(value) == parsed
+
+
+@pytest.mark.parametrize("value", ["low", "best-effort:8", "idle:x"])
+def test_parse_ionice_rejects(value):
+    with pytest.raises(ValueError):
+        parse_ionice(value)
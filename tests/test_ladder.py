@@ -0,0 +1,64 @@
+from vidoc.command import build_ladder_command
+from vidoc.ladder import main_video_stream, make_renditions, plan_ladder
+
+COVER = {"index": 0, "codec_type": "video", "codec_name": "mjpeg", "disposition": {"attached_pic": 1}}
+VIDEO = {"index": 1, "codec_type": "video", "codec_name": "h264", "width": 1920, "height": 1080,
+         "pix_fmt": "yuv420p", "disposition": {"attached_pic": 0}}
+AUDIO = {"index": 2, "codec_type": "audio", "codec_name": "aac", "channels": 2}
+INFO = {"streams": [COVER, VIDEO, AUDIO]}
+
+
+def test_make_renditions():
+    renditions = make_renditions("/out/movie.mp4", ["720p (HD)", "360p"], "libx264", preset="fast", crf=23)
+    assert [(r["output"], r["resolution"]) for r in renditions] == [
+        ("/out/movie_720p.mp4", "1280:720"), ("/out/movie_360p.mp4", "640:360")]
+    assert all(r["video_codec"] == "libx264" and r["preset"] == "fast" and r["crf"] == 23 for r in renditions)
+
+
+def test_main_video_stream_skips_cover_art():
+    assert main_video_stream(INFO) == "v:1"
+    assert main_video_stream({"streams": [COVER, AUDIO]}) is None
+
+
+def test_plan_ladder_problems():
+    renditions = make_renditions("movie.mkv", ["360p"], "copy")
+    assert plan_ladder(INFO, renditions)[1] == ["A ladder needs a video codec to encode with, not copy"]
+    assert plan_ladder({"streams": [AUDIO]}, renditions) == (None, ["The input has no video stream to scale"])
+    renditions = make_renditions("movie.webm", ["360p"], "libx264")
+    _, problems = plan_ladder(INFO, renditions)
+    assert problems and all(problem.startswith("movie_360p.webm: ") for problem in problems)
+
+
+def test_plan_ladder_follows_kept_streams():
+    renditions = make_renditions("movie.mkv", ["360p"], "libx264")
+    video_stream, problems = plan_ladder(INFO, renditions, streams=[{"id": "v:0"}, {"id": "a:2"}])
+    assert (video_stream, problems) == ("v:0", [])
+    assert [entry["id"] for entry in renditions[0]["plan"]] == ["v:0", "a:2"]
+
+
+def test_build_ladder_command_splits_one_decode():
+    # The cover art is copied after each rendition's scaled video
+    renditions = make_renditions("movie.mp4", ["720p (HD)", "360p"], "libx264", preset="fast", crf=23)
+    video_stream, problems = plan_ladder(INFO, renditions)
+    assert problems == []
+    cmd = build_ladder_command("in.mkv", renditions, video_stream)
+    assert cmd == [
+        "ffmpeg", "-y", "-i", "in.mkv", "-filter_complex",
+        "[0:1]split=2[s0][s1];[s0]scale=1280:720[v0];[s1]scale=640:360[v1]",
+        "-map", "[v0]", "-c:v:0", "libx264", "-preset:v:0", "fast", "-crf:v:0", "23",
+        "-map", "0:0", "-c:v:1", "copy", "-map", "0:2", "-c:a:0", "copy",
+        "-map_metadata", "0", "movie_720p.mp4",
+        "-map", "[v1]", "-c:v:0", "libx264", "-preset:v:0", "fast", "-crf:v:0", "23",
+        "-map", "0:0", "-c:v:1", "copy", "-map", "0:2", "-c:a:0", "copy",
+        "-map_metadata", "0", "movie_360p.mp4",
+    ]
+
+
+def test_build_ladder_command_single_rendition():
+    rendition = {"output": "movie_source.webm", "video_codec": "libvpx-vp9", "resolution": "same",
+                 "pix_fmt": "yuv420p10le", "preset": "default", "crf": 30, "plan": []}
+    assert build_ladder_command("in.mkv", [rendition], "v:0") == [
+        "ffmpeg", "-y", "-i", "in.mkv", "-filter_complex", "[0:0]null[v0]",
+        "-map", "[v0]", "-c:v:0", "libvpx-vp9", "-pix_fmt:v:0", "yuv420p10le",
+        "-crf:v:0", "30", "-b:v:0", "0", "-map_metadata", "0", "movie_source.webm",
+    ]
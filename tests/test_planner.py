@@ -0,0 +1,91 @@
+from vidoc.command import plan_options
+from vidoc.planner import plan_streams, plan_weight
+
+
+def _info(*streams):
+    return {"streams": [dict(stream, index=i) for i, stream in enumerate(streams)]}
+
+
+H264 = {"codec_type": "video", "codec_name": "h264", "width": 1920, "height": 1080, "pix_fmt": "yuv420p"}
+AAC = {"codec_type": "audio", "codec_name": "aac", "channels": 2, "bit_rate": "128000"}
+FLAC = {"codec_type": "audio", "codec_name": "flac", "channels": 2}
+SRT = {"codec_type": "subtitle", "codec_name": "subrip"}
+PGS = {"codec_type": "subtitle", "codec_name": "hdmv_pgs_subtitle"}
+FONT = {"codec_type": "attachment", "codec_name": "ttf"}
+
+
+def _codecs(plan):
+    return {entry["id"]: entry["codec"] for entry in plan}
+
+
+def test_matching_video_is_smart_copied():
+    plan, problems = plan_streams(_info(H264, AAC), "mkv", "libx264")
+    assert problems == []
+    assert _codecs(plan) == {"v:0": "copy", "a:1": "copy"}
+
+
+def test_smart_copy_needs_same_size_and_pixel_format():
+    assert _codecs(plan_streams(_info(H264), "mkv", "libx264", "1280:720")[0]) == {"v:0": "libx264"}
+    assert _codecs(plan_streams(_info(H264), "mkv", "libx264", "1920:1080")[0]) == {"v:0": "copy"}
+    assert _codecs(plan_streams(_info(H264), "mkv", "libx264", pix_fmt="yuv420p10le")[0]) == {"v:0": "libx264"}
+    assert _codecs(plan_streams(_info(H264), "mkv", "libx264", smart_copy=False)[0]) == {"v:0": "libx264"}
+
+
+def test_crf_and_auto_preset_always_encode():
+    assert _codecs(plan_streams(_info(H264), "mkv", "libx264", crf=23)[0]) == {"v:0": "libx264"}
+    assert _codecs(plan_streams(_info(H264), "mkv", "libx264", preset="auto")[0]) == {"v:0": "libx264"}
+
+
+def test_audio_falls_back_to_container_encoder():
+    plan, problems = plan_streams(_info(H264, FLAC), "webm", "libvpx-vp9")
+    assert problems == []
+    assert _codecs(plan) == {"v:0": "libvpx-vp9", "a:1": "libopus"}
+
+
+def test_audio_reencode_skipped_when_source_is_not_better():
+    streams = [{"id": "a:0", "audio": {"codec": "aac", "bitrate": "128k", "channels": "2"}}]
+    plan, _ = plan_streams(_info(AAC), "mkv", "copy", streams=streams)
+    assert _codecs(plan) == {"a:0": "copy"}
+    streams[0]["audio"]["bitrate"] = "96k"
+    plan, _ = plan_streams(_info(AAC), "mkv", "copy", streams=streams)
+    assert plan[0]["codec"] == "aac" and plan[0]["bitrate"] == "96k"
+
+
+def test_subtitles_and_attachments_in_keep_all_mode():
+    # Text subtitles are converted, picture ones and attachments are dropped
+    plan, problems = plan_streams(_info(H264, SRT, PGS, FONT), "mp4", "libx264")
+    assert problems == []
+    assert _codecs(plan) == {"v:0": "copy", "s:1": "mov_text"}
+
+
+def test_explicitly_kept_streams_report_problems():
+    streams = [{"id": "v:0"}, {"id": "s:1"}]
+    plan, problems = plan_streams(_info(H264, PGS), "mp4", "libx264", streams=streams)
+    assert [entry["id"] for entry in plan] == ["v:0", "s:1"]
+    assert problems == ["Stream #1 (subtitle hdmv_pgs_subtitle): picture-based subtitles can't go into .mp4"]
+
+
+def test_attachments_get_their_own_specifier():
+    plan, problems = plan_streams(_info(H264, FONT, FONT), "mkv", "libx264")
+    assert problems == []
+    assert [entry["id"] for entry in plan] == ["v:0", "t:1", "t:2"]
+    opts = plan_options(plan)
+    assert opts[opts.index("0:1") + 1:opts.index("0:1") + 3] == ["-c:t:0", "copy"]
+    assert opts[opts.index("0:2") + 1:opts.index("0:2") + 3] == ["-c:t:1", "copy"]
+
+
+def test_incompatible_video_codec_is_reported_first():
+    _, problems = plan_streams(_info(H264), "webm", "libx264")
+    assert problems[0].startswith("The selected codec 'libx264'")
+
+
+def test_copied_video_the_container_refuses():
+    _, problems = plan_streams(_info(H264), "webm", "copy")
+    assert problems == ["Stream #0 (video h264) can't be copied into .webm; pick a video codec"]
+
+
+def test_remux_weighs_one_core():
+    plan, _ = plan_streams(_info(H264, AAC), "mkv", "libx264")
+    assert plan_weight(plan) == 1
+    plan, _ = plan_streams(_info(H264, AAC), "mkv", "libx265")
+    assert plan_weight(plan, cpu_count=16) > 1
@@ -0,0 +1,94 @@
+import pytest
+
+from vidoc.progress import ProgressParser, parse_time_to_seconds, with_progress
+
+
+def _block(**fields):
+    return [f"{key}={value}\n".encode() for key, value in fields.items()]
+
+
+def _feed(parser, lines):
+    records = [parser.feed(line) for line in lines]
+    assert records[:-1] == [None] * (len(records) - 1)
+    return records[-1]
+
+
+def test_record_per_block():
+    parser = ProgressParser(duration=20.0, interval=0)
+    record = _feed(parser, _block(frame="240", fps="59.9", bitrate="2048.5kbits/s", total_size="1024",
+                                  out_time_us="5000000", speed="2.5x", progress="continue"))
+    assert (record.frame, record.fps, record.bitrate, record.total_size) == (240, 59.9, 2048.5, 1024)
+    assert record.out_time == 5.0
+    assert record.speed == 2.5
+    assert record.percent == 25.0
+    assert record.eta == 6.0
+    assert not record.done
+
+
+def test_out_time_fallbacks():
+    parser = ProgressParser(interval=0)
+    # out_time_ms is in microseconds as well
+    assert _feed(parser, _block(out_time_ms="1500000", progress="continue")).out_time == 1.5
+    assert _feed(parser, _block(out_time="00:01:02.500000", progress="continue")).out_time == 62.5
+    assert _feed(parser, _block(out_time_us="N/A", out_time="00:00:03.000000", progress="continue")).out_time == 3.0
+
+
+def test_not_available_values():
+    parser = ProgressParser(duration=10.0, interval=0)
+    record = _feed(parser, _block(out_time_us="N/A", bitrate="N/A", speed="N/A", progress="continue"))
+    assert (record.out_time, record.bitrate, record.speed) == (None, None, None)
+    assert record.percent is None and record.eta is None
+
+
+def test_percent_is_clamped():
+    parser = ProgressParser(duration=10.0, interval=0)
+    assert _feed(parser, _block(out_time="-00:00:00.040000", progress="continue")).percent == 0.0
+    assert _feed(parser, _block(out_time_us="12000000", progress="continue")).percent == 100.0
+
+
+def test_unknown_duration_has_no_percent():
+    record = _feed(ProgressParser(interval=0), _block(out_time_us="1000000", speed="1x", progress="continue"))
+    assert record.percent is None and record.eta is None
+
+
+def test_end_block_is_done():
+    record = _feed(ProgressParser(duration=10.0), _block(out_time_us="9000000", progress="end"))
+    assert record.done and record.percent == 100.0 and record.eta == 0.0
+
+
+def test_blocks_are_throttled_but_the_end_is_not():
+    now = [0.0]
+    parser = ProgressParser(duration=10.0, interval=0.5, clock=lambda: now[0])
+    assert _feed(parser, _block(out_time_us="1000000", progress="continue")) is not None
+    now[0] = 0.2
+    assert _feed(parser, _block(out_time_us="2000000", progress="continue")) is None
+    assert parser.last.out_time == 2.0
+    now[0] = 0.6
+    assert _feed(parser, _block(out_time_us="3000000", progress="continue")).out_time == 3.0
+    now[0] = 0.7
+    assert _feed(parser, _block(out_time_us="4000000", progress="end")).done
+
+
+def test_fields_do_not_leak_between_blocks():
+    parser = ProgressParser(interval=0)
+    _feed(parser, _block(frame="10", progress="continue"))
+    assert _feed(parser, _block(out_time_us="1", progress="continue")).frame is None
+
+
+def test_lines_without_a_value_are_ignored():
+    parser = ProgressParser(interval=0)
+    assert parser.feed(b"[libx264 @ 0x5555] frame I:1\n") is None
+    assert parser.feed("") is None
+
+
+@pytest.mark.parametrize("text, seconds", [
+    ("00:00:01.500000", 1.5), ("01:00:00.000000", 3600.0), ("-00:00:00.023220", -0.02322),
+    ("N/A", None), (None, None),
+])
+def test_parse_time_to_seconds(text, seconds):
+    assert parse_time_to_seconds(text) == seconds
+
+
+def test_with_progress():
+    assert with_progress(["ffmpeg", "-i", "in.mkv", "out.mp4"]) == [
+        "ffmpeg", "-progress", "pipe:1", "-nostats", "-i", "in.mkv", "out.mp4"]
@@ -0,0 +1,28 @@
+from vidoc.segmented import plan_cuts
+
+
+def test_cuts_on_first_keyframe_after_each_stretch():
+    keyframes = [0.0, 4.0, 8.0, 12.0, 16.0, 20.0, 24.0, 28.0]
+    assert plan_cuts(keyframes, 32.0, 10) == [12.0, 24.0]
+
+
+def test_irregular_keyframes_restart_the_stretch_at_the_cut():
+    keyframes = [0.0, 11.0, 13.0, 21.5, 22.0, 40.0]
+    assert plan_cuts(keyframes, 60.0, 10) == [11.0, 21.5, 40.0]
+
+
+def test_no_short_last_segment():
+    keyframes = [0.0, 10.0, 20.0, 30.0]
+    # 34 - 30 = 4 < 5: the last 14 seconds stay one segment
+    assert plan_cuts(keyframes, 34.0, 10) == [10.0, 20.0]
+    # Half a segment is long enough
+    assert plan_cuts(keyframes, 35.0, 10) == [10.0, 20.0, 30.0]
+
+
+def test_unknown_duration_cuts_everywhere():
+    assert plan_cuts([0.0, 10.0, 20.0, 30.0], None, 10) == [10.0, 20.0, 30.0]
+
+
+def test_short_input_is_not_cut():
+    assert plan_cuts([0.0, 2.0, 4.0], 6.0, 10) == []
+    assert plan_cuts([], 100.0, 10) == []
@@ -0,0 +1,60 @@
+import pytest
+
+from vidoc.trim import encode_options, parse_timestamp, plan_cut
+
+KEYFRAMES = [0.0, 2.0, 4.0, 6.0, 8.0, 10.0]
+
+
+def test_partial_gops_around_a_copied_middle():
+    assert plan_cut(KEYFRAMES, 3.0, 7.0) == [("encode", 3.0, 4.0), ("copy", 4.0, 6.0), ("encode", 6.0, 7.0)]
+
+
+def test_cuts_on_keyframes_copy_everything():
+    assert plan_cut(KEYFRAMES, 2.0, 8.0) == [("copy", 2.0, 8.0)]
+    assert plan_cut(KEYFRAMES, 0.0, 10.0) == [("copy", 0.0, 10.0)]
+
+
+def test_cuts_within_epsilon_of_a_keyframe_are_on_it():
+    # Timestamps rounded by the GUI land a hair before or after the keyframe
+    assert plan_cut(KEYFRAMES, 4.0005, 7.9995) == [("copy", 4.0, 7.9995)]
+    assert plan_cut(KEYFRAMES, 3.9995, 8.0005) == [("copy", 4.0, 8.0005)]
+
+
+def test_end_past_the_last_keyframe():
+    assert plan_cut(KEYFRAMES, 7.0, 12.5) == [("encode", 7.0, 8.0), ("copy", 8.0, 10.0), ("encode", 10.0, 12.5)]
+
+
+def test_no_whole_gop_inside_encodes_all_of_it():
+    # Both cuts inside one GOP
+    assert plan_cut(KEYFRAMES, 4.5, 5.5) == [("encode", 4.5, 5.5)]
+    # A single keyframe inside: nothing to copy between first and last
+    assert plan_cut(KEYFRAMES, 3.0, 4.5) == [("encode", 3.0, 4.5)]
+    # Start after the last keyframe
+    assert plan_cut(KEYFRAMES, 11.0, 12.0) == [("encode", 11.0, 12.0)]
+    assert plan_cut([], 1.0, 2.0) == [("encode", 1.0, 2.0)]
+
+
+@pytest.mark.parametrize("text, seconds", [
+    ("95", 95.0), ("95.5", 95.5), ("1:35", 95.0), ("00:01:35.500", 95.5), (" 1:00:00 ", 3600.0),
+])
+def test_parse_timestamp(text, seconds):
+    assert parse_timestamp(text) == seconds
+
+
+@pytest.mark.parametrize("text", ["nan", "inf", "-inf", "1:nan", "-5", "abc", ""])
+def test_parse_timestamp_rejects(text):
+    with pytest.raises(ValueError):
+        parse_timestamp(text)
+
+
+def test_encode_options_match_the_source():
+    stream = {"codec_name": "h264", "pix_fmt": "yuv420p", "profile": "High", "level": 41,
+              "r_frame_rate": "30000/1001", "color_range": "tv", "color_space": "unknown"}
+    assert encode_options(stream) == ["-c:v", "libx264", "-crf", "16", "-pix_fmt", "yuv420p",
+                                      "-profile:v", "high", "-level:v", "4.1", "-r", "30000/1001",
+                                      "-color_range", "tv"]
+
+
+def test_encode_options_unknown_codec():
+    with pytest.raises(ValueError):
+        encode_options({"codec_name": "mpeg2video"})
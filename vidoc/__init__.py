@@ -0,0 +1 @@
+# ViDoc core: everything that does not need a Tk window lives in this package.
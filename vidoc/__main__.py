@@ -0,0 +1,5 @@
+import sys
+
+from vidoc.cli import main
+
+sys.exit(main())
@@ -0,0 +1,224 @@
+import os
+import re
+import time
+import shutil
+import tempfile
+import subprocess
+
+from vidoc.cache import default_cache
+from vidoc.command import crf_options, video_options
+from vidoc.probe import get_video_duration
+
+SAMPLE_COUNT = 4        # short samples spread over the source
+SAMPLE_SECONDS = 3.0
+DEFAULT_TARGET = {"ssim": 0.98}
+SIZE_TOLERANCE = 0.05   # a slower preset has to save more than this to be picked
+SSIM_TOLERANCE = 0.002  # ... or gain more than this at a bitrate target
+
+# Presets tried, fastest first. libvpx-vp9 and libaom-av1 have no -preset,
+# so only their CRF is searched.
+AUTO_PRESETS = {
+    "libx264": ["veryfast", "faster", "fast", "medium", "slow", "slower", "veryslow"],
+    "libx265": ["veryfast", "faster", "fast", "medium", "slow", "slower", "veryslow"],
+}
+# CRFs tried, best quality first
+CRF_VALUES = {
+    "libx264": list(range(14, 35, 2)),
+    "libx265": list(range(16, 37, 2)),
+    "libvpx-vp9": list(range(15, 52, 4)),
+    "libaom-av1": list(range(15, 52, 4)),
+}
+
+_SSIM = re.compile(r"SSIM .*All:([\d.]+)")
+_PSNR = re.compile(r"PSNR .*average:([\d.]+|inf)")
+
+
+def sample_times(duration):
+    # [(start, length)] of the samples, centred in equal slices of the source
+    if not duration or duration <= SAMPLE_COUNT * SAMPLE_SECONDS:
+        return [(0.0, duration or SAMPLE_SECONDS)]
+    step = duration / SAMPLE_COUNT
+    return [(step * (i + 0.5) - SAMPLE_SECONDS / 2, SAMPLE_SECONDS) for i in range(SAMPLE_COUNT)]
+
+
+def parse_scores(log):
+    # (ssim, psnr) from the summary lines the ssim and psnr filters print
+    ssim = _SSIM.search(log)
+    psnr = _PSNR.search(log)
+    if ssim is None:
+        return None, None
+    return float(ssim.group(1)), (float(psnr.group(1)) if psnr else None)
+
+
+def choose(results, target):
+    # results: [(preset, trial)] with the trial that got closest to the target
+    # for each preset, fastest preset first. Picks the fastest one that meets
+    # the target and isn't clearly beaten by a slower one.
+    ssim_target, kbps_target = target.get("ssim"), target.get("kbps")
+    met = [(preset, trial) for preset, trial in results
+           if (ssim_target is None or trial["ssim"] >= ssim_target)
+           and (kbps_target is None or trial["kbps"] <= kbps_target)]
+    if not met:
+        # Out of reach: the best quality under the bitrate cap, else the smallest file
+        capped = [r for r in results if kbps_target is None or r[1]["kbps"] <= kbps_target]
+        if capped:
+            return max(capped, key=lambda r: r[1]["ssim"])
+        return min(results, key=lambda r: r[1]["kbps"])
+    if ssim_target is not None and kbps_target is not None:
+        return met[0]
+    if ssim_target is not None:
+        smallest = min(trial["kbps"] for _, trial in met)
+        return next(r for r in met if r[1]["kbps"] <= smallest * (1 + SIZE_TOLERANCE))
+    best = max(trial["ssim"] for _, trial in met)
+    return next(r for r in met if r[1]["ssim"] >= best - SSIM_TOLERANCE)
+
+
+def _run_ffmpeg(cmd):
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    return result.returncode, result.stderr.decode("utf-8", "replace")
+
+
+# ---------- Auto Tune ----------
+class AutoTune:
+    # Picks a preset and CRF for one video stream from sample encodes: a few
+    # short samples are cut from the source once (scaled and converted as
+    # the real encode would, stored lossless), encoded with candidate
+    # settings and scored against themselves with ffmpeg's ssim and psnr
+    # filters. Quality falls as the CRF rises, so each preset needs only a
+    # binary search over CRF_VALUES. Every trial is cached per source file,
+    # so another target or a resumed job mostly re-reads results.
+    # target: {"ssim": minimum mean SSIM, "kbps": maximum video bitrate}, either or both.
+
+    def __init__(self, input_path, video_codec, stream=0, resolution="same", pix_fmt="same",
+                 target=None, cache=None, run=None, log=None, work_dir=None):
+        if video_codec not in CRF_VALUES:
+            raise ValueError(f"no automatic settings for {video_codec}")
+        self.input_path = input_path
+        self.video_codec = video_codec
+        self.stream = stream
+        self.resolution = resolution
+        self.pix_fmt = pix_fmt
+        self.target = target or DEFAULT_TARGET
+        self.cache = cache or default_cache()
+        self.run_ffmpeg = run or _run_ffmpeg
+        self.log = log or (lambda line: None)
+        self.work_dir = work_dir
+        self.samples = None
+        self._temp_dir = None
+        self.kind = f"autotune:{stream}:{video_codec}:{resolution}:{pix_fmt}"
+        self.trials = (self.cache.get(input_path, self.kind) or {}).get("trials", {})
+
+    def tune(self):
+        # {"preset", "crf", "ssim", "psnr", "kbps", "seconds"}
+        crfs = CRF_VALUES[self.video_codec]
+        results = []
+        hint = None
+        try:
+            for preset in AUTO_PRESETS.get(self.video_codec, ["default"]):
+                trial = self._search(preset, hint)
+                results.append((preset, trial))
+                hint = crfs.index(trial["crf"])
+        finally:
+            if self._temp_dir is not None:
+                shutil.rmtree(self._temp_dir, ignore_errors=True)
+        preset, trial = choose(results, self.target)
+        return dict(trial, preset=preset)
+
+    def _search(self, preset, hint=None):
+        # The trial with the highest CRF (smallest file) that still meets the
+        # target; the lowest CRF if none does. hint is the CRF index the next
+        # faster preset ended on: a slower preset reaches the same quality at
+        # an equal or higher CRF, and its files are smaller at the same CRF,
+        # so the search starts from there.
+        crfs = CRF_VALUES[self.video_codec]
+        ssim_target, kbps_target = self.target.get("ssim"), self.target.get("kbps")
+        lo, hi = 0, len(crfs) - 1
+        best = None
+        if ssim_target is None:
+            hi = hi if hint is None else hint
+            # Only a bitrate cap: the lowest CRF under it is the best quality
+            while lo <= hi:
+                mid = (lo + hi) // 2
+                trial = self._trial(preset, crfs[mid])
+                if trial["kbps"] <= kbps_target:
+                    best, hi = trial, mid - 1
+                else:
+                    lo = mid + 1
+            return best or self._trial(preset, crfs[-1])
+        lo = lo if hint is None else hint
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            trial = self._trial(preset, crfs[mid])
+            if trial["ssim"] >= ssim_target:
+                best, lo = trial, mid + 1
+            else:
+                hi = mid - 1
+        return best or self._trial(preset, crfs[0])
+
+    def _trial(self, preset, crf):
+        key = f"{preset}/{crf}"
+        if key in self.trials:
+            return self.trials[key]
+        samples = self._samples()
+        size = 0
+        seconds = 0.0
+        scores = []
+        for i, (ref, length) in enumerate(samples):
+            encoded = os.path.join(os.path.dirname(ref), f"trial_{i}.mkv")
+            cmd = ["ffmpeg", "-y", "-i", ref, "-map", "0:v:0"]
+            cmd += video_options(self.video_codec, preset=preset) + crf_options(self.video_codec, crf)
+            started = time.monotonic()
+            self._ffmpeg(cmd + [encoded])
+            seconds += time.monotonic() - started
+            size += os.path.getsize(encoded)
+            _, log = self._ffmpeg(["ffmpeg", "-i", encoded, "-i", ref, "-lavfi",
+                                   "[0:v]split[d1][d2];[1:v]split[r1][r2];[d1][r1]ssim;[d2][r2]psnr",
+                                   "-f", "null", "-"])
+            ssim, psnr = parse_scores(log)
+            if ssim is None:
+                raise RuntimeError("ffmpeg printed no SSIM score for a sample")
+            scores.append((ssim, psnr, length))
+        total = sum(length for _, _, length in scores) or 1
+        psnrs = [psnr for _, psnr, _ in scores if psnr is not None]
+        trial = {"crf": crf,
+                 "ssim": sum(ssim * length for ssim, _, length in scores) / total,
+                 "psnr": min(psnrs) if psnrs else None,
+                 "kbps": size * 8 / total / 1000,
+                 "seconds": seconds}
+        self.log(f"  {preset} crf {crf}: SSIM {trial['ssim']:.4f}, {trial['kbps']:.0f} kbps, "
+                 f"{seconds:.1f}s\n")
+        self.trials[key] = trial
+        self.cache.put(self.input_path, {"trials": dict(self.trials)}, self.kind)
+        return trial
+
+    def _samples(self):
+        # [(lossless sample path, length)], cut on first use
+        if self.samples is not None:
+            return self.samples
+        if self.work_dir is None:
+            self._temp_dir = tempfile.mkdtemp(prefix="vidoc-autotune-")
+        work_dir = self.work_dir or self._temp_dir
+        os.makedirs(work_dir, exist_ok=True)
+        filters = []
+        if self.resolution != "same":
+            w, h = self.resolution.split(":")
+            filters.append(f"scale={w}:{h}")
+        if self.pix_fmt != "same":
+            filters.append(f"format={self.pix_fmt}")
+        samples = []
+        for i, (start, length) in enumerate(sample_times(get_video_duration(self.input_path))):
+            path = os.path.join(work_dir, f"sample_{i}.mkv")
+            cmd = ["ffmpeg", "-y", "-ss", f"{start:.3f}", "-i", self.input_path, "-t", f"{length:.3f}",
+                   "-map", f"0:{self.stream}"]
+            if filters:
+                cmd += ["-vf", ",".join(filters)]
+            self._ffmpeg(cmd + ["-c:v", "ffv1", path])
+            samples.append((path, length))
+        self.samples = samples
+        return samples
+
+    def _ffmpeg(self, cmd):
+        returncode, log = self.run_ffmpeg(cmd)
+        if returncode != 0:
+            raise RuntimeError(f"sample encode failed: ffmpeg exited with code {returncode}")
+        return returncode, log
@@ -0,0 +1,272 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import statistics
+import subprocess
+
+from vidoc.cache import MetadataCache
+from vidoc.command import build_plan_command
+from vidoc.governor import Resources
+from vidoc.jobs import DONE
+from vidoc.paths import cache_dir
+from vidoc.planner import PlannedJob, plan_streams
+from vidoc.probe import probe_media, run_ffprobe
+from vidoc.progress import ProgressParser
+from vidoc.telemetry import measure
+
+RESULTS_VERSION = 1
+DEFAULT_SOURCES = [(640, 360, 5.0), (1280, 720, 5.0)]
+DEFAULT_CODECS = ["libx264", "libx265", "libvpx-vp9", "copy"]
+DEFAULT_PRESETS = ["ultrafast", "medium"]
+SOURCE_FPS = 30
+REGRESSION_THRESHOLD = 0.10
+PARSER_BLOCKS = 20000
+
+# What gets compared between runs, and which direction is better
+CASE_METRICS = {"wall_seconds": "lower", "fps": "higher", "output_bytes": "lower",
+                "python_cpu_seconds": "lower", "cpu_seconds": "lower", "peak_rss_bytes": "lower"}
+OVERHEAD_METRICS = {"progress_us_per_block": "lower", "plan_ms": "lower", "probe_seconds": "lower",
+                    "probe_cached_ms": "lower"}
+# Differences below these are noise, whatever the ratio
+ABSOLUTE_NOISE = {"wall_seconds": 0.05, "python_cpu_seconds": 0.02, "cpu_seconds": 0.05,
+                  "probe_seconds": 0.02, "probe_cached_ms": 0.5, "plan_ms": 0.5}
+
+# Codecs whose -preset means something (see vidoc.command.video_options)
+PRESET_CODECS = {"libx264", "libx265"}
+
+
+def source_name(width, height, duration):
+    return f"testsrc2-{width}x{height}-{duration:g}s.mkv"
+
+
+def make_source(path, width, height, duration):
+    # testsrc2 video and a sine tone, stored lossless and bitexact, so every
+    # machine and every run starts from the same frames
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={SOURCE_FPS}:duration={duration:g}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=48000:duration={duration:g}",
+        "-map", "0:v", "-map", "1:a", "-c:v", "ffv1", "-c:a", "flac",
+        "-fflags", "+bitexact", "-flags:v", "+bitexact", "-flags:a", "+bitexact",
+        f"{path}.tmp.mkv"
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg could not make {os.path.basename(path)}: {result.stderr.strip()}")
+    os.replace(f"{path}.tmp.mkv", path)
+    return path
+
+
+def build_cases(codecs, presets, resolutions, pix_fmts):
+    # The combinations that actually differ: a stream copy ignores every
+    # video setting, and -preset only means something to x264/x265
+    cases = []
+    seen = set()
+    for codec in codecs:
+        for preset in presets:
+            for resolution in resolutions:
+                for pix_fmt in pix_fmts:
+                    if codec == "copy":
+                        key = (codec, "default", "same", "same")
+                    elif codec not in PRESET_CODECS:
+                        key = (codec, "default", resolution, pix_fmt)
+                    else:
+                        key = (codec, preset, resolution, pix_fmt)
+                    if key not in seen:
+                        seen.add(key)
+                        cases.append(dict(zip(("codec", "preset", "resolution", "pix_fmt"), key)))
+    return cases
+
+
+def case_id(source, case):
+    return f"{os.path.splitext(source)[0]}/{case['codec']}/{case['preset']}/{case['resolution']}/{case['pix_fmt']}"
+
+
+def bench_progress_parser(blocks=PARSER_BLOCKS):
+    # Microseconds ViDoc spends per ffmpeg progress block
+    block = [b"frame=1234\n", b"fps=59.94\n", b"bitrate=2534.1kbits/s\n", b"total_size=10485760\n",
+             b"out_time_us=41200000\n", b"out_time=00:00:41.200000\n", b"speed=1.98x\n",
+             b"progress=continue\n"]
+    parser = ProgressParser(120.0, interval=0)
+    started = time.perf_counter()
+    for _ in range(blocks):
+        for line in block:
+            parser.feed(line)
+    return (time.perf_counter() - started) / blocks * 1e6
+
+
+def bench_probe(path, work_dir):
+    # (seconds for an uncached ffprobe, milliseconds for a cached probe)
+    started = time.perf_counter()
+    run_ffprobe(path)
+    cold = time.perf_counter() - started
+    cache = MetadataCache(os.path.join(work_dir, "bench-cache.sqlite"))
+    probe_media(path, cache)
+    started = time.perf_counter()
+    probe_media(path, cache)
+    return cold, (time.perf_counter() - started) * 1000
+
+
+def bench_plan(path, cases, rounds=50):
+    # Milliseconds to plan the streams and build the command of one conversion
+    info = probe_media(path)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for case in cases:
+            plan, _ = plan_streams(info, "mkv", case["codec"], case["resolution"], case["pix_fmt"])
+            build_plan_command(path, "out.mkv", plan, case["resolution"], case["pix_fmt"], case["preset"])
+    return (time.perf_counter() - started) / (rounds * len(cases)) * 1000
+
+
+def run_case(source_path, case, output_path, threads=None):
+    # One conversion through the same PlannedJob the app and "convert" use,
+    # measured like any scheduled job (vidoc.telemetry)
+    job = PlannedJob(source_path, output_path, "mkv", case["codec"], case["resolution"], case["pix_fmt"],
+                     case["preset"])
+    if threads:
+        job.resources = Resources(threads=threads, filter_threads=threads)
+    log = []
+    with measure(job):
+        job.run(lambda job: None, lambda job, line: log.append(line))
+    metrics = job.metrics
+    result = {"status": job.status, "wall_seconds": metrics.wall_seconds, "fps": metrics.fps,
+              "speed": metrics.speed, "output_bytes": metrics.output_bytes,
+              "cpu_seconds": metrics.cpu_user_seconds + metrics.cpu_system_seconds,
+              "peak_rss_bytes": metrics.peak_rss_bytes, "python_cpu_seconds": metrics.python_cpu_seconds}
+    if job.status != DONE:
+        result["error"] = job.error or "".join(log[-3:]).strip()
+    try:
+        os.remove(output_path)
+    except OSError:
+        pass
+    return result
+
+
+def summarize_runs(runs):
+    # Medians over the repeats; sizes come out the same every time
+    done = [run for run in runs if run["status"] == DONE]
+    if not done:
+        return dict(runs[-1], runs=len(runs))
+    summary = {"status": DONE, "runs": len(runs)}
+    for key in ("wall_seconds", "fps", "speed", "output_bytes", "cpu_seconds", "peak_rss_bytes",
+                "python_cpu_seconds"):
+        values = [run[key] for run in done if run[key] is not None]
+        summary[key] = statistics.median(values) if values else None
+    summary["wall_seconds_all"] = [run["wall_seconds"] for run in done]
+    return summary
+
+
+def host_info():
+    try:
+        version = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True).stdout.splitlines()[0]
+    except (OSError, IndexError):
+        version = None
+    return {"platform": platform.platform(), "machine": platform.machine(), "python": platform.python_version(),
+            "cpu_count": os.cpu_count(), "ffmpeg": version}
+
+
+def run_benchmark(sources=DEFAULT_SOURCES, codecs=DEFAULT_CODECS, presets=DEFAULT_PRESETS,
+                  resolutions=("same",), pix_fmts=("same",), repeat=3, threads=None, source_dir=None,
+                  log=None):
+    # Runs every case on every source; returns the results document
+    log = log or (lambda message: None)
+    source_dir = source_dir or os.path.join(cache_dir(), "bench")
+    os.makedirs(source_dir, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix="vidoc-bench-")
+    cases = build_cases(codecs, presets, resolutions, pix_fmts)
+    results = {"version": RESULTS_VERSION, "created": time.time(), "host": host_info(),
+               "settings": {"repeat": repeat, "threads": threads}, "overhead": {}, "cases": {}}
+    try:
+        results["overhead"]["progress_us_per_block"] = bench_progress_parser()
+        for width, height, duration in sources:
+            name = source_name(width, height, duration)
+            path = os.path.join(source_dir, name)
+            if not os.path.exists(path):
+                log(f"Making {name}")
+                make_source(path, width, height, duration)
+            cold, cached = bench_probe(path, work_dir)
+            key = os.path.splitext(name)[0]
+            results["overhead"][f"{key}/probe_seconds"] = cold
+            results["overhead"][f"{key}/probe_cached_ms"] = cached
+            results["overhead"][f"{key}/plan_ms"] = bench_plan(path, cases)
+
+            for case in cases:
+                cid = case_id(name, case)
+                output_path = os.path.join(work_dir, "out.mkv")
+                runs = [run_case(path, case, output_path, threads) for _ in range(repeat)]
+                summary = summarize_runs(runs)
+                results["cases"][cid] = dict(case, source=name, **summary)
+                if summary["status"] == DONE:
+                    log(f"{cid}: {summary['wall_seconds']:.2f}s, {summary['fps'] or 0:.1f} fps, "
+                        f"{summary['output_bytes'] / 1024:.0f} KiB")
+                else:
+                    log(f"{cid}: {summary['status']} ({summary.get('error')})")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def _worse(direction, old, new, threshold, noise):
+    # Relative change in the bad direction, or None if it isn't a regression
+    if old is None or new is None or old == new:
+        return None
+    change = (new - old) / old if old else float("inf")
+    if direction == "higher":
+        change = -change
+    if change <= threshold or abs(new - old) < noise:
+        return None
+    return change
+
+
+def compare(old, new, threshold=REGRESSION_THRESHOLD):
+    # [(name, metric, old, new, change)] for everything that got worse by
+    # more than threshold, plus cases that used to work and now don't.
+    # Timings from different hosts aren't comparable; sizes still are.
+    regressions = []
+    for cid, before in old.get("cases", {}).items():
+        after = new.get("cases", {}).get(cid)
+        if after is None:
+            continue
+        if before.get("status") == DONE and after.get("status") != DONE:
+            regressions.append((cid, "status", DONE, after.get("status"), None))
+            continue
+        for metric, direction in CASE_METRICS.items():
+            change = _worse(direction, before.get(metric), after.get(metric), threshold,
+                            ABSOLUTE_NOISE.get(metric, 0))
+            if change is not None:
+                regressions.append((cid, metric, before[metric], after[metric], change))
+    for name, before in old.get("overhead", {}).items():
+        metric = name.rsplit("/", 1)[-1]
+        change = _worse(OVERHEAD_METRICS.get(metric, "lower"), before, new.get("overhead", {}).get(name),
+                        threshold, ABSOLUTE_NOISE.get(metric, 0))
+        if change is not None:
+            regressions.append((name, metric, before, new["overhead"][name], change))
+    return regressions
+
+
+def format_regressions(regressions, out=sys.stdout):
+    for name, metric, before, after, change in regressions:
+        if change is None:
+            print(f"REGRESSION {name}: was {before}, now {after}", file=out)
+            continue
+        label = name if name.endswith(metric) else f"{name} {metric}"
+        print(f"REGRESSION {label}: {before:.4g} -> {after:.4g} ({change:+.0%})", file=out)
+
+
+def save_results(results, path):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+def load_results(path):
+    with open(path, encoding="utf-8") as f:
+        results = json.load(f)
+    if results.get("version") != RESULTS_VERSION:
+        raise ValueError(f"{path}: results version {results.get('version')}, expected {RESULTS_VERSION}")
+    return results
@@ -0,0 +1,171 @@
+import os
+import json
+import atexit
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from vidoc.paths import cache_dir
+
+# last_used only orders evictions, so hits are written back in batches
+TOUCH_BATCH = 200
+TOUCH_SECONDS = 60.0
+
+
+def file_key(path):
+    # (path, size, mtime) - any rewrite of the file gives a new key
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_size, st.st_mtime_ns
+
+
+# ---------- Metadata Cache ----------
+class MetadataCache:
+    # Per-file metadata (ffprobe output and friends) stored in SQLite with an
+    # in-memory LRU in front. Entries are keyed by (path, size, mtime) plus a
+    # "kind" so different kinds of metadata for one file live side by side.
+    # A database error (locked by another ViDoc process, say) is a cache miss,
+    # never a failed probe.
+
+    def __init__(self, db_path=None, max_entries=20000, memory_entries=256):
+        self.db_path = db_path or os.path.join(cache_dir(), "metadata.sqlite")
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._touched = {}   # (path, kind) -> last_used not yet written
+        self._flushed = time.monotonic()
+        self._lock = threading.Lock()
+        try:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " path TEXT, kind TEXT, size INTEGER, mtime_ns INTEGER,"
+                " value TEXT, last_used REAL, PRIMARY KEY (path, kind))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+            self._db.commit()
+        except sqlite3.Error:
+            # Read-only or broken cache dir: keep working with the memory cache only
+            self._db = None
+
+    def get(self, path, kind="probe"):
+        try:
+            key = file_key(path)
+        except OSError:
+            return None
+        mem_key = (key, kind)
+        with self._lock:
+            if mem_key in self._memory:
+                self._memory.move_to_end(mem_key)
+                return self._memory[mem_key]
+            if self._db is None:
+                return None
+            try:
+                row = self._db.execute(
+                    "SELECT size, mtime_ns, value, last_used FROM entries WHERE path = ? AND kind = ?",
+                    (key[0], kind)
+                ).fetchone()
+                if row is None:
+                    return None
+                if (row[0], row[1]) != key[1:]:
+                    # The file changed since it was cached
+                    self._db.execute("DELETE FROM entries WHERE path = ? AND kind = ?", (key[0], kind))
+                    self._db.commit()
+                    return None
+                now = time.time()
+                if now - (row[3] or 0) > TOUCH_SECONDS:
+                    self._touched[(key[0], kind)] = now
+                    self._flush_touched()
+            except sqlite3.Error:
+                self._rollback()
+                return None
+            value = json.loads(row[2])
+            self._remember(mem_key, value)
+            return value
+
+    def put(self, path, value, kind="probe"):
+        try:
+            key = file_key(path)
+        except OSError:
+            return
+        with self._lock:
+            self._remember((key, kind), value)
+            if self._db is None:
+                return
+            self._touched.pop((key[0], kind), None)
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries (path, kind, size, mtime_ns, value, last_used)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (key[0], kind, key[1], key[2], json.dumps(value), time.time())
+                )
+                self._flush_touched(force=True)
+                self._evict()
+                self._db.commit()
+            except sqlite3.Error:
+                self._rollback()  # still in the memory cache
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM entries")
+                self._db.commit()
+
+    def flush(self):
+        # Writes the pending last_used updates
+        with self._lock:
+            if self._db is not None:
+                try:
+                    self._flush_touched(force=True)
+                    self._db.commit()
+                except sqlite3.Error:
+                    self._rollback()
+
+    def _remember(self, mem_key, value):
+        self._memory[mem_key] = value
+        self._memory.move_to_end(mem_key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _flush_touched(self, force=False):
+        # Called with the lock held; put() commits along with its own write
+        if not self._touched:
+            return
+        if not force and len(self._touched) < TOUCH_BATCH and time.monotonic() - self._flushed < TOUCH_SECONDS:
+            return
+        touched, self._touched = self._touched, {}
+        self._flushed = time.monotonic()
+        self._db.executemany("UPDATE entries SET last_used = ? WHERE path = ? AND kind = ?",
+                             [(used, path, kind) for (path, kind), used in touched.items()])
+        if not force:
+            self._db.commit()
+
+    def _rollback(self):
+        try:
+            self._db.rollback()
+        except sqlite3.Error:
+            pass
+
+    def _evict(self):
+        count = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        if count > self.max_entries:
+            self._db.execute(
+                "DELETE FROM entries WHERE rowid IN"
+                " (SELECT rowid FROM entries ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = MetadataCache()
+            atexit.register(_default_cache.flush)
+        return _default_cache
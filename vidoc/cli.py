@@ -0,0 +1,465 @@
+import os
+import sys
+import json
+import argparse
+
+from vidoc.command import (AUDIO_CODECS, BITDEPTHS, CODECS, FORMATS, PRESETS, RESOLUTIONS,
+                           VIDEO_EXTENSIONS, batch_output_path)
+
+# Everything heavier is imported inside the subcommands so "python -m vidoc"
+# starts fast and never touches Tk.
+
+
+def parse_resolution(value):
+    # "same", "1280:720", "1280x720" or a label from the resolutions table ("720p")
+    value = value.strip()
+    if value == "same":
+        return value
+    for sep in (":", "x"):
+        w, _, h = value.partition(sep)
+        if w.isdigit() and h.isdigit():
+            return f"{w}:{h}"
+    for label, (w, h) in RESOLUTIONS.items():
+        if value.lower() in (label.lower(), label.split()[0].lower()):
+            return f"{w}:{h}"
+    raise argparse.ArgumentTypeError(f"unknown resolution '{value}'")
+
+
+def parse_bitdepth(value):
+    # "same", "8"/"10"/"12", "10-bit" or a pix_fmt such as yuv420p10le
+    for label, pix_fmt in BITDEPTHS:
+        if value in (pix_fmt, label, label.split("-")[0]):
+            return pix_fmt
+    return value
+
+
+def ladder_labels(value):
+    labels = []
+    for item in value.split(","):
+        resolution = parse_resolution(item)
+        for label, (w, h) in RESOLUTIONS.items():
+            if resolution == f"{w}:{h}":
+                labels.append(label)
+                break
+        else:
+            raise argparse.ArgumentTypeError(f"'{item}' is not in the resolutions table")
+    return labels
+
+
+# ---------- probe ----------
+def cmd_probe(args):
+    from vidoc.media import format_duration, format_size, summarize_media
+    from vidoc.probe import probe_media
+
+    status = 0
+    for path in args.files:
+        try:
+            media = summarize_media(probe_media(path), os.path.getsize(path))
+        except Exception as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            status = 1
+            continue
+        if args.json:
+            print(json.dumps({"path": path, **media}))
+            continue
+
+        print(path)
+        print(f"  Size: {format_size(media['size'])}  Duration: {format_duration(media['duration'])}"
+              + (f"  Bitrate: {media['bit_rate'] // 1000} kbps" if media["bit_rate"] else ""))
+        for stream in media["streams"]:
+            line = f"  #{stream['index']} {stream['type']:<9} {stream['codec']:<12} {stream['language']}"
+            if stream["type"] == "video":
+                line += f"  {stream['width']}x{stream['height']} @ {stream['fps']} fps"
+            elif stream["type"] == "audio":
+                line += f"  {stream.get('channels')} ch"
+            if stream["bit_rate"]:
+                line += f"  {stream['bit_rate'] // 1000} kbps"
+            print(line)
+    return status
+
+
+# ---------- probe-all ----------
+def cmd_probe_all(args):
+    import time
+    from vidoc.bulkprobe import PreviousRun, bulk_probe, iter_media_files
+
+    previous = PreviousRun(args.skip_unchanged) if args.skip_unchanged else None
+    extensions = tuple(f".{e.strip().lstrip('.').lower()}" for e in args.ext.split(","))
+    # Write next to the target and rename at the end, so the output can
+    # also be the --skip-unchanged input and a crash leaves the old file
+    out = open(f"{args.output}.tmp", "w", encoding="utf-8") if args.output else sys.stdout
+
+    counts = {"probed": 0, "unchanged": 0, "failed": 0}
+    start = time.monotonic()
+    try:
+        for record in bulk_probe(iter_media_files(args.roots, extensions), args.workers,
+                                 args.timeout, previous):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            if "error" in record:
+                counts["failed"] += 1
+                print(f"{record['path']}: {record['error']}", file=sys.stderr)
+            else:
+                counts["unchanged" if record.get("unchanged") else "probed"] += 1
+    finally:
+        if previous is not None:
+            previous.close()
+        if args.output:
+            out.close()
+    if args.output:
+        os.replace(f"{args.output}.tmp", args.output)
+    print(f"{counts['probed']} probed, {counts['unchanged']} unchanged, {counts['failed']} failed "
+          f"in {time.monotonic() - start:.1f}s", file=sys.stderr)
+    return 1 if counts["failed"] else 0
+
+
+# ---------- convert ----------
+def build_jobs(args):
+    from vidoc.ladder import LadderJob, make_renditions
+    from vidoc.profile import profile_job, profile_streams
+
+    batch = len(args.inputs) > 1 or os.path.isdir(args.output)
+    container = args.format or (None if batch else os.path.splitext(args.output)[1].lstrip(".").lower())
+    # Without --audio-codec every stream is kept and audio is copied
+    audio = None
+    if args.audio_codec:
+        audio = {"codec": args.audio_codec, "bitrate": args.audio_bitrate, "channels": args.audio_channels}
+    target = {key: value for key, value in (("ssim", args.target_ssim), ("kbps", args.max_kbps))
+              if value is not None} or None
+    profile = {"container": container or "mp4", "video_codec": args.codec, "resolution": args.resolution,
+               "pix_fmt": args.bitdepth, "preset": args.preset, "audio": audio,
+               "smart_copy": args.smart_copy, "segmented": args.segmented, "crf": args.crf,
+               "target": target}
+
+    jobs = []
+    for path in args.inputs:
+        output_path = batch_output_path(path, args.output, profile["container"]) if batch else args.output
+        if args.ladder:
+            renditions = make_renditions(output_path, args.ladder, args.codec, args.bitdepth, args.preset,
+                                         args.crf)
+            jobs.append(LadderJob(path, renditions, profile_streams(profile, path), args.smart_copy,
+                                  target))
+        else:
+            jobs.append(profile_job(profile, path, output_path))
+    return jobs
+
+
+def cmd_convert(args):
+    if args.ladder and args.segmented:
+        print("--ladder and --segmented can't be combined", file=sys.stderr)
+        return 2
+    if len(args.inputs) > 1 and not os.path.isdir(args.output):
+        # Several inputs always go into a folder; make it before queueing anything
+        try:
+            os.makedirs(args.output)
+        except OSError as e:
+            print(f"Can't create the output folder: {e}", file=sys.stderr)
+            return 2
+    return run_jobs(build_jobs(args), args)
+
+
+def cmd_resume(args):
+    from vidoc.store import JobStore
+
+    store = JobStore()
+    jobs = store.unfinished()
+    if not jobs:
+        print("Nothing to resume.", file=sys.stderr)
+        return 0
+    if args.discard:
+        store.abandon(jobs)
+        print(f"Discarded {len(jobs)} unfinished job(s).", file=sys.stderr)
+        return 0
+    return run_jobs(jobs, args, store)
+
+
+def progress_printer(verbose=False):
+    # (on_update, on_log) for a scheduler, reporting to stderr
+    from vidoc.media import format_duration
+    shown = {}
+
+    def on_update(job):
+        # One line per whole percent or status change, not per progress block
+        state = (job.status, int(job.progress))
+        if shown.get(job.id) != state:
+            shown[job.id] = state
+            speed = ""
+            if job.stats is not None and job.stats.speed:
+                speed = f" {job.stats.speed:.2f}x ETA {format_duration(job.stats.eta)}"
+            print(f"[{job.id}] {os.path.basename(job.input_path)}: {job.status} "
+                  f"{job.progress:.0f}%{speed}", file=sys.stderr)
+
+    def on_log(job, line):
+        if verbose:
+            sys.stderr.write(f"[{job.id}] {line}")
+
+    return on_update, on_log
+
+
+def ionice(value):
+    from vidoc.governor import parse_ionice
+    try:
+        return parse_ionice(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def add_scheduler_options(parser):
+    parser.add_argument("--max-cores", type=int, help="core budget for parallel jobs")
+    parser.add_argument("--nice", type=int, help="CPU priority of the ffmpeg processes, e.g. 10")
+    parser.add_argument("--ionice", type=ionice, help="I/O priority: idle, best-effort[:0-7] or realtime[:0-7]")
+    parser.add_argument("--max-memory", type=int, metavar="MB", help="address space limit per ffmpeg")
+    parser.add_argument("--no-pin", dest="pin", action="store_false",
+                        help="don't tie each job to its own CPUs")
+    parser.add_argument("--metrics-log", metavar="FILE",
+                        help="JSON line per finished job (default: metrics.jsonl in the data folder)")
+    parser.add_argument("--metrics-file", metavar="FILE",
+                        help="keep Prometheus metrics in this file, e.g. for node_exporter's textfile collector")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="serve Prometheus metrics on 127.0.0.1:PORT")
+    parser.add_argument("--cprofile", metavar="DIR", help="write a cProfile dump of every job here")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show ffmpeg's log")
+
+
+def make_scheduler(args, on_update, on_log, store):
+    from vidoc.governor import Governor
+    from vidoc.jobs import JobScheduler
+    from vidoc.telemetry import Telemetry
+
+    governor = Governor(pin=args.pin, nice=args.nice, ionice=args.ionice, memory_mb=args.max_memory)
+    telemetry = Telemetry(args.metrics_log, args.metrics_file, args.metrics_port, args.cprofile).start()
+    return JobScheduler(max_cores=args.max_cores, on_update=on_update, on_log=on_log, store=store,
+                        governor=governor, telemetry=telemetry)
+
+
+def run_jobs(jobs, args, store=None):
+    # Runs the jobs to the end, printing progress to stderr; Ctrl+C cancels
+    from vidoc.jobs import CANCELLED, DONE, QUEUED
+    from vidoc.store import JobStore
+
+    on_update, on_log = progress_printer(args.verbose)
+    scheduler = make_scheduler(args, on_update, on_log, store or JobStore())
+    for job in jobs:
+        scheduler.submit(job)
+    try:
+        while not scheduler.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        scheduler.cancel_all(keep_work=True)
+        while not scheduler.wait(0.5):
+            pass
+        # Interrupted, not abandoned: leave the jobs for "resume"
+        for job in jobs:
+            if job.status == CANCELLED:
+                job.status = QUEUED
+                scheduler.store.set_status(job)
+        print("Interrupted; 'python -m vidoc resume' continues from here.", file=sys.stderr)
+        return 130
+
+    status = 0
+    for job in jobs:
+        if job.status != DONE:
+            print(f"{job.input_path}: {job.status}" + (f" ({job.error})" if job.error else ""),
+                  file=sys.stderr)
+            status = 1
+    return status
+
+
+# ---------- trim ----------
+def timestamp(value):
+    from vidoc.trim import parse_timestamp
+    try:
+        return parse_timestamp(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a time (seconds, MM:SS or HH:MM:SS.mmm)")
+
+
+def cmd_trim(args):
+    from vidoc.trim import TrimJob
+
+    container = args.format or os.path.splitext(args.output)[1].lstrip(".").lower() or "mp4"
+    return run_jobs([TrimJob(args.input, args.output, container, args.start, args.end)], args)
+
+
+# ---------- watch ----------
+def cmd_watch(args):
+    from vidoc.profile import load_profile
+    from vidoc.store import JobStore
+    from vidoc.watch import WatchDaemon
+
+    try:
+        profile = load_profile(args.profile)
+    except (OSError, ValueError) as e:
+        print(f"Can't load profile: {e}", file=sys.stderr)
+        return 2
+    on_update, on_log = progress_printer(args.verbose)
+    scheduler = make_scheduler(args, on_update, on_log, JobStore())
+    daemon = WatchDaemon(args.folders, profile, args.output, scheduler, args.settle, args.poll,
+                         args.inotify, log=lambda message: print(message, file=sys.stderr))
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        # Jobs still running stay unfinished in the store and resume next time
+        print("Stopped.", file=sys.stderr)
+        return 130
+    return 0
+
+
+# ---------- bench ----------
+def bench_sources(value):
+    # "640x360:5,720p:10" -> [(640, 360, 5.0), (1280, 720, 10.0)]
+    sources = []
+    for item in value.split(","):
+        size, _, duration = item.partition(":")
+        resolution = parse_resolution(size)
+        if resolution == "same":
+            raise argparse.ArgumentTypeError("a benchmark source needs a size")
+        try:
+            seconds = float(duration or 5)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"'{duration}' is not a number of seconds")
+        w, h = resolution.split(":")
+        sources.append((int(w), int(h), seconds))
+    return sources
+
+
+def choice_list(table):
+    values = [value for _, value in table]
+
+    def parse(value):
+        items = [item.strip() for item in value.split(",")]
+        for item in items:
+            if item not in values:
+                raise argparse.ArgumentTypeError(f"'{item}' is not one of {', '.join(values)}")
+        return items
+    return parse
+
+
+def cmd_bench(args):
+    from vidoc import bench
+
+    if args.compare:
+        old, new = (bench.load_results(path) for path in args.compare)
+    else:
+        resolutions = args.resolutions or ["same"]
+        pix_fmts = args.bitdepths or ["same"]
+        codecs, presets = args.codecs, args.presets
+        if args.all:
+            codecs = [value for _, value in CODECS]
+            presets = [value for _, value in PRESETS if value != "auto"]
+            resolutions = ["same"] + [f"{w}:{h}" for w, h in RESOLUTIONS.values()]
+            pix_fmts = [value for _, value in BITDEPTHS]
+        new = bench.run_benchmark(args.sources, codecs, presets, resolutions, pix_fmts, args.repeat,
+                                  args.threads, log=lambda message: print(message, file=sys.stderr))
+        if args.output:
+            bench.save_results(new, args.output)
+        else:
+            print(json.dumps(new, indent=2, sort_keys=True))
+        if not args.baseline:
+            return 0 if all(case["status"] == "done" for case in new["cases"].values()) else 1
+        old = bench.load_results(args.baseline)
+
+    regressions = bench.compare(old, new, args.threshold)
+    bench.format_regressions(regressions, sys.stderr)
+    print(f"{len(regressions)} regression(s) over {args.threshold:.0%}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="vidoc", description="Inspect and convert videos with FFmpeg.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    probe = sub.add_parser("probe", help="show media info")
+    probe.add_argument("files", nargs="+")
+    probe.add_argument("--json", action="store_true", help="one JSON object per file")
+    probe.set_defaults(func=cmd_probe)
+
+    probe_all = sub.add_parser("probe-all", help="probe whole folders, one JSON line per file")
+    probe_all.add_argument("roots", nargs="+", help="folders (walked recursively) or files")
+    probe_all.add_argument("-o", "--output", help="NDJSON file to write (default: stdout)")
+    probe_all.add_argument("-j", "--workers", type=int, help="parallel ffprobe runs")
+    probe_all.add_argument("--timeout", type=float, default=60, help="seconds per file")
+    probe_all.add_argument("--skip-unchanged", metavar="PREVIOUS",
+                           help="reuse records from an earlier output for files whose size and mtime match")
+    probe_all.add_argument("--ext", default=",".join(e.lstrip(".") for e in VIDEO_EXTENSIONS),
+                           help="comma separated file extensions to pick up")
+    probe_all.set_defaults(func=cmd_probe_all)
+
+    convert = sub.add_parser("convert", help="convert one or more files")
+    convert.add_argument("inputs", nargs="+")
+    convert.add_argument("-o", "--output", required=True,
+                         help="output file, or a folder when converting several inputs")
+    convert.add_argument("-f", "--format", choices=[value for _, value in FORMATS],
+                         help="container (default: from the output extension, else mp4)")
+    convert.add_argument("-c", "--codec", default="libx264", choices=[value for _, value in CODECS])
+    convert.add_argument("-r", "--resolution", type=parse_resolution, default="same")
+    convert.add_argument("-b", "--bitdepth", type=parse_bitdepth, default="same")
+    convert.add_argument("-p", "--preset", default="default", choices=[value for _, value in PRESETS],
+                         help="auto picks preset and CRF from sample encodes")
+    convert.add_argument("--crf", type=int, help="constant quality (lower is better)")
+    convert.add_argument("--target-ssim", type=float,
+                         help="quality goal of -p auto (mean SSIM, default 0.98)")
+    convert.add_argument("--max-kbps", type=float, help="video bitrate cap of -p auto")
+    convert.add_argument("--audio-codec", choices=AUDIO_CODECS, help="re-encode every audio stream with this codec")
+    convert.add_argument("--audio-bitrate", default="128k")
+    convert.add_argument("--audio-channels", default="2")
+    convert.add_argument("--no-smart-copy", dest="smart_copy", action="store_false",
+                         help="encode even streams that already match")
+    convert.add_argument("--segmented", action="store_true",
+                         help="split at keyframes and encode the chunks in parallel")
+    convert.add_argument("--ladder", type=ladder_labels,
+                         help="comma separated resolutions to make from one decode, e.g. 1080p,720p,480p")
+    add_scheduler_options(convert)
+    convert.set_defaults(func=cmd_convert)
+
+    trim = sub.add_parser("trim", help="cut a range out of a file, re-encoding only around the cuts")
+    trim.add_argument("input")
+    trim.add_argument("-o", "--output", required=True)
+    trim.add_argument("-f", "--format", choices=[value for _, value in FORMATS],
+                      help="container (default: from the output extension)")
+    trim.add_argument("-s", "--start", type=timestamp, default=0.0, help="e.g. 95.5, 1:35 or 00:01:35.500")
+    trim.add_argument("-e", "--end", type=timestamp, help="default: the end of the file")
+    add_scheduler_options(trim)
+    trim.set_defaults(func=cmd_trim)
+
+    watch = sub.add_parser("watch", help="convert new files dropped into folders, until stopped")
+    watch.add_argument("folders", nargs="+")
+    watch.add_argument("-p", "--profile", required=True, help="profile JSON saved from the app")
+    watch.add_argument("-o", "--output", required=True, help="output folder; subfolders are mirrored")
+    watch.add_argument("--settle", type=float, default=10,
+                       help="seconds a file's size and mtime must hold before it is picked up")
+    watch.add_argument("--poll", type=float, default=2, help="seconds between checks")
+    watch.add_argument("--no-inotify", dest="inotify", action="store_false",
+                       help="poll directory mtimes even where inotify works")
+    add_scheduler_options(watch)
+    watch.set_defaults(func=cmd_watch)
+
+    bench = sub.add_parser("bench", help="benchmark codecs, presets and ViDoc's own overhead on synthetic sources")
+    bench.add_argument("--sources", type=bench_sources, default="640x360:5,1280x720:5",
+                       help="sizes and seconds of the test sources, e.g. 640x360:5,1080p:10")
+    bench.add_argument("--codecs", type=choice_list(CODECS), default="libx264,libx265,libvpx-vp9,copy")
+    bench.add_argument("--presets", type=choice_list(PRESETS), default="ultrafast,medium")
+    bench.add_argument("--resolutions", type=lambda v: [parse_resolution(i) for i in v.split(",")],
+                       help="output sizes (default: same as the source)")
+    bench.add_argument("--bitdepths", type=lambda v: [parse_bitdepth(i) for i in v.split(",")],
+                       help="output bit depths (default: same as the source)")
+    bench.add_argument("--all", action="store_true",
+                       help="every codec, preset, resolution and bit depth of the app's tables (slow)")
+    bench.add_argument("--repeat", type=int, default=3, help="runs per case; the median counts")
+    bench.add_argument("--threads", type=int, help="encoder threads, for numbers that hold across machines")
+    bench.add_argument("-o", "--output", help="results JSON (default: stdout)")
+    bench.add_argument("--baseline", help="results of an earlier run to check for regressions")
+    bench.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="only compare two saved results")
+    bench.add_argument("--threshold", type=float, default=0.10, help="relative change that counts as a regression")
+    bench.set_defaults(func=cmd_bench)
+
+    resume = sub.add_parser("resume", help="finish the conversions an earlier run left unfinished")
+    resume.add_argument("--discard", action="store_true", help="forget them instead")
+    add_scheduler_options(resume)
+    resume.set_defaults(func=cmd_resume)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,204 @@
+import os
+
+VALID_PRESETS = [
+    "ultrafast", "superfast", "veryfast", "faster", "fast",
+    "medium", "slow", "slower", "veryslow", "placebo"
+]
+
+# Encoder -> (stream type, codec name as ffprobe reports it)
+ENCODERS = {
+    "libx264": ("video", "h264"),
+    "libx265": ("video", "hevc"),
+    "libvpx-vp9": ("video", "vp9"),
+    "libaom-av1": ("video", "av1"),
+    "aac": ("audio", "aac"),
+    "libopus": ("audio", "opus"),
+    "libmp3lame": ("audio", "mp3"),
+    "ac3": ("audio", "ac3"),
+    "flac": ("audio", "flac"),
+    "eac3": ("audio", "eac3"),
+    "mp2": ("audio", "mp2"),
+}
+
+# Codecs each container takes per stream type (None: anything goes)
+CONTAINER_CODECS = {
+    "mp4": {
+        "video": {"h264", "hevc", "mpeg4", "mjpeg", "png"},  # MP4 doesn't support VP9/AV1 well for playback
+        "audio": {"aac", "mp3", "ac3", "eac3", "alac", "flac", "opus", "mp2"},
+        "subtitle": {"mov_text"},
+        "data": None,
+        "attachment": set(),
+    },
+    "webm": {
+        "video": {"vp8", "vp9", "av1"},  # WEBM typically uses VP8/VP9/AV1 + opus/vorbis
+        "audio": {"opus", "vorbis"},
+        "subtitle": {"webvtt"},
+        "data": set(),
+        "attachment": set(),
+    },
+    "mkv": None,                         # MKV is flexible
+}
+
+FORMATS = [("MP4", "mp4"), ("MKV", "mkv"), ("WEBM", "webm")]
+CODECS = [("H.264", "libx264"), ("HEVC (H.265)", "libx265"), ("VP9", "libvpx-vp9"), ("AV1", "libaom-av1"), ("Copy", "copy")]
+BITDEPTHS = [("Same as Original", "same"), ("8-bit", "yuv420p"), ("10-bit", "yuv420p10le"), ("12-bit", "yuv420p12le")]
+PRESETS = [("Default", "default"), ("Auto", "auto"), ("Ultrafast", "ultrafast"), ("Superfast", "superfast"),
+           ("Veryfast", "veryfast"), ("Faster", "faster"), ("Fast", "fast"),
+           ("Medium", "medium"), ("Slow", "slow"), ("Slower", "slower"), ("Veryslow", "veryslow")]
+AUDIO_CODECS = ["aac", "libopus", "libmp3lame", "ac3", "flac", "eac3", "mp2"]
+AUDIO_CHANNELS = ["1", "2", "6"]
+AUDIO_BITRATES = ["96k", "128k", "256k", "320k", "384k", "448k", "640k", "768k"]
+
+RESOLUTIONS = {
+    "144p": (256, 144), "240p": (426, 240), "360p": (640, 360),
+    "480p (SD)": (854, 480), "540p": (960, 540), "720p (HD)": (1280, 720),
+    "900p (HD)": (1600, 900), "1080p (FHD)": (1920, 1080),
+    "1440p (2K)": (2560, 1440), "2160p (4K)": (3840, 2160)
+}
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".avi", ".mov", ".flv", ".ts", ".webm")
+
+# libvpx-vp9 and libaom-av1 only encode at constant quality with the bitrate set to 0
+CRF_ZERO_BITRATE = {"libvpx-vp9", "libaom-av1"}
+
+
+def container_accepts(container, stream_type, codec_name):
+    allowed = CONTAINER_CODECS.get(container)
+    if allowed is None:
+        return True
+    allowed = allowed.get(stream_type, set())
+    return allowed is None or codec_name in allowed
+
+
+def is_compatible(codec, container):
+    if codec == "copy" or codec not in ENCODERS:
+        return True
+    return container_accepts(container, *ENCODERS[codec])
+
+
+def batch_output_path(input_path, output_dir, container):
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    output_path = os.path.join(output_dir, f"{stem}.{container}")
+    # Never let a batch job overwrite its own source
+    if os.path.abspath(output_path) == os.path.abspath(input_path):
+        output_path = os.path.join(output_dir, f"{stem}_converted.{container}")
+    return output_path
+
+
+def ladder_output_path(output_path, resolution):
+    # movie.mp4 + "1280:720" -> movie_720p.mp4
+    base, ext = os.path.splitext(output_path)
+    if resolution == "same":
+        return f"{base}_source{ext}"
+    return f"{base}_{resolution.split(':')[1]}p{ext}"
+
+
+# ---------- FFmpeg command ----------
+def crf_options(video_codec, crf, spec="v"):
+    # Constant quality for one video output stream; spec is "v" or "v:N"
+    if crf is None or video_codec == "copy":
+        return []
+    opts = [f"-crf:{spec}", str(crf)]
+    if video_codec in CRF_ZERO_BITRATE:
+        opts += [f"-b:{spec}", "0"]
+    return opts
+
+
+def video_options(video_codec, resolution="same", pix_fmt="same", preset="default", crf=None):
+    opts = ["-c:v", video_codec]
+    if video_codec != "copy" and pix_fmt != "same":
+        opts += ["-pix_fmt", pix_fmt]
+
+    if video_codec != "copy" and preset in VALID_PRESETS:
+        opts += ["-preset", preset]
+    opts += crf_options(video_codec, crf)
+
+    if resolution != "same" and video_codec != "copy":
+        w, h = resolution.split(":")
+        opts += ["-vf", f"scale={w}:{h}"]
+    return opts
+
+
+def plan_options(plan, input_index=0, skip=(), resolution="same", pix_fmt="same",
+                 preset="default", first_video=0, crf=None):
+    # plan: per-stream decisions from vidoc.planner.plan_streams(). Codec options
+    # use per-type output indices, so every stream gets exactly its own settings.
+    opts = []
+    counters = {"v": first_video, "a": 0, "s": 0, "d": 0, "t": 0}
+    for entry in plan:
+        if entry["id"] in skip:
+            continue
+        opts += ["-map", f"{input_index}:{entry['index']}"]
+        kind = entry["id"].split(":")[0]
+        n = counters.get(kind, 0)
+        counters[kind] = n + 1
+        opts += [f"-c:{kind}:{n}", entry["codec"]]
+        if entry["codec"] == "copy":
+            continue
+
+        if kind == "v":
+            if pix_fmt != "same":
+                opts += [f"-pix_fmt:v:{n}", pix_fmt]
+            if preset in VALID_PRESETS:
+                opts += [f"-preset:v:{n}", preset]
+            opts += crf_options(entry["codec"], crf, f"v:{n}")
+            if resolution != "same":
+                w, h = resolution.split(":")
+                opts += [f"-filter:v:{n}", f"scale={w}:{h}"]
+        elif kind == "a":
+            if entry.get("bitrate"):
+                opts += [f"-b:a:{n}", entry["bitrate"]]
+            if entry.get("channels"):
+                opts += [f"-ac:a:{n}", entry["channels"]]
+    return opts
+
+
+def build_plan_command(input_path, output_path, plan, resolution="same", pix_fmt="same",
+                       preset="default", crf=None):
+    cmd = ["ffmpeg", "-y", "-i", input_path]
+    cmd += plan_options(plan, resolution=resolution, pix_fmt=pix_fmt, preset=preset, crf=crf)
+    cmd += [output_path]
+    return cmd
+
+
+def build_mux_command(video_path, input_path, output_path, plan, video_stream, input_options=()):
+    # Put an already encoded video track together with the other planned streams
+    # of the original input. video_stream is the stream id the video track replaces;
+    # input_options (e.g. -ss/-t) apply to reading the original input.
+    cmd = ["ffmpeg", "-y", "-i", video_path, *input_options, "-i", input_path,
+           "-map", "0:v:0", "-c:v:0", "copy"]
+    cmd += plan_options(plan, input_index=1, skip=(video_stream,), first_video=1)
+    cmd += ["-map_metadata", "1", "-map_chapters", "1", output_path]
+    return cmd
+
+
+def build_ladder_command(input_path, renditions, video_stream):
+    # One decode of the input, split into a scaled copy per rendition. Each
+    # rendition: {"output", "video_codec", "resolution", "pix_fmt", "preset", "crf", "plan"},
+    # where plan covers the streams other than video_stream for its container.
+    count = len(renditions)
+    video_index = video_stream.split(":")[1]
+    if count > 1:
+        sources = [f"[s{i}]" for i in range(count)]
+        graph = [f"[0:{video_index}]split={count}{''.join(sources)}"]
+    else:
+        sources = [f"[0:{video_index}]"]
+        graph = []
+    for i, rendition in enumerate(renditions):
+        if rendition["resolution"] != "same":
+            w, h = rendition["resolution"].split(":")
+            graph.append(f"{sources[i]}scale={w}:{h}[v{i}]")
+        else:
+            graph.append(f"{sources[i]}null[v{i}]")
+
+    cmd = ["ffmpeg", "-y", "-i", input_path, "-filter_complex", ";".join(graph)]
+    for i, rendition in enumerate(renditions):
+        cmd += ["-map", f"[v{i}]", "-c:v:0", rendition["video_codec"]]
+        if rendition.get("pix_fmt", "same") != "same":
+            cmd += ["-pix_fmt:v:0", rendition["pix_fmt"]]
+        if rendition.get("preset") in VALID_PRESETS:
+            cmd += ["-preset:v:0", rendition["preset"]]
+        cmd += crf_options(rendition["video_codec"], rendition.get("crf"), "v:0")
+        cmd += plan_options(rendition["plan"], skip=(video_stream,), first_video=1)
+        cmd += ["-map_metadata", "0", rendition["output"]]
+    return cmd
@@ -0,0 +1,23 @@
+import queue
+
+
+# ---------- UI Event Queue ----------
+class UiEventQueue:
+    # Worker threads post events here instead of touching Tk widgets; the Tk
+    # thread drains them in batches from a root.after() timer.
+
+    def __init__(self):
+        self._events = queue.SimpleQueue()
+
+    def post(self, kind, *args):
+        self._events.put((kind,) + args)
+
+    def drain(self, limit=2000):
+        # At most `limit` events per call so one flood can't stall the mainloop
+        events = []
+        while len(events) < limit:
+            try:
+                events.append(self._events.get_nowait())
+            except queue.Empty:
+                break
+        return events
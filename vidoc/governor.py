@@ -0,0 +1,204 @@
+import os
+import sys
+import ctypes
+import ctypes.util
+import shutil
+import platform
+from dataclasses import dataclass, replace
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ioprio_set(2); the syscall has no libc wrapper
+IOPRIO_CLASSES = {"realtime": 1, "best-effort": 2, "idle": 3}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_SHIFT = 13
+IOPRIO_SET_SYSCALL = {"x86_64": 251, "i386": 289, "i686": 289, "aarch64": 30, "armv7l": 314,
+                      "ppc64le": 273, "s390x": 282, "riscv64": 30}
+# Starts ffmpeg on its CPUs, so even its first threads never run elsewhere
+TASKSET = shutil.which("taskset") if sys.platform.startswith("linux") else None
+
+
+def parse_ionice(value):
+    # "idle", "best-effort" or "best-effort:7" -> (class, level)
+    name, _, level = value.partition(":")
+    if name not in IOPRIO_CLASSES:
+        raise ValueError(f"unknown I/O class '{name}' (realtime, best-effort or idle)")
+    level = int(level) if level else 4
+    if not 0 <= level <= 7:
+        raise ValueError(f"I/O priority level {level} is not in 0-7")
+    return IOPRIO_CLASSES[name], level
+
+
+def _ioprio_setter():
+    # ioprio_set(task, value), or None where there is none
+    number = IOPRIO_SET_SYSCALL.get(platform.machine())
+    if not sys.platform.startswith("linux") or number is None:
+        return None
+    syscall = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True).syscall
+    return lambda task, value: syscall(number, IOPRIO_WHO_PROCESS, task, value)
+
+
+def _tasks(pid):
+    # The thread ids of a process; Linux keeps priorities and CPU sets per
+    # thread, and new threads inherit them from the one starting them
+    try:
+        return [int(task) for task in os.listdir(f"/proc/{pid}/task")]
+    except OSError:
+        return [pid]
+
+
+@dataclass
+class Resources:
+    # One job's share of the machine. threads goes to the encoders and cpus
+    # to taskset; the rest is applied to the ffmpeg process from outside as
+    # soon as it has started (POSIX only).
+    threads: int = None
+    filter_threads: int = None
+    cpus: tuple = ()           # CPU affinity; empty for any CPU
+    nice: int = None
+    ionice: tuple = None       # (class, level), see parse_ionice
+    memory_mb: int = None      # address space ceiling
+
+    def describe(self):
+        parts = [f"{self.threads} threads" if self.threads else "all CPUs"]
+        if self.cpus:
+            parts.append(f"CPUs {','.join(map(str, self.cpus))}")
+        if self.nice:
+            parts.append(f"nice {self.nice}")
+        if self.ionice:
+            parts.append(f"ionice {self.ionice[0]}:{self.ionice[1]}")
+        if self.memory_mb:
+            parts.append(f"memory {self.memory_mb} MB")
+        return ", ".join(parts)
+
+    def command(self, cmd, outputs=()):
+        # cmd with the filter thread counts as global options and -threads in
+        # front of every output: the last argument and any of outputs not read
+        # with -i; run through taskset when the job has CPUs of its own
+        if self.cpus and TASKSET:
+            return [TASKSET, "-c", ",".join(map(str, self.cpus))] + replace(self, cpus=()).command(cmd, outputs)
+        if not self.threads:
+            return cmd
+        filter_threads = str(self.filter_threads or self.threads)
+        outputs = set(outputs)
+        result = [cmd[0], "-filter_threads", filter_threads, "-filter_complex_threads", filter_threads]
+        last = len(cmd) - 1
+        for i in range(1, len(cmd)):
+            if (i == last or cmd[i] in outputs) and cmd[i - 1] != "-i":
+                result += ["-threads", str(self.threads)]
+            result.append(cmd[i])
+        return result
+
+    def apply(self, process):
+        # Priorities, memory ceiling and, without taskset, CPUs for a process
+        # that just started, set from here rather than in a preexec_fn, which
+        # isn't safe in a process with threads. Whatever the system refuses (a
+        # negative nice as a normal user, say) is skipped rather than failing
+        # the job.
+        if os.name != "posix":
+            return
+        if self.memory_mb and hasattr(resource, "prlimit"):
+            limit = self.memory_mb * 1024 * 1024
+            try:
+                resource.prlimit(process.pid, resource.RLIMIT_AS, (limit, limit))
+            except OSError:
+                pass
+        steps = []
+        if self.cpus and not TASKSET and hasattr(os, "sched_setaffinity"):
+            steps.append(lambda task: os.sched_setaffinity(task, self.cpus))
+        if self.nice:
+            nice = os.getpriority(os.PRIO_PROCESS, 0) + self.nice
+            steps.append(lambda task: os.setpriority(os.PRIO_PROCESS, task, nice))
+        if self.ionice:
+            ioprio_set = _ioprio_setter()
+            value = (self.ionice[0] << IOPRIO_CLASS_SHIFT) | self.ionice[1]
+            if ioprio_set is not None:
+                steps.append(lambda task: ioprio_set(task, value))
+        for task in _tasks(process.pid) if steps else ():
+            for step in steps:
+                try:
+                    step(task)
+                except OSError:
+                    pass
+
+
+# ---------- Governor ----------
+class Governor:
+    # Splits the machine's CPUs between the running jobs. The scheduler tells
+    # it when a job starts and when it ends (under its lock), and every time
+    # the CPUs are divided again in proportion to the jobs' weights, each job
+    # getting a disjoint set and running its encoders with that many threads,
+    # so jobs running side by side don't fight over cores and caches. A job
+    # running alone isn't pinned and leaves the thread count to ffmpeg. The
+    # thread count of an ffmpeg already running can't change, but its CPUs
+    # can: running processes are moved to their job's new set (Linux), and
+    # the job's next ffmpeg step starts with the new share. With more jobs
+    # than CPUs, all of them share all CPUs. Weight 0 jobs (a composite job
+    # waiting for its sub-jobs) get nothing; their sub-jobs get the shares.
+
+    def __init__(self, cpus=None, pin=True, nice=None, ionice=None, memory_mb=None):
+        if cpus is None:
+            cpus = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else range(os.cpu_count() or 1)
+        self.cpus = sorted(cpus)
+        self.pin = pin and hasattr(os, "sched_setaffinity")
+        self.nice = nice
+        self.ionice = ionice
+        self.memory_mb = memory_mb
+        self._jobs = []   # running jobs with a share, oldest first
+
+    def acquire(self, job):
+        if job.weight:
+            self._jobs.append(job)
+            self._divide()
+
+    def release(self, job):
+        if job in self._jobs:
+            self._jobs.remove(job)
+            self._divide()
+
+    def shares(self, weights):
+        # CPUs per weight, in proportion and adding up to all CPUs: every job
+        # gets its whole part, the leftovers go to the largest remainders
+        total = sum(weights)
+        exact = [len(self.cpus) * weight / total for weight in weights]
+        counts = [max(1, int(share)) for share in exact]
+        by_remainder = sorted(range(len(weights)), key=lambda i: counts[i] - exact[i])
+        for i in by_remainder[:max(0, len(self.cpus) - sum(counts))]:
+            counts[i] += 1
+        # Small jobs rounded up to one CPU: take it back from the big ones
+        while len(self.cpus) < sum(counts) and max(counts) > 1:
+            counts[counts.index(max(counts))] -= 1
+        return counts
+
+    def _divide(self):
+        jobs = self._jobs
+        if not jobs:
+            return
+        counts = self.shares([job.weight for job in jobs])
+        alone = len(jobs) == 1
+        shared = sum(counts) > len(self.cpus)
+        start = 0
+        for job, count in zip(jobs, counts):
+            cpus = () if shared else tuple(self.cpus[start:start + count])
+            start += count
+            job.resources = Resources(threads=None if alone else count,
+                                      filter_threads=None if alone else count,
+                                      cpus=cpus if self.pin and not alone else (),
+                                      nice=self.nice, ionice=self.ionice, memory_mb=self.memory_mb)
+            if self.pin:
+                _move(job.process, job.resources.cpus or self.cpus)
+
+
+def _move(process, cpus):
+    # Pins every thread of a running process to cpus; threads it starts later
+    # inherit the set
+    if process is None or process.poll() is not None:
+        return
+    for task in _tasks(process.pid):
+        try:
+            os.sched_setaffinity(task, cpus)
+        except OSError:
+            pass
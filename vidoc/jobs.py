@@ -0,0 +1,429 @@
+import os
+import itertools
+import threading
+import subprocess
+from collections import deque
+from contextlib import nullcontext
+
+from vidoc.autotune import AutoTune
+from vidoc.probe import get_video_duration
+from vidoc.progress import ProgressParser, with_progress
+from vidoc.telemetry import JobMetrics, measure, wait_process
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Roughly how many cores one encode keeps busy. x264/x265 thread well,
+# libvpx-vp9 and libaom-av1 much less, and a stream copy is mostly I/O.
+CODEC_COST = {
+    "libx264": 4,
+    "libx265": 6,
+    "libvpx-vp9": 2,
+    "libaom-av1": 3,
+    "copy": 1,
+}
+
+
+def codec_cost(codec, cpu_count=None):
+    cpu_count = cpu_count or os.cpu_count() or 1
+    return max(1, min(CODEC_COST.get(codec, 2), cpu_count))
+
+
+def temp_output_path(path):
+    # movie.mp4 -> movie.vidoc-tmp.mp4; the extension stays so ffmpeg still
+    # picks the right muxer
+    base, ext = os.path.splitext(path)
+    return f"{base}.vidoc-tmp{ext}"
+
+
+def commit_output(path):
+    # Atomic on the same filesystem: the final name only ever holds a
+    # complete file
+    os.replace(temp_output_path(path), path)
+
+
+def discard_output(path):
+    try:
+        os.remove(temp_output_path(path))
+    except OSError:
+        pass
+
+
+# ---------- Job ----------
+class Job:
+    # "kind" names the class in the job store; spec() holds the constructor
+    # arguments that rebuild the job after a restart
+    kind = "job"
+    _ids = itertools.count(1)
+
+    def __init__(self, cmd, input_path, output_path, weight=1, duration=None):
+        self.id = next(Job._ids)
+        self.cmd = cmd
+        self.input_path = input_path
+        self.output_path = output_path
+        self.output_paths = [output_path]
+        self.weight = weight
+        self.duration = duration
+        self.status = QUEUED
+        self.progress = 0.0
+        self.stats = None
+        self.returncode = None
+        self.error = None
+        self.attempts = 0
+        self.process = None
+        self.parent = None
+        self.scheduler = None
+        self.resources = None
+        self.metrics = JobMetrics()
+        self.store_id = None
+        self._stored_status = None
+        self._callbacks = (None, None)
+        self._cancelled = False
+        self.keep_work = False   # cancelled by an interruption, to be resumed
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def spec(self):
+        return {"cmd": self.cmd, "input_path": self.input_path, "output_path": self.output_path,
+                "weight": self.weight, "duration": self.duration}
+
+    @classmethod
+    def from_spec(cls, spec):
+        return cls(**spec)
+
+    def describe(self):
+        return f"FFmpeg command: {' '.join(self.cmd)}"
+
+    def reset(self):
+        self.status = QUEUED
+        self.progress = 0.0
+        self.stats = None
+        self.returncode = None
+        self.error = None
+        self.process = None
+        self.metrics = JobMetrics()
+        self._cancelled = False
+        self.keep_work = False
+
+    def cancel(self, keep_work=False):
+        # keep_work: stopped to be resumed later, so a job keeps the work it
+        # has done so far (see discard)
+        self._cancelled = True
+        self.keep_work = keep_work
+        process = self.process
+        if process and process.poll() is None:
+            process.terminate()
+
+    def discard(self):
+        # Removes what unfinished runs left behind, once the job won't be resumed
+        for path in self.output_paths:
+            discard_output(path)
+
+    def run(self, on_update, on_log):
+        self.attempts += 1
+
+        # Get video duration for progress calculation
+        total_duration = self.duration or get_video_duration(self.input_path)
+        parser = ProgressParser(total_duration)
+
+        self.process = self._popen(with_progress(self.temp_command()),
+                                   [temp_output_path(path) for path in self.output_paths],
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if self._cancelled:
+            self.process.terminate()
+
+        # Log lines arrive on stderr, progress blocks on stdout
+        log_thread = threading.Thread(target=self._read_log, args=(on_log,), daemon=True)
+        log_thread.start()
+        for line in self.process.stdout:
+            record = parser.feed(line)
+            if record:
+                self.stats = record
+                if record.percent is not None:
+                    self.progress = record.percent
+                on_update(self)
+
+        self._wait()
+        log_thread.join()
+        if self.stats is not None and self.stats.frame:
+            self.metrics.frames += self.stats.frame
+        self.returncode = self.process.returncode
+        if self._cancelled:
+            self.status = CANCELLED
+        elif self.returncode == 0:
+            for path in self.output_paths:
+                commit_output(path)
+            self.progress = 100.0
+            self.status = DONE
+        else:
+            self.status = FAILED
+            self.error = f"ffmpeg exited with code {self.returncode}"
+        if self.status != DONE:
+            for path in self.output_paths:
+                discard_output(path)
+
+    def temp_command(self):
+        # ffmpeg writes every output under its temp name; run() renames them
+        # once the whole command succeeded. Inputs are never rewritten.
+        outputs = set(self.output_paths)
+        return [temp_output_path(arg) if arg in outputs and prev != "-i" else arg
+                for prev, arg in zip([None] + self.cmd, self.cmd)]
+
+    def _popen(self, cmd, outputs=(), **kwargs):
+        # Starts ffmpeg inside the share of the machine the scheduler's
+        # governor gave the job, if any (vidoc.governor)
+        resources = self.resources
+        if resources is None:
+            return subprocess.Popen(cmd, **kwargs)
+        process = subprocess.Popen(resources.command(cmd, outputs), **kwargs)
+        resources.apply(process)
+        return process
+
+    def _wait(self):
+        # process.wait() that adds the ffmpeg run's CPU time and peak memory
+        # to the job's metrics
+        self.metrics.add_rusage(wait_process(self.process))
+
+    # Jobs made of several ffmpeg steps set _on_update/_on_log in their run()
+    # and call these instead of Job.run()
+    def _run_step(self, cmd):
+        if self._cancelled:
+            self.status = CANCELLED
+            return False
+        self._on_log(self, f"FFmpeg command: {' '.join(cmd)}\n")
+        self.process = self._popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        for line in self.process.stderr:
+            self._on_log(self, line.decode("utf-8", "replace"))
+        self._wait()
+        self.returncode = self.process.returncode
+        if self._cancelled:
+            self.status = CANCELLED
+            return False
+        if self.returncode != 0:
+            self.status = FAILED
+            self.error = f"ffmpeg exited with code {self.returncode}"
+            return False
+        return True
+
+    def _capture(self, cmd):
+        # A helper ffmpeg run (sample encodes, measurements) that cancel() can
+        # stop; returns (returncode, stderr)
+        if self._cancelled:
+            return -1, ""
+        self.process = self._popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if self._cancelled:
+            self.process.terminate()
+        stderr = self.process.stderr.read()
+        self._wait()
+        return self.process.returncode, stderr.decode("utf-8", "replace")
+
+    def _autotune(self, on_log, video_codec, stream, resolution="same", pix_fmt="same", target=None):
+        # (preset, crf) for the "auto" preset, from sample encodes of the input
+        # (vidoc.autotune); None with the status set if that didn't work out
+        on_log(self, f"Picking a preset and CRF for {video_codec} from sample encodes\n")
+        try:
+            result = AutoTune(self.input_path, video_codec, stream, resolution, pix_fmt, target,
+                              run=self._capture, log=lambda line: on_log(self, line)).tune()
+        except (OSError, RuntimeError, ValueError) as e:
+            if self._cancelled:
+                self.status = CANCELLED
+            else:
+                self.status = FAILED
+                self.error = f"auto settings: {e}"
+            return None
+        on_log(self, f"Auto settings: preset {result['preset']}, CRF {result['crf']} "
+                     f"(SSIM {result['ssim']:.4f}, {result['kbps']:.0f} kbps on the samples)\n")
+        return result["preset"], result["crf"]
+
+    def _set_progress(self, percent, stats=None):
+        self.progress = percent
+        self.stats = stats
+        self._on_update(self)
+
+    def _read_log(self, on_log):
+        for line in self.process.stderr:
+            on_log(self, line.decode("utf-8", "replace"))
+
+
+# ---------- Auto Tune Job ----------
+class AutoTuneJob(Job):
+    # The sample encodes of the "auto" preset as a job of their own, so a
+    # composite job's tuning waits for cores, counts the codec's weight and
+    # gets its governor share like any encode. result is (preset, crf) once
+    # it is done.
+    kind = "autotune"
+
+    def __init__(self, input_path, video_codec, stream, resolution="same", pix_fmt="same",
+                 target=None):
+        super().__init__(None, input_path, None, weight=codec_cost(video_codec))
+        self.output_paths = []
+        self.video_codec = video_codec
+        self.stream = stream
+        self.resolution = resolution
+        self.pix_fmt = pix_fmt
+        self.target = target
+        self.result = None
+
+    def describe(self):
+        return f"Sample encodes picking a preset and CRF for {self.video_codec}"
+
+    def run(self, on_update, on_log):
+        self.attempts += 1
+        self.result = self._autotune(on_log, self.video_codec, self.stream, self.resolution,
+                                     self.pix_fmt, self.target)
+        if self.result is not None:
+            self.progress = 100.0
+            self.status = DONE
+
+
+# ---------- Scheduler ----------
+class JobScheduler:
+    # Runs queued jobs in FIFO order while the summed job weights fit into the
+    # core budget. No job weighs more than the whole budget; one that does
+    # (a ladder of several encodes, say) is capped to it and runs alone.
+    # With a store (vidoc.store.JobStore) every top-level job and each of its
+    # status changes is persisted, so unfinished jobs survive a crash. With a
+    # governor (vidoc.governor.Governor) every running job gets its own CPUs
+    # and thread count. Every job's metrics are measured; with a telemetry
+    # sink (vidoc.telemetry.Telemetry) they are also exported.
+
+    def __init__(self, max_cores=None, on_update=None, on_log=None, store=None, governor=None,
+                 telemetry=None):
+        self.max_cores = max_cores or os.cpu_count() or 1
+        self.on_update = on_update
+        self.on_log = on_log
+        self.store = store
+        self.governor = governor
+        self.telemetry = telemetry
+        self.jobs = {}   # id -> top-level job still queued or running
+        self._queue = deque()
+        self._busy = 0
+        self._threads = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    def submit(self, job, on_update=None, on_log=None):
+        # on_update/on_log replace the scheduler-wide callbacks for this job,
+        # which is how composite jobs follow their own sub-jobs
+        with self._lock:
+            job.reset()
+            job.weight = min(job.weight, self.max_cores)
+            job.scheduler = self
+            job._callbacks = (on_update, on_log)
+            if job.parent is None:
+                self.jobs[job.id] = job
+            self._queue.append(job)
+        if self.store is not None and job.parent is None:
+            self.store.save(job)
+        self._update(job)
+        self._pump()
+        return job
+
+    def cancel(self, job, keep_work=False):
+        with self._lock:
+            if job in self._queue:
+                self._queue.remove(job)
+                self.jobs.pop(job.id, None)
+                job.status = CANCELLED
+                queued = True
+            else:
+                queued = False
+        if queued:
+            self._update(job)
+        elif job.status == RUNNING:
+            job.cancel(keep_work)
+
+    def cancel_all(self, keep_work=False):
+        # Composite jobs cancel their own sub-jobs
+        for job in list(self.jobs.values()):
+            if not job.finished:
+                self.cancel(job, keep_work)
+
+    def retry(self, job):
+        if job.status in (FAILED, CANCELLED):
+            self.submit(job)
+
+    def running(self):
+        return [job for job in self.jobs.values() if job.status == RUNNING]
+
+    def reweigh(self, job, weight):
+        # Changes what a running job counts against the core budget, e.g. a
+        # composite job giving its share back while its sub-jobs run
+        with self._lock:
+            self._busy += weight - job.weight
+            if self.governor is not None:
+                self.governor.release(job)
+            job.weight = weight
+            if self.governor is not None:
+                self.governor.acquire(job)
+        self._pump()
+
+    def wait(self, timeout=None):
+        # Blocks until nothing is queued and every job's run() has returned,
+        # including its cleanup; False if the timeout ran out first
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._queue and not self._threads, timeout)
+
+    def _pump(self):
+        started = []
+        with self._lock:
+            while self._queue:
+                job = self._queue[0]
+                if self._busy and self._busy + job.weight > self.max_cores:
+                    break
+                self._queue.popleft()
+                self._busy += job.weight
+                self._threads += 1
+                if self.governor is not None:
+                    self.governor.acquire(job)
+                job.status = RUNNING
+                started.append(job)
+        for job in started:
+            self._update(job)
+            threading.Thread(target=self._run, args=(job,), daemon=True).start()
+
+    def _run(self, job):
+        try:
+            if job.resources is not None:
+                self._log(job, f"Resources: {job.resources.describe()}\n")
+            profiling = self.telemetry.profiling(job) if self.telemetry is not None else nullcontext()
+            with measure(job), profiling:
+                job.run(self._update, self._log)
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+        finally:
+            with self._lock:
+                self._busy -= job.weight
+                if self.governor is not None:
+                    self.governor.release(job)
+                if job.parent is None:
+                    self.jobs.pop(job.id, None)
+            if job.parent is not None:
+                job.parent.metrics.merge(job.metrics)
+            else:
+                self._log(job, f"Metrics: {job.metrics.describe()}\n")
+                if self.telemetry is not None:
+                    self.telemetry.record(job)
+            self._update(job)
+            self._pump()
+            with self._lock:
+                self._threads -= 1
+                self._idle.notify_all()
+
+    def _update(self, job):
+        if self.store is not None and job.parent is None and job.status != job._stored_status:
+            self.store.set_status(job)
+        on_update = job._callbacks[0] or self.on_update
+        if on_update:
+            on_update(job)
+
+    def _log(self, job, line):
+        on_log = job._callbacks[1] or self.on_log
+        if on_log:
+            on_log(job, line)
@@ -0,0 +1,108 @@
+import os
+
+from vidoc.command import RESOLUTIONS, build_ladder_command, ladder_output_path
+from vidoc.jobs import FAILED, Job, codec_cost
+from vidoc.planner import describe_plan, plan_streams
+from vidoc.probe import probe_media
+
+
+def make_renditions(output_path, labels, video_codec, pix_fmt="same", preset="default", crf=None):
+    # One rendition per entry of the RESOLUTIONS table, named after its height
+    renditions = []
+    for label in labels:
+        w, h = RESOLUTIONS[label]
+        resolution = f"{w}:{h}"
+        renditions.append({
+            "output": ladder_output_path(output_path, resolution),
+            "video_codec": video_codec,
+            "resolution": resolution,
+            "pix_fmt": pix_fmt,
+            "preset": preset,
+            "crf": crf,
+        })
+    return renditions
+
+
+def main_video_stream(info):
+    # The first real video stream (not cover art) feeds the ladder
+    for i, stream in enumerate(info.get("streams", [])):
+        if stream.get("codec_type") == "video" and not stream.get("disposition", {}).get("attached_pic"):
+            return f"v:{stream.get('index', i)}"
+    return None
+
+
+def plan_ladder(info, renditions, streams=None, smart_copy=True):
+    # Plans the other streams of every rendition for that rendition's own
+    # container. Returns (video_stream, problems); plans land in rendition["plan"].
+    video_stream = main_video_stream(info)
+    if streams is not None and not any(s["id"] == video_stream for s in streams):
+        video_stream = next((s["id"] for s in streams if s["id"].startswith("v:")), None)
+    if video_stream is None:
+        return None, ["The input has no video stream to scale"]
+
+    problems = []
+    if any(rendition["video_codec"] == "copy" for rendition in renditions):
+        # Every rendition is scaled, and a scaled stream can't be copied
+        problems.append("A ladder needs a video codec to encode with, not copy")
+    for rendition in renditions:
+        container = os.path.splitext(rendition["output"])[1].lstrip(".").lower()
+        plan, issues = plan_streams(info, container, rendition["video_codec"], rendition["resolution"],
+                                    rendition.get("pix_fmt", "same"), streams, smart_copy,
+                                    rendition.get("preset", "default"), rendition.get("crf"))
+        rendition["plan"] = plan
+        problems += [f"{os.path.basename(rendition['output'])}: {issue}" for issue in issues]
+    return video_stream, problems
+
+
+# ---------- Ladder Job ----------
+class LadderJob(Job):
+    # Several renditions from one ffmpeg process: the input is read and decoded
+    # once, split, scaled per rendition and encoded to each output.
+    kind = "ladder"
+
+    def __init__(self, input_path, renditions, streams=None, smart_copy=True, target=None):
+        # The scheduler caps this at its core budget
+        weight = sum(codec_cost(r["video_codec"]) for r in renditions)
+        super().__init__(None, input_path, renditions[0]["output"], weight=weight)
+        self.renditions = renditions
+        self.output_paths = [r["output"] for r in renditions]
+        self.streams = streams
+        self.smart_copy = smart_copy
+        self.target = target
+
+    def spec(self):
+        return {"input_path": self.input_path, "renditions": self.renditions,
+                "streams": self.streams, "smart_copy": self.smart_copy, "target": self.target}
+
+    def describe(self):
+        outputs = "\n".join(f"  {path}" for path in self.output_paths)
+        if self.cmd is None:
+            return f"Ladder of {len(self.renditions)} renditions from {self.input_path}:\n{outputs}"
+        return f"Ladder outputs:\n{outputs}\n{super().describe()}"
+
+    def run(self, on_update, on_log):
+        video_stream, problems = plan_ladder(probe_media(self.input_path), self.renditions,
+                                             self.streams, self.smart_copy)
+        if problems:
+            self.attempts += 1
+            self.status = FAILED
+            self.error = "; ".join(problems)
+            on_log(self, f"Can't convert: {self.error}\n")
+            return
+        index = int(video_stream.split(":")[1])
+        for rendition in self.renditions:
+            # Every rendition gets its own settings; smaller sizes often take a lower CRF
+            if rendition.get("preset") == "auto":
+                tuned = self._autotune(on_log, rendition["video_codec"], index, rendition["resolution"],
+                                       rendition.get("pix_fmt", "same"), self.target)
+                if tuned is None:
+                    self.attempts += 1
+                    return
+                rendition["preset"], rendition["crf"] = tuned
+        self.cmd = build_ladder_command(self.input_path, self.renditions, video_stream)
+        for rendition in self.renditions:
+            others = [entry for entry in rendition["plan"] if entry["id"] != video_stream]
+            on_log(self, f"{os.path.basename(rendition['output'])}: {rendition['video_codec']} "
+                         f"{rendition['resolution']}\n{describe_plan(others)}")
+        on_log(self, f"{Job.describe(self)}\n\n")
+        super().run(on_update, on_log)
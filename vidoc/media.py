@@ -0,0 +1,94 @@
+from fractions import Fraction
+
+# ffmpeg's stream type specifiers, as in -c:a:0
+STREAM_SPECIFIERS = {"video": "v", "audio": "a", "subtitle": "s", "data": "d", "attachment": "t"}
+
+
+# ---------- Helpers ----------
+def format_duration(seconds):
+    try:
+        seconds = float(seconds)
+        h = int(seconds // 3600)
+        m = int((seconds % 3600) // 60)
+        s = int(seconds % 60)
+        return f"{h:02}:{m:02}:{s:02}"
+    except:
+        return "N/A"
+
+
+def format_size(bytes_size):
+    if not bytes_size:
+        return "N/A"
+    if bytes_size < 1024:
+        return f"{bytes_size} B"
+    elif bytes_size < 1024**2:
+        return f"{bytes_size/1024:.2f} KB"
+    elif bytes_size < 1024**3:
+        return f"{bytes_size/(1024**2):.2f} MB"
+    else:
+        return f"{bytes_size/(1024**3):.2f} GB"
+
+
+def parse_fps(fps_value):
+    try:
+        if "/" in fps_value:
+            return round(float(Fraction(fps_value)), 2)
+        return float(fps_value)
+    except:
+        return fps_value
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def stream_id(stream, i=0):
+    # "a:1" - stream type specifier and the stream's absolute index in the file
+    stream_type = stream.get("codec_type", "unknown")
+    return f"{STREAM_SPECIFIERS.get(stream_type, stream_type[0])}:{stream.get('index', i)}"
+
+
+# ---------- Media Summary ----------
+def summarize_media(info, file_size=None):
+    # The fields the info panel shows, from ffprobe's -show_format -show_streams
+    # JSON. Missing values are None.
+    fmt = info.get("format", {})
+    duration = _float(fmt.get("duration"))
+    summary = {
+        "size": file_size if file_size is not None else _int(fmt.get("size")),
+        "duration": duration,
+        "bit_rate": _int(fmt.get("bit_rate")),
+        "format": fmt.get("format_name"),
+        "streams": [],
+    }
+    for i, stream in enumerate(info.get("streams", [])):
+        tags = stream.get("tags", {})
+        entry = {
+            "id": stream_id(stream, i),
+            "index": stream.get("index", i),
+            "type": stream.get("codec_type", "unknown"),
+            "codec": stream.get("codec_name", "N/A"),
+            "language": tags.get("language", "und"),
+            "duration": _float(stream.get("duration")) or duration,
+            "bit_rate": _int(stream.get("bit_rate") or tags.get("BPS")),
+        }
+        if entry["type"] == "video":
+            entry["width"] = stream.get("width")
+            entry["height"] = stream.get("height")
+            entry["fps"] = parse_fps(stream.get("avg_frame_rate", "N/A"))
+            entry["pix_fmt"] = stream.get("pix_fmt")
+        elif entry["type"] == "audio":
+            entry["channels"] = stream.get("channels")
+            entry["sample_rate"] = _int(stream.get("sample_rate"))
+        summary["streams"].append(entry)
+    return summary
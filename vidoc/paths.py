@@ -0,0 +1,30 @@
+import os
+
+
+def cache_dir():
+    # VIDOC_CACHE_DIR wins, then the platform's usual per-user cache location
+    path = os.environ.get("VIDOC_CACHE_DIR")
+    if not path:
+        if os.name == "nt":
+            base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+            path = os.path.join(base, "ViDoc", "cache")
+        else:
+            base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+            path = os.path.join(base, "vidoc")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def data_dir():
+    # Things that must survive a cache wipe (the job store). VIDOC_DATA_DIR
+    # wins, then the platform's usual per-user data location.
+    path = os.environ.get("VIDOC_DATA_DIR")
+    if not path:
+        if os.name == "nt":
+            base = os.environ.get("APPDATA") or os.path.expanduser("~")
+            path = os.path.join(base, "ViDoc")
+        else:
+            base = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+            path = os.path.join(base, "vidoc")
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,202 @@
+from vidoc.command import ENCODERS, build_plan_command, container_accepts
+from vidoc.jobs import FAILED, Job, codec_cost
+from vidoc.media import stream_id
+from vidoc.probe import probe_media
+
+# What a stream gets encoded to when its codec can't go into the container as is
+FALLBACK_ENCODERS = {
+    "mp4": {"audio": "aac", "subtitle": "mov_text"},
+    "webm": {"audio": "libopus", "subtitle": "webvtt"},
+}
+
+TEXT_SUBTITLES = {"subrip", "srt", "ass", "ssa", "webvtt", "mov_text", "text"}
+
+
+def _source_bitrate(stream):
+    value = stream.get("bit_rate") or stream.get("tags", {}).get("BPS")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _bitrate_bps(bitrate):
+    # "128k" -> 128000
+    try:
+        if bitrate.lower().endswith("k"):
+            return int(float(bitrate[:-1]) * 1000)
+        return int(bitrate)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _video_matches(stream, video_codec, resolution, pix_fmt):
+    if ENCODERS.get(video_codec, (None, None))[1] != stream.get("codec_name"):
+        return False
+    if resolution != "same" and resolution != f"{stream.get('width')}:{stream.get('height')}":
+        return False
+    if pix_fmt != "same" and pix_fmt != stream.get("pix_fmt"):
+        return False
+    return True
+
+
+def _audio_matches(stream, audio):
+    if ENCODERS.get(audio["codec"], (None, None))[1] != stream.get("codec_name"):
+        return False
+    if str(stream.get("channels")) != str(audio["channels"]):
+        return False
+    source, target = _source_bitrate(stream), _bitrate_bps(audio["bitrate"])
+    # Re-encoding to a higher bitrate than the source only adds generation loss
+    return source is not None and target is not None and source <= target * 1.05
+
+
+# ---------- Stream Planner ----------
+def plan_streams(info, container, video_codec, resolution="same", pix_fmt="same",
+                 streams=None, smart_copy=True, preset="default", crf=None):
+    # Decide per kept stream whether a stream copy is enough or it has to be
+    # encoded, and check every stream against the container.
+    # streams: the GUI's kept streams ({"id", "audio"}); None keeps them all with audio copied.
+    # A CRF or the "auto" preset asks for a new encode, so the video is never
+    # smart copied then.
+    # Returns (plan, problems); plan entries are
+    # {"id", "index", "type", "codec", "bitrate", "channels", "reason"}.
+    wanted = None if streams is None else {s["id"]: s for s in streams}
+    fallback = FALLBACK_ENCODERS.get(container, {})
+    plan = []
+    problems = []
+
+    for i, stream in enumerate(info.get("streams", [])):
+        stream_type = stream.get("codec_type", "unknown")
+        sid = stream_id(stream, i)
+        if wanted is not None and sid not in wanted:
+            continue
+        choice = wanted.get(sid, {}) if wanted is not None else {}
+        codec_name = stream.get("codec_name", "N/A")
+        entry = {"id": sid, "index": stream.get("index", i), "type": stream_type,
+                 "codec": "copy", "bitrate": None, "channels": None, "reason": "copy"}
+        label = f"Stream #{entry['index']} ({stream_type} {codec_name})"
+        problem = None
+
+        if stream_type == "video":
+            cover_art = stream.get("disposition", {}).get("attached_pic") == 1
+            if cover_art or video_codec == "copy":
+                entry["reason"] = "cover art" if cover_art else "copy requested"
+            elif (smart_copy and crf is None and preset != "auto"
+                  and _video_matches(stream, video_codec, resolution, pix_fmt)):
+                entry["reason"] = f"already {codec_name} at the requested size and pixel format"
+            else:
+                entry["codec"] = video_codec
+                entry["reason"] = "encode"
+            if entry["codec"] == "copy" and not container_accepts(container, "video", codec_name):
+                problem = f"{label} can't be copied into .{container}; pick a video codec"
+                if cover_art and wanted is None:
+                    continue  # cover art is optional in keep-all mode
+
+        elif stream_type == "audio":
+            audio = choice.get("audio")
+            encoder = ENCODERS.get(audio["codec"], ("audio", audio["codec"])) if audio else None
+            if audio and not container_accepts(container, *encoder):
+                problem = f"{label}: audio codec '{audio['codec']}' is not compatible with .{container}"
+            elif audio and not (smart_copy and _audio_matches(stream, audio)):
+                entry.update(codec=audio["codec"], bitrate=audio["bitrate"],
+                             channels=audio["channels"], reason="re-encode requested")
+            elif audio:
+                entry["reason"] = f"already {codec_name} at or below {audio['bitrate']}"
+            if entry["codec"] == "copy" and not container_accepts(container, "audio", codec_name):
+                entry.update(codec=fallback["audio"], reason=f"{codec_name} not allowed in .{container}")
+
+        elif stream_type == "subtitle":
+            if not container_accepts(container, "subtitle", codec_name):
+                if codec_name in TEXT_SUBTITLES and "subtitle" in fallback:
+                    entry.update(codec=fallback["subtitle"],
+                                 reason=f"{codec_name} not allowed in .{container}")
+                else:
+                    problem = f"{label}: picture-based subtitles can't go into .{container}"
+
+        elif not container_accepts(container, stream_type, codec_name):
+            problem = f"{label} can't go into .{container}"
+
+        if problem:
+            # Streams nobody picked explicitly (keep-all batch mode) are just
+            # left out, except video and audio which are the point of the file
+            if wanted is None and stream_type not in ("video", "audio"):
+                continue
+            problems.append(problem)
+        plan.append(entry)
+
+    if video_codec != "copy" and not container_accepts(container, *ENCODERS.get(
+            video_codec, ("video", video_codec))):
+        problems.insert(0, f"The selected codec '{video_codec}' is not recommended/compatible "
+                           f"with .{container} container.")
+    return plan, problems
+
+
+def describe_plan(plan):
+    return "".join(f"  {entry['id']}: {entry['codec']} ({entry['reason']})\n" for entry in plan)
+
+
+def plan_weight(plan, cpu_count=None):
+    # A pure remux only needs one core, whatever codec was picked
+    encoders = [entry["codec"] for entry in plan if entry["type"] == "video" and entry["codec"] != "copy"]
+    return max([codec_cost(codec, cpu_count) for codec in encoders] or [1])
+
+
+# ---------- Planned Job ----------
+class PlannedJob(Job):
+    # A conversion whose stream plan is made when the job starts (from the
+    # cached probe), unless the caller already planned it.
+    kind = "planned"
+
+    def __init__(self, input_path, output_path, container, video_codec, resolution="same",
+                 pix_fmt="same", preset="default", streams=None, smart_copy=True, plan=None,
+                 crf=None, target=None):
+        weight = plan_weight(plan) if plan is not None else codec_cost(video_codec)
+        super().__init__(None, input_path, output_path, weight=weight)
+        self.container = container
+        self.video_codec = video_codec
+        self.resolution = resolution
+        self.pix_fmt = pix_fmt
+        self.preset = preset
+        self.streams = streams
+        self.smart_copy = smart_copy
+        self.plan = plan
+        self.crf = crf
+        self.target = target
+
+    def spec(self):
+        return {"input_path": self.input_path, "output_path": self.output_path,
+                "container": self.container, "video_codec": self.video_codec,
+                "resolution": self.resolution, "pix_fmt": self.pix_fmt, "preset": self.preset,
+                "streams": self.streams, "smart_copy": self.smart_copy, "plan": self.plan,
+                "crf": self.crf, "target": self.target}
+
+    def describe(self):
+        if self.cmd is None:
+            return f"Conversion of {self.input_path} (streams are planned when it starts)"
+        return f"Stream plan:\n{describe_plan(self.plan)}\n{super().describe()}"
+
+    def run(self, on_update, on_log):
+        if self.plan is None:
+            plan, problems = plan_streams(probe_media(self.input_path), self.container,
+                                          self.video_codec, self.resolution, self.pix_fmt,
+                                          self.streams, self.smart_copy, self.preset, self.crf)
+            if problems:
+                self.attempts += 1
+                self.status = FAILED
+                self.error = "; ".join(problems)
+                on_log(self, f"Can't convert: {self.error}\n")
+                return
+            self.plan = plan
+        if self.preset == "auto":
+            video = next((e for e in self.plan if e["type"] == "video" and e["codec"] != "copy"), None)
+            if video is not None:
+                tuned = self._autotune(on_log, video["codec"], video["index"], self.resolution,
+                                       self.pix_fmt, self.target)
+                if tuned is None:
+                    self.attempts += 1
+                    return
+                self.preset, self.crf = tuned
+        self.cmd = build_plan_command(self.input_path, self.output_path, self.plan,
+                                      self.resolution, self.pix_fmt, self.preset, self.crf)
+        on_log(self, f"Stream plan:\n{describe_plan(self.plan)}{super().describe()}\n\n")
+        super().run(on_update, on_log)
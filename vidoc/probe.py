@@ -0,0 +1,166 @@
+import json
+import threading
+import subprocess
+
+from vidoc.cache import default_cache
+from vidoc.telemetry import probe_timer
+
+PROBE_TIMEOUT = 30   # seconds before a probe of a slow share or a damaged file gives up
+
+
+def ffprobe_command(path):
+    return [
+        "ffprobe", "-v", "quiet",
+        "-print_format", "json",
+        "-show_format", "-show_streams",
+        path
+    ]
+
+
+def _parse_ffprobe(path, returncode, stdout):
+    try:
+        info = json.loads(stdout)
+    except ValueError:
+        info = {}
+    if returncode != 0 or "format" not in info:
+        raise RuntimeError(f"ffprobe could not read {path}")
+    return info
+
+
+def run_ffprobe(path, timeout=None):
+    try:
+        with probe_timer():
+            result = subprocess.run(ffprobe_command(path), capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        # subprocess.run has already killed it
+        raise RuntimeError(f"ffprobe timed out after {timeout}s on {path}")
+    return _parse_ffprobe(path, result.returncode, result.stdout)
+
+
+def probe_media(path, cache=None, timeout=None):
+    # Full ffprobe format/streams info, served from the metadata cache while
+    # the file's size and mtime are unchanged
+    cache = cache or default_cache()
+    info = cache.get(path)
+    if info is None:
+        info = run_ffprobe(path, timeout)
+        cache.put(path, info)
+    return info
+
+
+# ---------- Background Probe ----------
+class ProbeTask:
+    # probe_media() on a worker thread that can be abandoned: cancel() kills
+    # the running ffprobe, and a cancelled task never calls back.
+    # on_done(task, info, error) runs on the worker thread.
+
+    def __init__(self, path, on_done, timeout=PROBE_TIMEOUT, cache=None):
+        self.path = path
+        self.on_done = on_done
+        self.timeout = timeout
+        self.cache = cache
+        self.cancelled = False
+        self.process = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            if self.process is not None and self.process.poll() is None:
+                self.process.kill()
+
+    def _run(self):
+        info, error = None, None
+        try:
+            info = self._probe()
+        except Exception as e:
+            error = e
+        if not self.cancelled:
+            self.on_done(self, info, error)
+
+    def _probe(self):
+        cache = self.cache or default_cache()
+        info = cache.get(self.path)
+        if info is not None:
+            return info
+        with self._lock:
+            if self.cancelled:
+                return None
+            self.process = subprocess.Popen(ffprobe_command(self.path), stdout=subprocess.PIPE,
+                                            stderr=subprocess.DEVNULL, text=True)
+        try:
+            stdout, _ = self.process.communicate(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.communicate()
+            raise RuntimeError(f"ffprobe timed out after {self.timeout}s on {self.path}")
+        if self.cancelled:
+            return None
+        info = _parse_ffprobe(self.path, self.process.returncode, stdout)
+        cache.put(self.path, info)
+        return info
+
+
+def get_video_duration(path, cache=None):
+    try:
+        return float(probe_media(path, cache)["format"]["duration"])
+    except:
+        return 0
+
+
+def keyframe_index(path, stream="v:0", cache=None):
+    # {"keyframes": [pts, ...], "packets": count, "end": pts + duration of the
+    # last packet, "start": the file's start_time} for one video stream, read
+    # from packet flags so nothing has to be decoded. Times are relative to
+    # the start of the file, like ffmpeg's -ss and -segment_times, even where
+    # timestamps don't start at 0 (MPEG-TS, say). Reading every packet of a
+    # long file takes a while, so the index is cached like the probe.
+    cache = cache or default_cache()
+    kind = f"keyframes:{stream}"
+    index = cache.get(path, kind)
+    if index is not None and "start" in index:
+        return index
+    try:
+        start = float(probe_media(path, cache).get("format", {}).get("start_time", 0))
+    except ValueError:
+        start = 0.0  # N/A
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", stream,
+        "-show_entries", "packet=pts_time,duration_time,flags",
+        "-of", "csv=p=0",
+        path
+    ]
+    with probe_timer():
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe could not list keyframes of {path}")
+    keyframes = []
+    packets = 0
+    end = 0.0
+    for line in result.stdout.splitlines():
+        fields = line.split(",")
+        if len(fields) < 3:
+            continue
+        packets += 1
+        try:
+            pts = float(fields[0]) - start
+        except ValueError:
+            continue  # N/A
+        try:
+            end = max(end, pts + float(fields[1]))
+        except ValueError:
+            end = max(end, pts)
+        if "K" in fields[2]:
+            keyframes.append(pts)
+    index = {"keyframes": sorted(keyframes), "packets": packets, "end": end, "start": start}
+    cache.put(path, index, kind)
+    return index
+
+
+def list_keyframes(path, stream="v:0", cache=None):
+    return keyframe_index(path, stream, cache)["keyframes"]
@@ -0,0 +1,60 @@
+import json
+
+from vidoc.command import BITDEPTHS, CODECS, FORMATS, PRESETS
+from vidoc.media import stream_id
+from vidoc.planner import PlannedJob
+from vidoc.probe import probe_media
+from vidoc.segmented import SegmentedJob
+
+# The settings of the right-hand panel, as saved by "Save Profile" and
+# applied by the watch daemon. audio is None (copy/keep audio as is) or
+# {"codec", "bitrate", "channels"} applied to every audio stream. crf is
+# None for the encoder's default quality; target is the quality/size goal of
+# the "auto" preset (vidoc.autotune), None for its default.
+DEFAULT_PROFILE = {
+    "container": "mp4",
+    "video_codec": "libx264",
+    "resolution": "same",
+    "pix_fmt": "same",
+    "preset": "default",
+    "audio": None,
+    "smart_copy": True,
+    "segmented": False,
+    "crf": None,
+    "target": None,
+}
+
+
+def load_profile(path):
+    with open(path, encoding="utf-8") as f:
+        profile = dict(DEFAULT_PROFILE, **json.load(f))
+    for key, table in (("container", FORMATS), ("video_codec", CODECS), ("pix_fmt", BITDEPTHS),
+                       ("preset", PRESETS)):
+        if profile[key] not in [value for _, value in table]:
+            raise ValueError(f"{path}: unknown {key} '{profile[key]}'")
+    return profile
+
+
+def save_profile(path, profile):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(dict(DEFAULT_PROFILE, **profile), f, indent=2)
+
+
+def profile_streams(profile, input_path, probe_timeout=None):
+    # None keeps every stream; with an audio setting every audio stream of the
+    # input is re-encoded with it
+    if not profile.get("audio"):
+        return None
+    return [{"id": stream_id(s, i), "audio": profile["audio"] if s.get("codec_type") == "audio" else None}
+            for i, s in enumerate(probe_media(input_path, timeout=probe_timeout).get("streams", []))]
+
+
+def profile_job(profile, input_path, output_path, probe_timeout=None):
+    streams = profile_streams(profile, input_path, probe_timeout)
+    if profile["segmented"] and profile["video_codec"] != "copy":
+        return SegmentedJob(input_path, output_path, profile["container"], profile["video_codec"],
+                            profile["resolution"], profile["pix_fmt"], profile["preset"], streams,
+                            profile["smart_copy"], crf=profile["crf"], target=profile["target"])
+    return PlannedJob(input_path, output_path, profile["container"], profile["video_codec"],
+                      profile["resolution"], profile["pix_fmt"], profile["preset"], streams,
+                      profile["smart_copy"], crf=profile["crf"], target=profile["target"])
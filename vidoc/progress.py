@@ -0,0 +1,114 @@
+import time
+from dataclasses import dataclass
+
+
+def with_progress(cmd):
+    # Ask ffmpeg for key=value progress blocks on stdout and keep stderr for log lines only
+    return [cmd[0], "-progress", "pipe:1", "-nostats"] + list(cmd[1:])
+
+
+def parse_time_to_seconds(time_str):
+    # "HH:MM:SS.micro", possibly negative at the very start of an encode, or "N/A"
+    try:
+        negative = time_str.startswith("-")
+        h, m, s = time_str.lstrip("-").split(":")
+        seconds = int(h) * 3600 + int(m) * 60 + float(s)
+        return -seconds if negative else seconds
+    except (AttributeError, ValueError):
+        return None
+
+
+def _number(value, cast=float, suffix=""):
+    value = value.strip()
+    if suffix and value.endswith(suffix):
+        value = value[:-len(suffix)]
+    try:
+        return cast(value)
+    except ValueError:
+        return None  # "N/A" and friends
+
+
+@dataclass
+class ProgressRecord:
+    out_time: float = None     # seconds of output written so far
+    frame: int = None
+    fps: float = None
+    speed: float = None        # multiple of realtime
+    bitrate: float = None      # kbit/s
+    total_size: int = None     # bytes
+    duration: float = None     # total input duration, if known
+    done: bool = False
+
+    @property
+    def percent(self):
+        if self.done:
+            return 100.0
+        if not self.duration or self.out_time is None:
+            return None
+        return max(0.0, min(100.0, self.out_time / self.duration * 100))
+
+    @property
+    def eta(self):
+        # Seconds left at the current speed
+        if self.done:
+            return 0.0
+        if not self.duration or self.out_time is None or not self.speed:
+            return None
+        return max(0.0, (self.duration - self.out_time) / self.speed)
+
+
+# ---------- Progress Parser ----------
+class ProgressParser:
+    # Collects the key=value lines of one "-progress" block and hands back a
+    # ProgressRecord when the block ends ("progress=continue"/"progress=end"),
+    # at most once per interval seconds except for the final block.
+
+    def __init__(self, duration=None, interval=0.5, clock=time.monotonic):
+        self.duration = duration
+        self.interval = interval
+        self.clock = clock
+        self.last = None
+        self._fields = {}
+        self._last_emit = None
+
+    def feed(self, line):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", "replace")
+        key, sep, value = line.strip().partition("=")
+        if not sep:
+            return None
+        if key != "progress":
+            self._fields[key] = value
+            return None
+
+        record = self._build(done=value.strip() == "end")
+        self._fields = {}
+        self.last = record
+        now = self.clock()
+        if record.done or self._last_emit is None or now - self._last_emit >= self.interval:
+            self._last_emit = now
+            return record
+        return None
+
+    def _build(self, done):
+        fields = self._fields
+        out_time = None
+        # out_time_ms is in microseconds too (a long-standing ffmpeg quirk)
+        for key in ("out_time_us", "out_time_ms"):
+            if key in fields:
+                us = _number(fields[key], int)
+                if us is not None:
+                    out_time = us / 1_000_000
+                    break
+        if out_time is None and "out_time" in fields:
+            out_time = parse_time_to_seconds(fields["out_time"].strip())
+        return ProgressRecord(
+            out_time=out_time,
+            frame=_number(fields.get("frame", ""), int),
+            fps=_number(fields.get("fps", ""), float),
+            speed=_number(fields.get("speed", ""), float, "x"),
+            bitrate=_number(fields.get("bitrate", ""), float, "kbits/s"),
+            total_size=_number(fields.get("total_size", ""), int),
+            duration=self.duration,
+            done=done,
+        )
@@ -0,0 +1,290 @@
+import os
+import shutil
+import threading
+
+from vidoc.command import build_mux_command, build_plan_command, video_options
+from vidoc.jobs import (CANCELLED, DONE, FAILED, RUNNING, AutoTuneJob, Job, codec_cost,
+                        commit_output, discard_output, temp_output_path)
+from vidoc.planner import describe_plan, plan_streams
+from vidoc.probe import get_video_duration, list_keyframes, probe_media
+from vidoc.progress import ProgressRecord
+
+MIN_SEGMENT_SECONDS = 20
+SEGMENTS_PER_WORKER = 3   # a few chunks per worker keeps the tail of the encode short
+STEP_WEIGHT = 1           # probing, splitting and joining are mostly I/O
+
+
+def plan_cuts(keyframes, duration, segment_seconds):
+    # Cut on the first keyframe after each segment_seconds stretch, and don't
+    # leave a tiny last segment behind
+    cuts = []
+    last = 0.0
+    for t in keyframes:
+        if t - last >= segment_seconds and (not duration or duration - t >= segment_seconds / 2):
+            cuts.append(t)
+            last = t
+    return cuts
+
+
+# ---------- Segmented Job ----------
+class SegmentedJob(Job):
+    # Splits the video track at keyframes, encodes the chunks as separate jobs
+    # on the same scheduler, concats them losslessly and muxes the other
+    # streams of the input back in. The job's own steps take one core; while
+    # the chunks encode it gives that back (weight 0) and the chunk encodes
+    # carry the codec cost. With a job store the split and
+    # every finished chunk are recorded, and a resumed job picks up from there.
+    kind = "segmented"
+
+    def __init__(self, input_path, output_path, container, video_codec, resolution="same",
+                 pix_fmt="same", preset="default", streams=None, smart_copy=True,
+                 segment_seconds=None, work_dir=None, crf=None, target=None):
+        super().__init__(None, input_path, output_path, weight=STEP_WEIGHT)
+        self.container = container
+        self.video_codec = video_codec
+        self.resolution = resolution
+        self.pix_fmt = pix_fmt
+        self.preset = preset
+        self.streams = streams
+        self.smart_copy = smart_copy
+        self.segment_seconds = segment_seconds
+        self.work_dir = work_dir or f"{output_path}.parts"
+        self.crf = crf
+        self.target = target
+        self.plan = None
+        self.video_stream = None
+        self.children = []
+        self._changed = threading.Condition()
+
+    def spec(self):
+        return {"input_path": self.input_path, "output_path": self.output_path,
+                "container": self.container, "video_codec": self.video_codec,
+                "resolution": self.resolution, "pix_fmt": self.pix_fmt, "preset": self.preset,
+                "streams": self.streams, "smart_copy": self.smart_copy,
+                "segment_seconds": self.segment_seconds, "work_dir": self.work_dir,
+                "crf": self.crf, "target": self.target}
+
+    def describe(self):
+        return (f"Segmented {self.video_codec} encode of {self.input_path}\n"
+                f"Chunks in {self.work_dir}")
+
+    def cancel(self, keep_work=False):
+        super().cancel(keep_work)
+        for child in self.children:
+            if not child.finished:
+                self.scheduler.cancel(child)
+
+    def run(self, on_update, on_log):
+        self.attempts += 1
+        self.children = []
+        self._on_update = on_update
+        self._on_log = on_log
+        try:
+            self._run_segmented()
+        finally:
+            # The chunks stay only for a run that is to be resumed
+            if self.status != DONE:
+                discard_output(self.output_path)
+            if self.status == DONE or not self.keep_work:
+                shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def _run_segmented(self):
+        on_log = self._on_log
+        self.duration = self.duration or get_video_duration(self.input_path)
+
+        # Step 0: Plan the streams; the first video stream that needs encoding gets split
+        plan, problems = plan_streams(probe_media(self.input_path), self.container, self.video_codec,
+                                      self.resolution, self.pix_fmt, self.streams, self.smart_copy,
+                                      self.preset, self.crf)
+        if problems:
+            self.status = FAILED
+            self.error = "; ".join(problems)
+            on_log(self, f"Can't convert: {self.error}\n")
+            return
+        self.plan = plan
+        on_log(self, f"Stream plan:\n{describe_plan(plan)}\n")
+        video = next((e for e in plan if e["type"] == "video" and e["codec"] != "copy"), None)
+        if video is None:
+            # Nothing to encode in parallel, a plain remux does it
+            if self._run_step(build_plan_command(self.input_path, temp_output_path(self.output_path),
+                                                 plan)):
+                commit_output(self.output_path)
+                self._set_progress(100.0)
+                self.status = DONE
+            return
+        self.video_stream = video["id"]
+        self.video_spec = str(video["index"])
+        if self.preset == "auto":
+            tuned = self._tune(video["index"])
+            if tuned is None:
+                return
+            self.preset, self.crf = tuned
+        os.makedirs(self.work_dir, exist_ok=True)
+        done = self._done_work()
+
+        if "split" in done and self._sources():
+            # Resumed: the chunks of the last run are still there
+            cuts = done["split"]
+            on_log(self, f"Resuming: {len(cuts) + 1} segments, "
+                         f"{sum(name.startswith('enc_') for name in done)} already encoded\n")
+        else:
+            for name in os.listdir(self.work_dir):
+                os.remove(os.path.join(self.work_dir, name))
+            done = {}
+
+            # Step 1: Pick keyframe-aligned cut points, a few chunks per worker
+            cuts = plan_cuts(list_keyframes(self.input_path, self.video_spec), self.duration,
+                             self.segment_seconds or self._auto_segment_seconds())
+            on_log(self, f"Splitting into {len(cuts) + 1} segments\n")
+
+            # Step 2: Split the video track without re-encoding
+            split_cmd = ["ffmpeg", "-y", "-i", self.input_path, "-map", f"0:{self.video_spec}",
+                         "-c", "copy", "-f", "segment", "-reset_timestamps", "1"]
+            if cuts:
+                split_cmd += ["-segment_times", ",".join(f"{t:.6f}" for t in cuts)]
+            else:
+                split_cmd += ["-segment_time", str(10 ** 9)]
+            split_cmd += [os.path.join(self.work_dir, "src_%05d.mkv")]
+            if not self._run_step(split_cmd):
+                return
+            self._record("split", cuts)
+        self._set_progress(5.0)
+
+        # Step 3: Encode every chunk as its own job, except those a previous
+        # run already finished
+        sources = self._sources()
+        bounds = [0.0] + cuts + [self.duration]
+        weight = codec_cost(self.video_codec)
+        for i, name in enumerate(sources):
+            src = os.path.join(self.work_dir, name)
+            enc = os.path.join(self.work_dir, name.replace("src_", "enc_"))
+            cmd = ["ffmpeg", "-y", "-i", src, "-map", "0:v:0"]
+            cmd += video_options(self.video_codec, self.resolution, self.pix_fmt, self.preset, self.crf)
+            cmd += [enc]
+            duration = bounds[i + 1] - bounds[i] if len(sources) == len(cuts) + 1 else None
+            child = Job(cmd, src, enc, weight=weight, duration=duration)
+            child.parent = self
+            if os.path.basename(enc) in done and os.path.exists(enc):
+                child.status = DONE
+                child.progress = 100.0
+            self.children.append(child)
+        self.scheduler.reweigh(self, 0)
+        try:
+            for child in self.children:
+                if self._cancelled:
+                    break
+                if not child.finished:
+                    self.scheduler.submit(child, on_update=self._child_update, on_log=self._child_log)
+
+            with self._changed:
+                while not all(child.finished for child in self.children) and not self._all_stopped():
+                    self._changed.wait(0.5)
+        finally:
+            self.scheduler.reweigh(self, STEP_WEIGHT)
+        if self._cancelled:
+            self.status = CANCELLED
+            return
+        failed = [child for child in self.children if child.status != DONE]
+        if failed:
+            self.status = FAILED
+            self.error = f"segment {os.path.basename(failed[0].input_path)} failed: {failed[0].error}"
+            return
+
+        # Step 4: Join the encoded chunks back together, still without re-encoding
+        list_path = os.path.join(self.work_dir, "segments.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            for child in self.children:
+                f.write(f"file '{os.path.basename(child.output_path)}'\n")
+        video_path = os.path.join(self.work_dir, "video.mkv")
+        if not self._run_step(["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_path,
+                               "-c", "copy", video_path]):
+            return
+        self._set_progress(97.0)
+
+        # Step 5: Mux audio/subtitles from the input next to the new video track
+        if not self._run_step(build_mux_command(video_path, self.input_path,
+                                                temp_output_path(self.output_path),
+                                                self.plan, self.video_stream)):
+            return
+        commit_output(self.output_path)
+        self.returncode = 0
+        self._set_progress(100.0)
+        self.status = DONE  # reported by the scheduler once run() has cleaned up
+
+    def _tune(self, stream):
+        # (preset, crf) from an AutoTuneJob on the same scheduler; None with
+        # the status set if that didn't work out
+        tuner = AutoTuneJob(self.input_path, self.video_codec, stream, self.resolution, self.pix_fmt,
+                            self.target)
+        tuner.parent = self
+        self.children = [tuner]
+        self.scheduler.reweigh(self, 0)
+        try:
+            self.scheduler.submit(tuner, on_update=self._tuner_update, on_log=self._child_log)
+            if self._cancelled:
+                self.scheduler.cancel(tuner)
+            with self._changed:
+                while not tuner.finished:
+                    self._changed.wait(0.5)
+        finally:
+            self.scheduler.reweigh(self, STEP_WEIGHT)
+        self.children = []
+        if tuner.status != DONE:
+            self.status = CANCELLED if self._cancelled else FAILED
+            self.error = tuner.error
+            return None
+        return tuner.result
+
+    def _tuner_update(self, tuner):
+        with self._changed:
+            self._changed.notify_all()
+
+    def discard(self):
+        super().discard()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def _sources(self):
+        return sorted(name for name in os.listdir(self.work_dir) if name.startswith("src_"))
+
+    def _store(self):
+        store = self.scheduler.store if self.scheduler else None
+        return store if self.store_id is not None else None
+
+    def _done_work(self):
+        store = self._store()
+        return store.done_work(self) if store is not None else {}
+
+    def _record(self, item, value=None):
+        store = self._store()
+        if store is not None:
+            store.mark_done(self, item, value)
+
+    def _auto_segment_seconds(self):
+        workers = max(1, (self.scheduler.max_cores if self.scheduler else os.cpu_count() or 1)
+                      // codec_cost(self.video_codec))
+        return max(MIN_SEGMENT_SECONDS, (self.duration or 0) / (workers * SEGMENTS_PER_WORKER))
+
+    def _all_stopped(self):
+        # Stop waiting for chunks that never got submitted because of a cancel
+        return self._cancelled and all(child.status != RUNNING for child in self.children)
+
+    def _child_update(self, child):
+        if child.status == DONE:
+            self._record(os.path.basename(child.output_path))
+        elif child.status == FAILED:
+            # One bad chunk sinks the whole encode; stop the rest early
+            for other in self.children:
+                if not other.finished and other is not child:
+                    self.scheduler.cancel(other)
+        total = sum(c.duration or 1 for c in self.children) or 1
+        done = sum((c.duration or 1) * c.progress / 100 for c in self.children)
+        speed = sum(c.stats.speed or 0 for c in self.children
+                    if c.status == RUNNING and c.stats is not None)
+        stats = ProgressRecord(out_time=done * self.duration / total if self.duration else None,
+                               speed=speed or None, duration=self.duration)
+        self._set_progress(5.0 + 90.0 * done / total, stats)
+        with self._changed:
+            self._changed.notify_all()
+
+    def _child_log(self, child, line):
+        self._on_log(self, f"[{os.path.basename(child.input_path)}] {line}")
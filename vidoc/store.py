@@ -0,0 +1,245 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import threading
+
+from vidoc.jobs import CANCELLED, DONE, FAILED, QUEUED, RUNNING, Job
+from vidoc.ladder import LadderJob
+from vidoc.paths import data_dir
+from vidoc.planner import PlannedJob
+from vidoc.segmented import SegmentedJob
+from vidoc.trim import TrimJob
+
+JOB_KINDS = {cls.kind: cls for cls in (Job, PlannedJob, SegmentedJob, LadderJob, TrimJob)}
+KEEP_FINISHED_DAYS = 30
+HEARTBEAT_SECONDS = 30    # how often a process with jobs says it is still alive
+STALE_SECONDS = 120       # ... and how long until its jobs count as orphaned
+
+
+def _pid_alive(pid):
+    # Only asked on POSIX: on Windows os.kill() would end the process
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # someone else's process, but it exists
+    return True
+
+
+# ---------- Job Store ----------
+class JobStore:
+    # Every submitted job's spec and status in SQLite, plus the pieces of work
+    # it has finished (the split and each encoded segment of a SegmentedJob).
+    # After a crash the queued and running jobs come back from unfinished().
+    # Every job records the process that owns it ("host:pid"), and a process
+    # with jobs keeps a heartbeat in the owners table, so a job is only
+    # handed out again once its owner is gone: the GUI, a CLI batch and the
+    # watch daemon can share the store without taking over each other's jobs.
+    # The watch daemon also records here which input files it has handled.
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(data_dir(), "jobs.sqlite")
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock()
+        self._heartbeat = None
+        try:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT, spec TEXT,"
+                " status TEXT, error TEXT, created REAL, updated REAL, owner TEXT)"
+            )
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(jobs)")]
+            if "owner" not in columns:
+                self._db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            self._db.execute("CREATE TABLE IF NOT EXISTS owners (owner TEXT PRIMARY KEY, heartbeat REAL)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS work ("
+                " job_id INTEGER, item TEXT, value TEXT, PRIMARY KEY (job_id, item))"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS processed ("
+                " path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, status TEXT,"
+                " outputs TEXT, updated REAL)"
+            )
+            self._prune()
+            self._db.commit()
+        except sqlite3.Error:
+            # Read-only or broken data dir: jobs still run, they just can't resume
+            self._db = None
+
+    def save(self, job):
+        # Insert a new job, or update the spec and status of a resubmitted one
+        spec = json.dumps(job.spec())
+        now = time.time()
+        with self._lock:
+            job._stored_status = job.status
+            if self._db is None:
+                return
+            if job.store_id is None:
+                cursor = self._db.execute(
+                    "INSERT INTO jobs (kind, spec, status, error, created, updated, owner)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job.kind, spec, job.status, job.error, now, now, self.owner)
+                )
+                job.store_id = cursor.lastrowid
+            else:
+                self._db.execute("UPDATE jobs SET spec = ?, status = ?, error = ?, updated = ?, owner = ?"
+                                 " WHERE id = ?",
+                                 (spec, job.status, job.error, now, self.owner, job.store_id))
+            self._beat()
+            self._db.commit()
+        self._start_heartbeat()
+
+    def set_status(self, job):
+        with self._lock:
+            job._stored_status = job.status
+            if self._db is None or job.store_id is None:
+                return
+            self._db.execute("UPDATE jobs SET status = ?, error = ?, updated = ? WHERE id = ?",
+                             (job.status, job.error, time.time(), job.store_id))
+            if job.status == DONE:
+                self._db.execute("DELETE FROM work WHERE job_id = ?", (job.store_id,))
+            self._db.commit()
+
+    def mark_done(self, job, item, value=None):
+        with self._lock:
+            if self._db is None or job.store_id is None:
+                return
+            self._db.execute("INSERT OR REPLACE INTO work (job_id, item, value) VALUES (?, ?, ?)",
+                             (job.store_id, item, json.dumps(value)))
+            self._db.commit()
+
+    def done_work(self, job):
+        # {item: value} of everything mark_done() recorded for the job
+        with self._lock:
+            if self._db is None or job.store_id is None:
+                return {}
+            rows = self._db.execute("SELECT item, value FROM work WHERE job_id = ?",
+                                    (job.store_id,)).fetchall()
+        return {item: json.loads(value) for item, value in rows}
+
+    def unfinished(self):
+        # Jobs that were queued or running when their process ended, oldest
+        # first, rebuilt from their specs and ready to submit again. They
+        # become this process's jobs; jobs of processes still alive are left
+        # alone.
+        with self._lock:
+            if self._db is None:
+                return []
+            rows = self._db.execute(
+                "SELECT id, kind, spec, owner FROM jobs WHERE status IN (?, ?) ORDER BY id",
+                (QUEUED, RUNNING)
+            ).fetchall()
+            alive = {}
+            claimed = []
+            for store_id, kind, spec, owner in rows:
+                if owner == self.owner:
+                    continue  # already ours: queued or running in this process
+                if owner not in alive:
+                    alive[owner] = self._owner_alive(owner)
+                if alive[owner]:
+                    continue
+                # Claim it, unless another process just did
+                cursor = self._db.execute("UPDATE jobs SET owner = ? WHERE id = ? AND owner IS ?",
+                                          (self.owner, store_id, owner))
+                if cursor.rowcount == 1:
+                    claimed.append((store_id, kind, spec))
+            if claimed:
+                self._beat()
+            self._db.commit()
+        if claimed:
+            self._start_heartbeat()
+        jobs = []
+        for store_id, kind, spec in claimed:
+            try:
+                job = JOB_KINDS[kind].from_spec(json.loads(spec))
+            except (KeyError, TypeError, ValueError) as e:
+                job = Job(None, "", "")
+                job.store_id = store_id
+                job.status = FAILED
+                job.error = f"can't resume: {e}"
+                self.set_status(job)
+                continue
+            job.store_id = store_id
+            jobs.append(job)
+        return jobs
+
+    def abandon(self, jobs):
+        # The user chose not to resume these: what their runs left behind goes
+        for job in jobs:
+            job.discard()
+            job.status = CANCELLED
+            self.set_status(job)
+
+    def mark_processed(self, path, status, outputs=()):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        with self._lock:
+            if self._db is None:
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO processed (path, size, mtime_ns, status, outputs, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (os.path.abspath(path), st.st_size, st.st_mtime_ns, status, json.dumps(list(outputs)),
+                 time.time())
+            )
+            self._db.commit()
+
+    def is_processed(self, path, st):
+        # True if this exact version of the file (same size and mtime) was
+        # handled before, whether it converted or failed
+        with self._lock:
+            if self._db is None:
+                return False
+            row = self._db.execute("SELECT size, mtime_ns FROM processed WHERE path = ?",
+                                   (os.path.abspath(path),)).fetchone()
+        return row is not None and (row[0], row[1]) == (st.st_size, st.st_mtime_ns)
+
+    def _owner_alive(self, owner):
+        # True while the process owning jobs still beats; on this host a
+        # process that has exited is known to be gone right away
+        if owner is None:
+            return False  # a job from before owners were recorded
+        host, _, pid = owner.rpartition(":")
+        if host == socket.gethostname() and os.name == "posix" and pid.isdigit() and not _pid_alive(int(pid)):
+            return False
+        row = self._db.execute("SELECT heartbeat FROM owners WHERE owner = ?", (owner,)).fetchone()
+        return row is not None and time.time() - row[0] < STALE_SECONDS
+
+    def _beat(self):
+        # Called with the lock held
+        self._db.execute("INSERT OR REPLACE INTO owners (owner, heartbeat) VALUES (?, ?)",
+                         (self.owner, time.time()))
+
+    def _start_heartbeat(self):
+        with self._lock:
+            if self._heartbeat is not None or self._db is None:
+                return
+            self._heartbeat = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        self._heartbeat.start()
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(HEARTBEAT_SECONDS)
+            with self._lock:
+                try:
+                    self._beat()
+                    self._db.commit()
+                except sqlite3.Error:
+                    pass
+
+    def _prune(self):
+        cutoff = time.time() - KEEP_FINISHED_DAYS * 86400
+        self._db.execute("DELETE FROM work WHERE job_id IN"
+                         " (SELECT id FROM jobs WHERE status NOT IN (?, ?) AND updated < ?)",
+                         (QUEUED, RUNNING, cutoff))
+        self._db.execute("DELETE FROM jobs WHERE status NOT IN (?, ?) AND updated < ?",
+                         (QUEUED, RUNNING, cutoff))
+        self._db.execute("DELETE FROM owners WHERE heartbeat < ?", (cutoff,))
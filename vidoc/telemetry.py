@@ -0,0 +1,258 @@
+import os
+import sys
+import json
+import time
+import cProfile
+import threading
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from vidoc.paths import data_dir
+
+_local = threading.local()   # .metrics: the JobMetrics of the job this thread runs
+# ru_maxrss is in kilobytes, except on macOS
+_RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+@dataclass
+class JobMetrics:
+    wall_seconds: float = 0.0
+    python_cpu_seconds: float = 0.0   # ViDoc's own thread: planning, progress parsing, ...
+    cpu_user_seconds: float = 0.0     # ffmpeg children
+    cpu_system_seconds: float = 0.0
+    peak_rss_bytes: int = 0
+    ffmpeg_runs: int = 0
+    probe_runs: int = 0
+    probe_seconds: float = 0.0
+    frames: int = 0
+    fps: float = None                 # frames / wall time
+    speed: float = None               # media duration / wall time
+    input_bytes: int = 0
+    output_bytes: int = 0
+
+    def add_rusage(self, usage):
+        self.ffmpeg_runs += 1
+        if usage is None:
+            return
+        self.cpu_user_seconds += usage.ru_utime
+        self.cpu_system_seconds += usage.ru_stime
+        self.peak_rss_bytes = max(self.peak_rss_bytes, usage.ru_maxrss * _RSS_UNIT)
+
+    def merge(self, other):
+        # A sub-job's work counts towards its parent; wall time doesn't add up
+        self.python_cpu_seconds += other.python_cpu_seconds
+        self.cpu_user_seconds += other.cpu_user_seconds
+        self.cpu_system_seconds += other.cpu_system_seconds
+        self.peak_rss_bytes = max(self.peak_rss_bytes, other.peak_rss_bytes)
+        self.ffmpeg_runs += other.ffmpeg_runs
+        self.probe_runs += other.probe_runs
+        self.probe_seconds += other.probe_seconds
+        self.frames += other.frames
+
+    def describe(self):
+        text = (f"{self.wall_seconds:.1f}s wall, {self.cpu_user_seconds + self.cpu_system_seconds:.1f}s "
+                f"ffmpeg CPU, peak {self.peak_rss_bytes / 2 ** 20:.0f} MB, "
+                f"{self.python_cpu_seconds:.2f}s ViDoc CPU, {self.probe_runs} ffprobe "
+                f"({self.probe_seconds:.2f}s)")
+        if self.fps:
+            text += f", {self.fps:.1f} fps"
+        if self.speed:
+            text += f", {self.speed:.2f}x"
+        return text
+
+
+def current():
+    return getattr(_local, "metrics", None)
+
+
+@contextmanager
+def measure(job):
+    # Times job.run() on this thread; ffprobe calls made meanwhile count
+    # towards the job (see probe_timer)
+    previous = current()
+    _local.metrics = metrics = job.metrics
+    started, cpu_started = time.monotonic(), time.thread_time()
+    try:
+        yield metrics
+    finally:
+        _local.metrics = previous
+        metrics.wall_seconds = time.monotonic() - started
+        metrics.python_cpu_seconds += time.thread_time() - cpu_started
+        duration = job.duration or (job.stats.duration if job.stats is not None else None)
+        if metrics.wall_seconds > 0:
+            metrics.fps = metrics.frames / metrics.wall_seconds if metrics.frames else None
+            metrics.speed = duration / metrics.wall_seconds if duration else None
+        metrics.input_bytes = _size(job.input_path)
+        metrics.output_bytes = sum(_size(path) for path in job.output_paths)
+
+
+@contextmanager
+def probe_timer():
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        metrics = current()
+        if metrics is not None:
+            metrics.probe_runs += 1
+            metrics.probe_seconds += time.monotonic() - started
+
+
+def wait_process(process):
+    # process.wait() that also returns the child's resource usage (CPU time,
+    # peak RSS) from wait4(), or None where there is no wait4 or something
+    # else reaped the child first
+    if not hasattr(os, "wait4"):
+        process.wait()
+        return None
+    try:
+        _, status, usage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        process.wait()
+        return None
+    process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+    return usage
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return 0
+
+
+# Prometheus series: name -> (type, help)
+SERIES = {
+    "vidoc_jobs_total": ("counter", "Finished jobs"),
+    "vidoc_job_wall_seconds_total": ("counter", "Wall time of finished jobs"),
+    "vidoc_job_ffmpeg_cpu_seconds_total": ("counter", "CPU time of the jobs' ffmpeg processes"),
+    "vidoc_job_python_cpu_seconds_total": ("counter", "CPU time ViDoc itself spent on the jobs"),
+    "vidoc_job_ffprobe_seconds_total": ("counter", "Time spent in ffprobe for the jobs"),
+    "vidoc_job_input_bytes_total": ("counter", "Input bytes of finished jobs"),
+    "vidoc_job_output_bytes_total": ("counter", "Output bytes of finished jobs"),
+    "vidoc_job_peak_rss_bytes": ("gauge", "Peak RSS of an ffmpeg process in the last job"),
+    "vidoc_job_speed": ("gauge", "Media seconds per wall second of the last job"),
+    "vidoc_job_fps": ("gauge", "Frames per second of the last job"),
+}
+
+
+# ---------- Telemetry ----------
+class Telemetry:
+    # Where the metrics of finished jobs go: one JSON line per top-level job
+    # (metrics.jsonl in the data dir unless told otherwise), running totals
+    # in Prometheus text format written to a file (for node_exporter's
+    # textfile collector) and/or served on a local port, and with a
+    # profile_dir a cProfile dump of the Python side of every job.
+
+    def __init__(self, jsonl_path=None, prometheus_path=None, port=None, profile_dir=None):
+        self.jsonl_path = jsonl_path or os.path.join(data_dir(), "metrics.jsonl")
+        self.prometheus_path = prometheus_path
+        self.port = port
+        self.profile_dir = profile_dir
+        self.values = {}   # (series, labels) -> value
+        self._lock = threading.Lock()
+        self._server = None
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    def start(self):
+        if self.port and self._server is None:
+            telemetry = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    body = telemetry.prometheus_text().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @contextmanager
+    def profiling(self, job):
+        # A dump of job.run() per job. Before Python 3.12 cProfile sees only
+        # the thread it was enabled on; from 3.12 only one profiler can be on
+        # at a time, and jobs starting while another is profiled are skipped.
+        if not self.profile_dir:
+            yield
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            yield
+            return
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(self.profile_dir, f"job-{job.id}-{job.kind}.prof"))
+
+    def record(self, job):
+        metrics = job.metrics
+        entry = {"time": time.time(), "job": job.id, "kind": job.kind, "status": job.status,
+                 "attempt": job.attempts, "input": job.input_path, "outputs": job.output_paths,
+                 "error": job.error, **asdict(metrics)}
+        kind = (("kind", job.kind),)
+        with self._lock:
+            try:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+            except OSError:
+                pass  # metrics must never fail a job
+            self._add("vidoc_jobs_total", kind + (("status", job.status),), 1)
+            self._add("vidoc_job_wall_seconds_total", kind, metrics.wall_seconds)
+            self._add("vidoc_job_ffmpeg_cpu_seconds_total", kind + (("mode", "user"),),
+                      metrics.cpu_user_seconds)
+            self._add("vidoc_job_ffmpeg_cpu_seconds_total", kind + (("mode", "system"),),
+                      metrics.cpu_system_seconds)
+            self._add("vidoc_job_python_cpu_seconds_total", kind, metrics.python_cpu_seconds)
+            self._add("vidoc_job_ffprobe_seconds_total", kind, metrics.probe_seconds)
+            self._add("vidoc_job_input_bytes_total", kind, metrics.input_bytes)
+            self._add("vidoc_job_output_bytes_total", kind, metrics.output_bytes)
+            self.values[("vidoc_job_peak_rss_bytes", kind)] = metrics.peak_rss_bytes
+            self.values[("vidoc_job_speed", kind)] = metrics.speed or 0
+            self.values[("vidoc_job_fps", kind)] = metrics.fps or 0
+        if self.prometheus_path:
+            self._write_prometheus()
+
+    def prometheus_text(self):
+        with self._lock:
+            values = dict(self.values)
+        lines = []
+        for name, (kind, help_text) in SERIES.items():
+            series = sorted((labels, value) for (key, labels), value in values.items() if key == name)
+            if not series:
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for labels, value in series:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{name}{{{label_text}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def _add(self, name, labels, value):
+        self.values[(name, labels)] = self.values.get((name, labels), 0) + value
+
+    def _write_prometheus(self):
+        # Written aside and renamed, so a scrape never sees half a file
+        temp_path = f"{self.prometheus_path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text())
+            os.replace(temp_path, self.prometheus_path)
+        except OSError:
+            pass
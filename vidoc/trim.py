@@ -0,0 +1,199 @@
+import os
+import math
+import bisect
+import shutil
+
+from vidoc.command import build_mux_command
+from vidoc.jobs import DONE, FAILED, Job, commit_output, discard_output, temp_output_path
+from vidoc.ladder import main_video_stream
+from vidoc.planner import describe_plan, plan_streams
+from vidoc.probe import keyframe_index, probe_media
+
+KEYFRAME_EPSILON = 0.001   # a cut this close to a keyframe is on it
+
+# Encoder and quality for the re-encoded partial GOPs, per source codec. The
+# pieces are short, so they get a high quality setting.
+SMART_CUT_ENCODERS = {
+    "h264": ("libx264", ["-crf", "16"]),
+    "hevc": ("libx265", ["-crf", "18"]),
+    "vp9": ("libvpx-vp9", ["-crf", "20", "-b:v", "0"]),
+    "av1": ("libaom-av1", ["-crf", "20", "-b:v", "0"]),
+}
+# H.264/HEVC pieces go through MPEG-TS so each one carries its parameter sets
+# in-band and the joined stream stays decodable across the re-encoded parts
+PIECE_FORMATS = {"h264": "ts", "hevc": "ts", "vp9": "mkv", "av1": "mkv"}
+PROFILES = {
+    "Constrained Baseline": "baseline", "Baseline": "baseline", "Main": "main", "High": "high",
+    "High 10": "high10", "High 4:2:2": "high422", "High 4:4:4 Predictive": "high444",
+    "Main 10": "main10", "Main Still Picture": "mainstillpicture",
+}
+COLOR_OPTIONS = {"color_range": "-color_range", "color_space": "-colorspace",
+                 "color_primaries": "-color_primaries", "color_transfer": "-color_trc"}
+
+
+def parse_timestamp(text):
+    # "95", "95.5", "1:35" or "00:01:35.500" -> seconds
+    seconds = 0.0
+    for part in text.strip().split(":"):
+        seconds = seconds * 60 + float(part)
+    if not math.isfinite(seconds):
+        raise ValueError(f"'{text}' is not a time")
+    if seconds < 0:
+        raise ValueError(f"negative time '{text}'")
+    return seconds
+
+
+def plan_cut(keyframes, start, end):
+    # [(mode, from, to)] covering start..end: "copy" between the first keyframe
+    # at/after start and the last keyframe at/before end, "encode" for the
+    # partial GOPs around it. Without a whole GOP inside, all of it is encoded.
+    first_i = bisect.bisect_left(keyframes, start - KEYFRAME_EPSILON)
+    last_i = bisect.bisect_right(keyframes, end + KEYFRAME_EPSILON) - 1
+    if first_i >= len(keyframes) or last_i < first_i:
+        return [("encode", start, end)]
+    first, last = keyframes[first_i], keyframes[last_i]
+    if end - last <= KEYFRAME_EPSILON:
+        last = end
+    if last - first <= KEYFRAME_EPSILON:
+        return [("encode", start, end)]
+
+    pieces = []
+    if first - start > KEYFRAME_EPSILON:
+        pieces.append(("encode", start, first))
+    pieces.append(("copy", first, last))
+    if end - last > KEYFRAME_EPSILON:
+        pieces.append(("encode", last, end))
+    return pieces
+
+
+def encode_options(stream):
+    # Re-encode in the source's own format so the pieces join without a
+    # re-encode of the whole: codec, pixel format, profile, level, frame rate
+    # and colour description all match the copied part.
+    codec = stream.get("codec_name")
+    if codec not in SMART_CUT_ENCODERS:
+        raise ValueError(f"smart cut can't re-encode {codec} video; convert it instead of trimming")
+    encoder, quality = SMART_CUT_ENCODERS[codec]
+    opts = ["-c:v", encoder] + quality
+    if stream.get("pix_fmt"):
+        opts += ["-pix_fmt", stream["pix_fmt"]]
+    if stream.get("profile") in PROFILES and codec in ("h264", "hevc"):
+        opts += ["-profile:v", PROFILES[stream["profile"]]]
+    if codec == "h264" and stream.get("level", 0) > 0:
+        opts += ["-level:v", f"{stream['level'] / 10:.1f}"]
+    if stream.get("r_frame_rate", "0/0") != "0/0":
+        opts += ["-r", stream["r_frame_rate"]]
+    for key, option in COLOR_OPTIONS.items():
+        if stream.get(key) not in (None, "unknown", "reserved"):
+            opts += [option, stream[key]]
+    return opts
+
+
+# ---------- Trim Job ----------
+class TrimJob(Job):
+    # Frame-accurate trim at close to remux speed: the video between the first
+    # and last keyframe inside the range is stream copied, only the partial
+    # GOPs at the cut points are re-encoded, and the pieces are concatenated.
+    # The other kept streams are copied for the same range.
+    kind = "trim"
+
+    def __init__(self, input_path, output_path, container, start=0.0, end=None, streams=None,
+                 work_dir=None):
+        super().__init__(None, input_path, output_path, weight=1)
+        self.container = container
+        self.start = start
+        self.end = end
+        self.streams = streams
+        self.work_dir = work_dir or f"{output_path}.trim"
+
+    def spec(self):
+        return {"input_path": self.input_path, "output_path": self.output_path,
+                "container": self.container, "start": self.start, "end": self.end,
+                "streams": self.streams, "work_dir": self.work_dir}
+
+    def describe(self):
+        end = "the end" if self.end is None else f"{self.end:.3f}s"
+        return f"Smart cut of {self.input_path} from {self.start:.3f}s to {end}"
+
+    def discard(self):
+        super().discard()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def run(self, on_update, on_log):
+        self.attempts += 1
+        self._on_update = on_update
+        self._on_log = on_log
+        try:
+            self._run_trim()
+        finally:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+            if self.status != DONE:
+                discard_output(self.output_path)
+
+    def _run_trim(self):
+        on_log = self._on_log
+        info = probe_media(self.input_path)
+        video_stream = main_video_stream(info)
+        if self.streams is not None and not any(s["id"] == video_stream for s in self.streams):
+            video_stream = next((s["id"] for s in self.streams if s["id"].startswith("v:")), None)
+        plan, problems = plan_streams(info, self.container, "copy", streams=self.streams)
+        if video_stream is None:
+            problems.append("The input has no video stream to cut")
+        if problems:
+            self.status = FAILED
+            self.error = "; ".join(problems)
+            on_log(self, f"Can't trim: {self.error}\n")
+            return
+
+        # Step 1: Split the range into copied and re-encoded pieces
+        index = int(video_stream.split(":")[1])
+        stream = next(s for s in info["streams"] if s.get("index") == index)
+        keyframes = keyframe_index(self.input_path, str(index))
+        end = min(self.end if self.end is not None else keyframes["end"], keyframes["end"] or float("inf"))
+        if end <= self.start:
+            self.status = FAILED
+            self.error = f"nothing to keep between {self.start:.3f}s and {end:.3f}s"
+            return
+        pieces = plan_cut(keyframes["keyframes"], self.start, end)
+        opts = encode_options(stream) if any(mode == "encode" for mode, _, _ in pieces) else []
+        on_log(self, "Pieces:\n" + "".join(f"  {mode} {a:.3f}s - {b:.3f}s\n" for mode, a, b in pieces)
+               + f"Other streams:\n{describe_plan([e for e in plan if e['id'] != video_stream])}\n")
+
+        # Step 2: Cut every piece of the video track
+        os.makedirs(self.work_dir, exist_ok=True)
+        ext = PIECE_FORMATS.get(stream.get("codec_name"), "mkv")
+        steps = len(pieces) + 2
+        paths = []
+        for i, (mode, a, b) in enumerate(pieces):
+            path = os.path.join(self.work_dir, f"piece_{i:03d}.{ext}")
+            cmd = ["ffmpeg", "-y", "-ss", f"{a:.6f}", "-i", self.input_path, "-t", f"{b - a:.6f}",
+                   "-map", f"0:{index}"]
+            if mode == "copy":
+                cmd += ["-c", "copy", "-avoid_negative_ts", "make_zero"]
+            else:
+                cmd += opts
+            if not self._run_step(cmd + [path]):
+                return
+            paths.append(path)
+            self._set_progress(100.0 * (i + 1) / steps)
+
+        # Step 3: Join them without re-encoding
+        list_path = os.path.join(self.work_dir, "pieces.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            for path in paths:
+                f.write(f"file '{os.path.basename(path)}'\n")
+        video_path = os.path.join(self.work_dir, f"video.{ext}")
+        if not self._run_step(["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_path,
+                               "-c", "copy", video_path]):
+            return
+        self._set_progress(100.0 * (steps - 1) / steps)
+
+        # Step 4: Copy the other streams for the same range next to it
+        cmd = build_mux_command(video_path, self.input_path, temp_output_path(self.output_path), plan,
+                                video_stream, ["-ss", f"{self.start:.6f}", "-t", f"{end - self.start:.6f}"])
+        if not self._run_step(cmd):
+            return
+        commit_output(self.output_path)
+        self.returncode = 0
+        self._set_progress(100.0)
+        self.status = DONE  # reported by the scheduler once run() has cleaned up
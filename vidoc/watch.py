@@ -0,0 +1,303 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+
+from vidoc.command import VIDEO_EXTENSIONS, batch_output_path
+from vidoc.jobs import CANCELLED
+from vidoc.probe import PROBE_TIMEOUT
+from vidoc.profile import profile_job
+
+SETTLE_SECONDS = 10     # a file counts as written once size and mtime hold this long
+POLL_INTERVAL = 2.0
+FULL_SCAN_SECONDS = 300  # polling: a walk for files rewritten in place, which leave the dir mtime alone
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+_EVENT = struct.Struct("iIII")   # wd, mask, cookie, len; the name follows
+
+
+class Inotify:
+    # The few inotify calls the watcher needs, through ctypes so there is no
+    # extra dependency. Raises OSError where inotify isn't available.
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify is Linux only")
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}   # watch descriptor -> directory
+
+    def add(self, path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            # ENOSPC: fs.inotify.max_user_watches is used up
+            raise OSError(ctypes.get_errno(), f"can't watch {path}")
+        self.dirs[wd] = path
+
+    def read(self, timeout):
+        # [(directory, mask, name)] of the events that arrive within timeout
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+            offset += _EVENT.size + length
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)  # the directory is gone
+            elif mask & IN_Q_OVERFLOW or wd in self.dirs:
+                events.append((self.dirs.get(wd), mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+# ---------- Folder Watcher ----------
+class FolderWatcher:
+    # Finds new media files under the roots and hands each one out once its
+    # size and mtime have stopped changing. After one walk at start, changes
+    # come from inotify; without it, only directories whose mtime changed are
+    # rescanned, so a drop folder with a huge number of files costs one stat
+    # per directory per interval, plus a full walk every FULL_SCAN_SECONDS
+    # for files rewritten in place. Only files still being written are
+    # re-stat'ed every interval. A file handed out before is handed out again
+    # once its size or mtime changed.
+
+    def __init__(self, roots, extensions=VIDEO_EXTENSIONS, settle_seconds=SETTLE_SECONDS,
+                 poll_interval=POLL_INTERVAL, use_inotify=True, skip=None, skip_dirs=(), log=None):
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.extensions = extensions
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.skip = skip or (lambda path, st: False)
+        self.skip_dirs = {os.path.abspath(d) for d in skip_dirs}
+        self.log = log or (lambda message: None)
+        self.pending = {}      # path -> (size, mtime_ns, unchanged since)
+        self.seen = {}         # path -> (size, mtime_ns) handed out or skipped this session
+        self.dir_mtimes = {}   # for the polling fallback
+        self.last_walk = time.monotonic()
+        self.inotify = None
+        if use_inotify:
+            try:
+                self.inotify = Inotify()
+            except OSError as e:
+                self.log(f"inotify unavailable ({e}), polling directories instead")
+
+    @property
+    def mode(self):
+        return "inotify" if self.inotify is not None else "polling"
+
+    def start(self):
+        # One full walk: finds what arrived while nothing was watching and
+        # sets up the watches
+        self.last_walk = time.monotonic()
+        for root in self.roots:
+            self._scan_tree(root)
+
+    def poll(self):
+        # Waits up to poll_interval for changes; returns the files that have
+        # finished being written since the last call
+        if self.inotify is not None:
+            self._read_events(self.poll_interval)
+        else:
+            time.sleep(self.poll_interval)
+            if time.monotonic() - self.last_walk >= FULL_SCAN_SECONDS:
+                self.start()
+            else:
+                self._rescan_changed_dirs()
+        return self._settled()
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+    def _scan_tree(self, top):
+        stack = [top]
+        while stack:
+            directory = stack.pop()
+            if directory in self.skip_dirs:
+                continue
+            self._watch_dir(directory)
+            stack += self._scan_dir(directory)
+
+    def _watch_dir(self, directory):
+        try:
+            self.dir_mtimes[directory] = os.stat(directory).st_mtime_ns
+        except OSError:
+            return
+        if self.inotify is not None:
+            try:
+                self.inotify.add(directory)
+            except OSError as e:
+                # Out of watches: dir_mtimes already covers every directory
+                self.log(f"{e}, polling directories instead")
+                self.close()
+
+    def _scan_dir(self, directory):
+        # Considers the media files of one directory; returns its subdirectories
+        subdirs = []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.name.lower().endswith(self.extensions):
+                            self._consider(entry.path, entry.stat())
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return subdirs
+
+    def _consider(self, path, st):
+        version = (st.st_size, st.st_mtime_ns)
+        if self.seen.get(path) == version or path in self.pending:
+            return
+        if ".vidoc-tmp." in os.path.basename(path) or self.skip(path, st):
+            self.seen[path] = version
+            return
+        self.seen.pop(path, None)
+        self.pending[path] = (st.st_size, st.st_mtime_ns, time.monotonic())
+
+    def _read_events(self, timeout):
+        for directory, mask, name in self.inotify.read(timeout):
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped; a walk catches up
+                self.log("inotify queue overflowed, rescanning")
+                self.start()
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                self._scan_tree(path)
+            elif name.lower().endswith(self.extensions):
+                try:
+                    self._consider(path, os.stat(path))
+                except OSError:
+                    continue
+            if self.inotify is None:
+                return  # fell back to polling while handling this batch
+
+    def _rescan_changed_dirs(self):
+        # Adding, removing or renaming an entry changes the directory's mtime
+        for directory, mtime in list(self.dir_mtimes.items()):
+            try:
+                current = os.stat(directory).st_mtime_ns
+            except OSError:
+                del self.dir_mtimes[directory]
+                continue
+            if current != mtime:
+                self.dir_mtimes[directory] = current
+                for subdir in self._scan_dir(directory):
+                    if subdir not in self.dir_mtimes:
+                        self._scan_tree(subdir)
+
+    def _settled(self):
+        ready = []
+        now = time.monotonic()
+        for path, (size, mtime, since) in list(self.pending.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self.pending[path]  # deleted or moved away before it settled
+                continue
+            if (st.st_size, st.st_mtime_ns) != (size, mtime):
+                self.pending[path] = (st.st_size, st.st_mtime_ns, now)
+            elif now - since >= self.settle_seconds:
+                del self.pending[path]
+                self.seen[path] = (size, mtime)
+                ready.append(path)
+        return ready
+
+
+# ---------- Watch Daemon ----------
+class WatchDaemon:
+    # Applies a profile (vidoc.profile) to every new file under the roots.
+    # The scheduler needs a job store: it resumes what the last session left
+    # unfinished and remembers which files were handled, so a restart skips them.
+
+    def __init__(self, roots, profile, output_dir, scheduler, settle_seconds=SETTLE_SECONDS,
+                 poll_interval=POLL_INTERVAL, use_inotify=True, log=None):
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.profile = profile
+        self.output_dir = os.path.abspath(output_dir)
+        self.scheduler = scheduler
+        self.store = scheduler.store
+        self.log = log or (lambda message: None)
+        self.active = set()   # inputs of jobs that are queued or running
+        self._lock = threading.Lock()
+        self.watcher = FolderWatcher(self.roots, settle_seconds=settle_seconds, poll_interval=poll_interval,
+                                     use_inotify=use_inotify, skip=self._skip, skip_dirs=[self.output_dir],
+                                     log=self.log)
+
+    def run(self, stop=None):
+        stop = stop or threading.Event()
+        for job in self.store.unfinished():
+            self.log(f"Resuming {job.input_path}")
+            self._submit(job)
+        self.watcher.start()
+        self.log(f"Watching {', '.join(self.roots)} ({self.watcher.mode}), "
+                 f"{len(self.watcher.pending)} file(s) to check")
+        try:
+            while not stop.is_set():
+                for path in self.watcher.poll():
+                    try:
+                        job = profile_job(self.profile, path, self.output_path(path), PROBE_TIMEOUT)
+                    except Exception as e:
+                        self.log(f"{path}: {e}")
+                        self.store.mark_processed(path, "failed")
+                        continue
+                    self._submit(job)
+        finally:
+            self.watcher.close()
+
+    def output_path(self, path):
+        # Mirrors the folder layout under the root the file was found in
+        root = next((r for r in self.roots if path.startswith(r + os.sep)), os.path.dirname(path))
+        output_dir = os.path.join(self.output_dir, os.path.relpath(os.path.dirname(path), root))
+        os.makedirs(output_dir, exist_ok=True)
+        return batch_output_path(path, output_dir, self.profile["container"])
+
+    def _skip(self, path, st):
+        with self._lock:
+            if path in self.active:
+                return True
+        return self.store.is_processed(path, st)
+
+    def _submit(self, job):
+        with self._lock:
+            self.active.add(os.path.abspath(job.input_path))
+        self.scheduler.submit(job, on_update=self._job_update)
+
+    def _job_update(self, job):
+        if job.finished:
+            if job.status != CANCELLED:
+                self.store.mark_processed(job.input_path, job.status, job.output_paths)
+            with self._lock:
+                self.active.discard(os.path.abspath(job.input_path))
+        if self.scheduler.on_update:
+            self.scheduler.on_update(job)